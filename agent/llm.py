@@ -6,12 +6,14 @@ load_dotenv()
 
 ## set ENV variables
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+# OpenAI-compatible gateway (e.g. mock_llm_server.py); None = provider default
+API_BASE = os.getenv("LLM_BASE_URL")
 
 
 messages = [{ "content": "Hello, how are you?","role": "user"}]
 
 # openai call
-response = completion(model="openai/gpt-4o", messages=messages)
+response = completion(model="openai/gpt-4o", messages=messages, api_base=API_BASE)
 
 # anthropic call
 print(response)
@@ -32,7 +34,7 @@ class LLM:
         self.messages.append(message)
 
     def get_response(self):
-        response = completion(model=self.model, messages=self.messages)
+        response = completion(model=self.model, messages=self.messages, api_base=API_BASE)
         return response
 
     def get_tools(self):
@@ -0,0 +1,336 @@
+# answer_cache.py
+"""
+Cache de réponses finales devant la boucle ReAct (get_completion, /chat).
+
+- Clé exacte : question normalisée (accents, casse, ponctuation).
+- Option : questions quasi identiques (cosinus sur trigrammes de
+  caractères ≥ ANSWER_CACHE_SIMILARITY), seulement entre questions aux
+  mêmes jetons significatifs : sigles, nombres (« EAF » ≠ « LF »),
+  agrégations (total ≠ moyenne), produits / rejets et périodes.
+- Chaque réponse est étiquetée avec les tables lues par ses appels
+  d'outils ; elle est invalidée quand l'empreinte d'une de ces tables
+  (content_hash de l'import Excel) change. Les tables sans empreinte, et
+  les appels dont la table est inconnue, suivent la base entière.
+
+ANSWER_CACHE=0 (défaut) | 1, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import db_pool
+from query_cache import db_fingerprint
+
+# Table d'empreintes tenue par excel_to_sqlite3 (FINGERPRINT_TABLE)
+FINGERPRINT_TABLE = "_sheet_fingerprints"
+# Dépendance à la base entière
+ANY_TABLE = "*"
+
+# Outils qui ne lisent pas la base : ne rendent pas une réponse dépendante
+PURE_TOOLS = frozenset({
+    "calculate_taux_disponibilite", "calculate_temps_requis_pourcentage", "calculate_mtbf",
+    "calculate_mttr", "calculate_rendement", "calculate_conso_elec", "calculate_temps_requis",
+    "convert_to_datetime", "calculate_duration_hours", "calculate_energy_intensity",
+    "calculate_performance_rate", "calculate_quality_rate", "calculate_oee",
+    "calculate_maintenance_cost_per_tonne", "moving_average", "rolling_std", "rolling_median",
+    "ewma", "zscore", "detect_outliers", "normalize_series", "convert_energy_unit",
+    "select_ui_component", "assemble_dashboard", "make_kpi", "make_line",
+    "make_multi_series_chart", "make_table", "save_to_scratchpad", "load_from_scratchpad",
+    "self_reflect", "update_goal_state",
+})
+
+_STOPWORDS = frozenset(
+    "a au aux avec ce ces d dans de des du en est et la le les l leur mon ma mes ne nos "
+    "ou par pas pour qu que quel quels quelle quelles qui sa se ses son sur ta te un une "
+    "the of to in on for is are and or an by with what how me give show make".split()
+)
+
+
+# Qualificatifs (préfixe de mot normalisé -> jeton) : « totale » ≈ « total »,
+# mais « total » ≠ « moyenne » ≠ « par mois ». Premier préfixe qui correspond.
+_QUALIFIERS = (
+    ("total", "total"), ("somme", "total"), ("cumul", "total"), ("sum", "total"),
+    ("moyen", "moyen"), ("average", "moyen"), ("avg", "moyen"), ("mean", "moyen"),
+    ("max", "max"), ("minute", "minute"), ("min", "min"),
+    ("median", "median"),
+    ("produi", "produit"), ("product", "produit"),
+    ("rejet", "rejet"), ("rebut", "rejet"),
+    ("heure", "heure"), ("horaire", "heure"),
+    ("jour", "jour"), ("quotidien", "jour"), ("daily", "jour"),
+    ("semaine", "semaine"), ("hebdo", "semaine"), ("week", "semaine"),
+    ("mois", "mois"), ("mensuel", "mois"), ("month", "mois"),
+    ("trimestr", "trimestre"), ("annee", "annee"), ("annuel", "annee"), ("year", "annee"),
+    ("periode", "periode"),
+)
+_QUALIFIER_WORDS = {"an": "annee", "ans": "annee"}
+
+
+def normalize_prompt(text: str) -> str:
+    """Question sans accents, en minuscules, mots séparés par un espace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def significant_tokens(normalized: str) -> FrozenSet[str]:
+    """
+    Jetons qui changent le sens d'une question métier : qualificatifs
+    (agrégation, produit / rejet, période) ramenés à leur racine, nombres
+    et mots courts hors mots vides (sigles d'étapes EAF, LF, CCM…).
+    """
+    tokens = set()
+    for w in normalized.split():
+        qualifier = _QUALIFIER_WORDS.get(w) or next(
+            (tag for prefix, tag in _QUALIFIERS if w.startswith(prefix)), None
+        )
+        if qualifier:
+            tokens.add(qualifier)
+        elif any(c.isdigit() for c in w) or (len(w) <= 4 and w not in _STOPWORDS):
+            tokens.add(w)
+    return frozenset(tokens)
+
+
+def _trigrams(normalized: str) -> Tuple[Counter, float]:
+    padded = f" {normalized} "
+    grams = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams, math.sqrt(sum(v * v for v in grams.values()))
+
+
+def _cosine(a: Tuple[Counter, float], b: Tuple[Counter, float]) -> float:
+    (ga, na), (gb, nb) = a, b
+    if not na or not nb:
+        return 0.0
+    if len(ga) > len(gb):
+        ga, gb = gb, ga
+    return sum(v * gb.get(g, 0) for g, v in ga.items()) / (na * nb)
+
+
+def _strings(value: Any) -> Iterable[str]:
+    """Chaînes contenues dans des arguments d'outil (dict / list imbriqués)."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _strings(v)
+
+
+class _Entry:
+    __slots__ = ("answer", "versions", "significant", "grams")
+
+    def __init__(self, answer: str, versions: Dict[str, Any], significant: FrozenSet[str], grams: Tuple[Counter, float]):
+        self.answer = answer
+        self.versions = versions
+        self.significant = significant
+        self.grams = grams
+
+
+class AnswerCache:
+    """
+    Cache LRU thread-safe de réponses finales.
+
+    Parameters
+    ----------
+    max_entries : int
+        Nombre maximal de réponses gardées.
+    similarity : float
+        Seuil de cosinus pour les quasi-doublons ; 0 = correspondance exacte seule.
+    enabled : bool
+        Cache désactivé : get() renvoie toujours None et put() ne fait rien.
+    path : str, optional
+        Base SQLite (défaut : db_pool.DB_PATH).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        similarity: float = 0.0,
+        enabled: bool = True,
+        path: Optional[str] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.enabled = enabled
+        self.path = path
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # jetons significatifs -> questions normalisées (candidats quasi-doublons)
+        self._buckets: Dict[FrozenSet[str], set] = {}
+        self._fingerprint: Optional[Tuple] = None
+        self._tables: List[str] = []
+        self._table_re: Optional["re.Pattern[str]"] = None
+        self._versions: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # ──────────────────────────────────────────────
+    # Lecture / écriture
+    # ──────────────────────────────────────────────
+    def get(self, prompt: str) -> Optional[str]:
+        """Réponse en cache pour cette question (ou une quasi identique)."""
+        if not self.enabled:
+            return None
+        key = normalize_prompt(prompt)
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                print(f"[DEBUG] Answer cache hit: {key[:60]}")
+                return entry.answer
+            match = self._similar(key)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.similar_hits += 1
+                print(f"[DEBUG] Answer cache near-duplicate hit: {key[:60]} ~ {match[:60]}")
+                return self._entries[match].answer
+            self.misses += 1
+            return None
+
+    def put(self, prompt: str, answer: str, trace: Iterable[Dict[str, Any]] = ()) -> None:
+        """
+        Mémorise la réponse finale ; `trace` : appels d'outils de la requête
+        ({"name", "arguments"}), d'où sont déduites les tables lues.
+        """
+        if not self.enabled:
+            return
+        key = normalize_prompt(prompt)
+        with self._lock:
+            self._refresh()
+            trace = list(trace)
+            # Sans appel d'outil, la réponse suit la base entière
+            tables = self._tables_read(trace) if trace else {ANY_TABLE}
+            entry = _Entry(
+                answer,
+                {t: self._version(t) for t in tables},
+                significant_tokens(key),
+                _trigrams(key),
+            )
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._buckets.setdefault(entry.significant, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        print(f"[DEBUG] Answer cached for '{key[:60]}' (tables: {sorted(tables) or 'none'})")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    # ──────────────────────────────────────────────
+    # Interne
+    # ──────────────────────────────────────────────
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        bucket = self._buckets.get(entry.significant)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[entry.significant]
+
+    def _similar(self, key: str) -> Optional[str]:
+        if self.similarity <= 0:
+            return None
+        candidates = self._buckets.get(significant_tokens(key))
+        if not candidates:
+            return None
+        grams = _trigrams(key)
+        best, best_score = None, self.similarity
+        for candidate in candidates:
+            score = _cosine(grams, self._entries[candidate].grams)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def _tables_read(self, trace: Iterable[Dict[str, Any]]) -> set:
+        """
+        Tables citées dans les arguments (SQL, table_name…) des appels
+        d'outils, comme identifiants entiers : « EAF » ≠ « EAF-Analyses ».
+        """
+        names = {t.lower(): t for t in self._tables}
+        tables = set()
+        for call in trace:
+            found = {
+                names[m.group(1).lower()]
+                for text in _strings(call.get("arguments"))
+                for m in (self._table_re.finditer(text) if self._table_re else ())
+            }
+            if found:
+                tables |= found
+            elif call.get("name") not in PURE_TOOLS:
+                tables.add(ANY_TABLE)
+        return tables
+
+    def _version(self, table: str) -> Any:
+        """Empreinte d'une table ; à défaut celle de la base entière."""
+        version = self._versions.get(table)
+        return version if version is not None else self._fingerprint
+
+    def _refresh(self) -> None:
+        """Relit les empreintes si la base a changé et purge les réponses périmées."""
+        path = self.path or db_pool.DB_PATH
+        fp = db_fingerprint(path)
+        if fp == self._fingerprint:
+            return
+        self._fingerprint = fp
+        try:
+            self._tables = [
+                name for (name,) in db_pool.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'",
+                    path=path,
+                )
+                if name != FINGERPRINT_TABLE
+            ]
+            # Nom entier : ni lettre, chiffre, _ ou - collé avant ou après
+            self._table_re = re.compile(
+                r"(?<![\w-])(" + "|".join(re.escape(t) for t in sorted(self._tables, key=len, reverse=True)) + r")(?![\w-])",
+                re.IGNORECASE,
+            ) if self._tables else None
+            self._versions = dict(db_pool.execute(f'SELECT sheet, content_hash FROM "{FINGERPRINT_TABLE}"', path=path))
+        except sqlite3.Error:
+            self._versions = {}
+        stale = [
+            key for key, entry in self._entries.items()
+            if any(self._version(t) != v for t, v in entry.versions.items())
+        ]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            self.invalidations += 1
+            print(f"[DEBUG] Answer cache invalidated {len(stale)} entries after a database change")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity": self.similarity,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+ANSWER_CACHE = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0")),
+    enabled=os.getenv("ANSWER_CACHE", "0") == "1",
+)
@@ -1,9 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from typing import Optional, List
 import asyncio
+import json
 
 # Import our custom modules
 from models import DatabaseManager, User, Conversation, Message, UploadedFile
@@ -14,6 +16,15 @@ from schemas import (
 )
 from file_utils import FileManager
 from llm import LLM
+from session_manager import SessionManager
+from query_cache import QUERY_CACHE
+from columnar_cache import COLUMNAR_CACHE
+from scratchpad_store import SCRATCHPAD_STORE
+from prompt_cache import PROMPT_CACHE_STATS
+from speculation import SPECULATION_STATS
+from answer_cache import ANSWER_CACHE
+from plan_cache import PLAN_CACHE
+from intent_router import INTENT_ROUTER
 
 app = FastAPI(
     title="Chat Interface API",
@@ -34,6 +45,7 @@ app.add_middleware(
 db_manager = DatabaseManager()
 file_manager = FileManager()
 llm_client = LLM()
+session_manager = SessionManager(llm_client)
 
 # Dependency to get database manager
 def get_db():
@@ -47,6 +59,10 @@ def get_file_manager():
 def get_llm():
     return llm_client
 
+# Dependency to get the per-conversation agent sessions
+def get_sessions():
+    return session_manager
+
 @app.get("/")
 def read_root():
     return {"message": "Chat Interface API is running", "version": "1.0.0"}
@@ -165,6 +181,7 @@ def delete_conversation(conversation_id: int, db: DatabaseManager = Depends(get_
     
     success = db.delete_conversation(conversation_id)
     if success:
+        session_manager.drop(conversation_id)
         return SuccessResponse(message="Conversation deleted successfully")
     else:
         raise HTTPException(status_code=500, detail="Failed to delete conversation")
@@ -228,31 +245,38 @@ def create_message(conversation_id: int, message_data: MessageCreate, db: Databa
     )
 
 # Chat Endpoint (Main interaction)
+def _get_or_create_conversation(request: ChatRequest, db: DatabaseManager) -> Conversation:
+    """Resolve the conversation targeted by a chat request, creating it if needed"""
+    # Verify user exists
+    user = db.get_user_by_id(request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get or create conversation
+    if request.conversation_id:
+        conversation = db.get_conversation_by_id(request.conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        if conversation.user_id != request.user_id:
+            raise HTTPException(status_code=403, detail="Access denied to this conversation")
+    else:
+        # Create new conversation with message as title (truncated)
+        title = request.message[:50] + "..." if len(request.message) > 50 else request.message
+        conversation = db.create_conversation(request.user_id, title)
+        if not conversation:
+            raise HTTPException(status_code=500, detail="Failed to create conversation")
+    return conversation
+
 @app.post("/chat", response_model=ChatResponse, tags=["Chat"])
-def chat(request: ChatRequest, db: DatabaseManager = Depends(get_db), llm: LLM = Depends(get_llm)):
+async def chat(request: ChatRequest, db: DatabaseManager = Depends(get_db), sessions: SessionManager = Depends(get_sessions)):
     """Main chat endpoint that handles user messages and generates AI responses"""
     try:
-        # Verify user exists
-        user = db.get_user_by_id(request.user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get or create conversation
-        if request.conversation_id:
-            conversation = db.get_conversation_by_id(request.conversation_id)
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-            if conversation.user_id != request.user_id:
-                raise HTTPException(status_code=403, detail="Access denied to this conversation")
-        else:
-            # Create new conversation with message as title (truncated)
-            title = request.message[:50] + "..." if len(request.message) > 50 else request.message
-            conversation = db.create_conversation(request.user_id, title)
-            if not conversation:
-                raise HTTPException(status_code=500, detail="Failed to create conversation")
+        # DatabaseManager is synchronous: keep its calls off the event loop
+        conversation = await run_in_threadpool(_get_or_create_conversation, request, db)
         
         # Create user message
-        user_message = db.create_message(
+        user_message = await run_in_threadpool(
+            db.create_message,
             conversation_id=conversation.id,
             content=request.message,
             role="user"
@@ -263,10 +287,12 @@ def chat(request: ChatRequest, db: DatabaseManager = Depends(get_db), llm: LLM =
         
         # Generate AI response using LLM
         try:
-            ai_response_content = llm.get_completion(request.message)
+            llm = sessions.get(conversation.id)
+            ai_response_content = await llm.aget_completion(request.message)
             
             # Create assistant message
-            assistant_message = db.create_message(
+            assistant_message = await run_in_threadpool(
+                db.create_message,
                 conversation_id=conversation.id,
                 content=ai_response_content,
                 role="assistant"
@@ -278,7 +304,8 @@ def chat(request: ChatRequest, db: DatabaseManager = Depends(get_db), llm: LLM =
         except Exception as e:
             # If LLM fails, create a fallback response
             print(f"[DEBUG] LLM failed: {e}")
-            assistant_message = db.create_message(
+            assistant_message = await run_in_threadpool(
+                db.create_message,
                 conversation_id=conversation.id,
                 content="I apologize, but I'm experiencing technical difficulties. Please try again later.",
                 role="assistant"
@@ -317,6 +344,57 @@ def chat(request: ChatRequest, db: DatabaseManager = Depends(get_db), llm: LLM =
         print(f"[DEBUG] Chat endpoint error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/chat/stream", tags=["Chat"])
+async def chat_stream(request: ChatRequest, db: DatabaseManager = Depends(get_db), sessions: SessionManager = Depends(get_sessions)):
+    """Streaming chat endpoint: reasoning tokens, tool calls and the final answer as Server-Sent Events"""
+    # DatabaseManager is synchronous: keep its calls off the event loop
+    conversation = await run_in_threadpool(_get_or_create_conversation, request, db)
+    
+    user_message = await run_in_threadpool(
+        db.create_message,
+        conversation_id=conversation.id,
+        content=request.message,
+        role="user"
+    )
+    if not user_message:
+        raise HTTPException(status_code=500, detail="Failed to create user message")
+    
+    llm = sessions.get(conversation.id)
+    
+    async def event_stream():
+        yield _sse("message", {"id": user_message.id, "conversation_id": conversation.id})
+        
+        final_content = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+        try:
+            async for event in llm.astream_completion(request.message):
+                if event["type"] == "final":
+                    final_content = event["content"]
+                yield _sse(event["type"], event)
+        except Exception as e:
+            print(f"[DEBUG] LLM stream failed: {e}")
+            yield _sse("error", {"detail": str(e)})
+        
+        assistant_message = await run_in_threadpool(
+            db.create_message,
+            conversation_id=conversation.id,
+            content=final_content,
+            role="assistant"
+        )
+        yield _sse("done", {
+            "assistant_message_id": assistant_message.id if assistant_message else None,
+            "conversation_id": conversation.id
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # File Upload Endpoints
 @app.post("/upload", response_model=FileUploadResponse, tags=["Files"])
 async def upload_file(file: UploadFile = File(...), fm: FileManager = Depends(get_file_manager), db: DatabaseManager = Depends(get_db)):
@@ -384,7 +462,16 @@ def health_check():
         "status": "healthy",
         "database": "connected",
         "file_manager": "ready",
-        "llm": "ready"
+        "llm": "ready",
+        "llm_sessions": session_manager.stats(),
+        "query_cache": QUERY_CACHE.stats(),
+        "columnar_cache": COLUMNAR_CACHE.stats(),
+        "scratchpad": SCRATCHPAD_STORE.stats(),
+        "prompt_cache": PROMPT_CACHE_STATS.stats(),
+        "speculation": SPECULATION_STATS.stats(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "plan_cache": PLAN_CACHE.stats(),
+        "intent_router": INTENT_ROUTER.stats()
     }
 
 if __name__ == "__main__":
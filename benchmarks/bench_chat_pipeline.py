@@ -0,0 +1,348 @@
+"""
+End-to-end latency / throughput of the chat pipeline with a mocked model.
+
+The qa.json questions are replayed --rounds times through LLM.get_completion
+(one forked session per request) and through POST /chat on a local uvicorn
+server. The model is mock_llm_server.py: by default it is started in-process
+with a scripted ReAct run per question (one turn of sql_query calls, then
+the expected answer); --base-url points at an external mock instead.
+
+Phases are summed over all threads and reported per request:
+llm_wait (model client calls), parse (tool-call parsing), tool_exec
+(tool execution, db included), db (SQLite through db_pool),
+serialization (tool results encoded into messages) and, for /chat,
+api_overhead (request time outside the agent: persistence, validation,
+response encoding).
+
+Results are written to --out as JSON; --compare prints the change against a
+previous result file and exits non-zero on a regression above --tolerance.
+
+Usage: python benchmarks/bench_chat_pipeline.py [--rounds 5] [--concurrency 4]
+       [--latency-ms 50] [--tokens-per-s 0] [--cold] [--out bench_chat_pipeline.json]
+       [--compare previous.json] [--targets get_completion,chat]
+"""
+import argparse
+import contextlib
+import datetime
+import functools
+import io
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from openai import AsyncOpenAI, OpenAI  # noqa: E402
+
+import db_pool  # noqa: E402
+import llm as llm_module  # noqa: E402
+from mock_llm_server import ReplayStore, create_app, load_replays  # noqa: E402
+from query_cache import QUERY_CACHE  # noqa: E402
+
+# Scripted tool calls by keyword of the question (first match wins per stage)
+STAGE_QUERIES = [
+    ("EAF", 'SELECT SUM(TOTAL_ELEC_EGY) FROM "02-EAF"'),
+    ("LF", 'SELECT SUM(ELEC_CONS_TOTAL) FROM "03-LF"'),
+]
+DEFAULT_QUERY = 'SELECT COUNT(*) FROM "02-EAF"'
+PHASES = ["llm_wait", "parse", "tool_exec", "db", "serialization"]
+# Compared metrics: (path, higher is better)
+COMPARED = [("latency_ms.p50", False), ("latency_ms.p95", False), ("latency_ms.p99", False), ("rps", True)]
+
+
+def scripted_turns(question, answer):
+    """One turn with the sql_query calls of the stages named in the question, then the answer"""
+    words = question.upper().replace(",", " ").split()
+    queries = [q for stage, q in STAGE_QUERIES if stage in words] or [DEFAULT_QUERY]
+    calls = "\n".join(
+        "```json\n" + json.dumps({"tool_call": {"name": "sql_query", "arguments": {"query": q}}}) + "\n```"
+        for q in queries
+    )
+    return [calls, f"Réponse : {answer}"]
+
+
+class PhaseTimer:
+    """Thread-safe accumulated seconds per phase"""
+
+    def __init__(self):
+        self.totals = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.totals[phase] += seconds
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+
+    def wrap(self, phase, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - start)
+        return timed
+
+    def awrap(self, phase, func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - start)
+        return timed
+
+
+def instrument(timer):
+    """Patch the pipeline's phase boundaries with timers (restored on exit)"""
+    stack = contextlib.ExitStack()
+    LLM = llm_module.LLM
+    for owner, name, phase in [
+        (LLM, "parse_tool_calls", "parse"),
+        (LLM, "execute_tool", "tool_exec"),
+        (LLM, "_tool_message", "serialization"),
+        (llm_module, "_batch_tool_message", "serialization"),
+        (db_pool, "execute_with_columns", "db"),     # db_pool.execute goes through it
+    ]:
+        stack.enter_context(patch.object(owner, name, timer.wrap(phase, getattr(owner, name))))
+    return stack
+
+
+def model_clients(base_url, timer):
+    """Sync and async OpenAI clients on the mock, with the create() calls timed as llm_wait"""
+    client = OpenAI(base_url=base_url, api_key="bench")
+    async_client = AsyncOpenAI(base_url=base_url, api_key="bench")
+    client.chat.completions.create = timer.wrap("llm_wait", client.chat.completions.create)
+    async_client.chat.completions.create = timer.awrap("llm_wait", async_client.chat.completions.create)
+    return client, async_client
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app):
+    """Run an ASGI app with uvicorn in a daemon thread; returns (url, server)"""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]   # nearest rank
+
+    return {
+        "p50": pct(50), "p95": pct(95), "p99": pct(99),
+        "mean": statistics.fmean(ordered), "max": ordered[-1],
+    }
+
+
+def run_target(call, prompts, concurrency, timer, cold, warmup):
+    """Drive `call(prompt)` over the prompts with a thread pool; returns the target report"""
+    for prompt in warmup:
+        call(prompt)
+    timer.reset()
+    latencies, errors = [], 0
+
+    def one(prompt):
+        if cold:
+            QUERY_CACHE.clear()
+        start = time.perf_counter()
+        ok = call(prompt)
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ms, ok in pool.map(one, prompts):
+            latencies.append(ms)
+            errors += not ok
+    wall = time.perf_counter() - start
+
+    n = len(prompts)
+    phases = {p: timer.totals[p] * 1000 / n for p in PHASES}
+    mean = statistics.fmean(latencies)
+    top_level = sum(v for p, v in phases.items() if p != "db")
+    if "agent" in timer.totals:
+        phases["api_overhead"] = max(0.0, mean - timer.totals["agent"] * 1000 / n)
+        top_level += phases["api_overhead"]
+    phases["other"] = max(0.0, mean - top_level)
+    return {
+        "requests": n,
+        "errors": errors,
+        "latency_ms": percentiles(latencies),
+        "rps": n / wall,
+        "phases_ms": phases,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metric(report, path):
+    for key in path.split("."):
+        report = report[key]
+    return report
+
+
+def compare(current, previous_path, tolerance):
+    """Print the change per target/metric; returns the regressions above tolerance"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nvs {previous_path} (commit {previous.get('commit')})")
+    if previous.get("config") != current["config"]:
+        print("  warning: the runs were made with different settings")
+    regressions = []
+    for target, report in current["targets"].items():
+        before = previous.get("targets", {}).get(target)
+        if before is None:
+            continue
+        for path, higher_is_better in COMPARED:
+            old, new = metric(before, path), metric(report, path)
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"  {target:15} {path:15} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((target, path))
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'target':15} {'req':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8}")
+    for target, r in results["targets"].items():
+        lat = r["latency_ms"]
+        print(f"{target:15} {r['requests']:>5} {r['errors']:>4} {lat['p50']:>9.2f} {lat['p95']:>9.2f} {lat['p99']:>9.2f} {r['rps']:>8.1f}")
+    print("\nper-request phases (ms, summed over threads; db is part of tool_exec)")
+    for target, r in results["targets"].items():
+        print(f"  {target:15} " + "  ".join(f"{k}={v:.2f}" for k, v in r["phases_ms"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--qa", default=os.path.join(ROOT, "qa.json"))
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the question set")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mock time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="mock token rate (0 = instant)")
+    parser.add_argument("--replays", nargs="*", help="replay these recordings instead of the scripted runs")
+    parser.add_argument("--base-url", help="use an already running mock server")
+    parser.add_argument("--targets", default="get_completion,chat")
+    parser.add_argument("--cold", action="store_true", help="clear the query cache before each request")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="measure the first pass too")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's debug output")
+    parser.add_argument("--out", default="bench_chat_pipeline.json")
+    parser.add_argument("--compare", help="previous result file")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with open(args.qa, encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+    prompts = [q["question"] for q in questions] * args.rounds
+    targets = args.targets.split(",")
+    # Unmeasured first pass: tool catalog, thread pools, connections
+    warmup = [q["question"] for q in questions] if args.warmup else []
+
+    timer = PhaseTimer()
+    base_url = args.base_url
+    if base_url is None:
+        recordings = load_replays(args.replays) if args.replays else [
+            (q["question"], scripted_turns(q["question"], q["answer"])) for q in questions
+        ]
+        mock_url, _ = serve(create_app(ReplayStore(recordings), args.latency_ms, args.tokens_per_s))
+        base_url = mock_url + "/v1"
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    results = {
+        "benchmark": "chat_pipeline",
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "questions": len(questions), "rounds": args.rounds, "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms, "tokens_per_s": args.tokens_per_s, "cold": args.cold, "warmup": args.warmup,
+            "replays": args.replays, "base_url": args.base_url,
+            "env": {k: os.getenv(k) for k in (
+                "ANSWER_CACHE", "PLAN_CACHE", "INTENT_ROUTER", "LLM_SPECULATIVE_TOOLS", "COLUMNAR_CACHE",
+            )},
+        },
+        "targets": {},
+    }
+
+    with quiet, instrument(timer):
+        if "get_completion" in targets:
+            base = llm_module.LLM()
+            base.client, base.async_client = model_clients(base_url, timer)
+
+            def completion(prompt):
+                answer = base.fork().get_completion(prompt)
+                return bool(answer) and answer != llm_module.MAX_TOOL_CALLS_MESSAGE
+
+            results["targets"]["get_completion"] = run_target(
+                completion, prompts, args.concurrency, timer, args.cold, warmup
+            )
+
+        if "chat" in targets:
+            import api
+            from models import DatabaseManager
+
+            bench_db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "bench_chat.db"))
+            api.app.dependency_overrides[api.get_db] = lambda: bench_db
+            api.llm_client.client, api.llm_client.async_client = model_clients(base_url, timer)
+            # Time spent inside the agent, to separate the API overhead
+            agent_timer = patch.object(
+                llm_module.LLM, "aget_completion", timer.awrap("agent", llm_module.LLM.aget_completion)
+            )
+            api_url, api_server = serve(api.app)
+            user = httpx.post(f"{api_url}/users", json={"username": "bench", "email": "bench@example.com"}).json()
+            http = httpx.Client(timeout=60)
+
+            def chat(prompt):
+                response = http.post(f"{api_url}/chat", json={"message": prompt, "user_id": user["id"]})
+                return response.status_code == 200
+
+            with agent_timer:
+                results["targets"]["chat"] = run_target(chat, prompts, args.concurrency, timer, args.cold, warmup)
+            http.close()
+            api_server.should_exit = True
+
+    print_report(results)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Columnar cache vs row-oriented SQLite scans on dashboard-style aggregates.
+
+Hot tables of databasevf.db are copied into a temporary database and
+replicated --scale times, then each query runs through SQLite and through
+ColumnarCache.aggregate (results are checked to be identical).
+
+Usage: python benchmarks/bench_columnar_cache.py [--db databasevf.db] [--scale 50] [--repeat 5]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calendar_keys  # noqa: E402
+from columnar_cache import ColumnarCache  # noqa: E402
+
+TABLES = ["02-EAF", "03-LF", "05-CCM-Brame"]
+
+# (table, group by, value column, aggregate, where)
+QUERIES = [
+    ("02-EAF", [], "TOTAL_ELEC_EGY", "SUM", None),
+    ("02-EAF", ["STEELGRADECODE_ACT"], "TAPPING_WEIGHT", "SUM", None),
+    ("02-EAF", ["HEATANNOUNCE_ACT__day"], "TOTAL_ELEC_EGY", "SUM", None),
+    ("02-EAF", ["CREWCODE", "STEELGRADECODE_ACT"], "POWER_ON_DUR", "AVG", "CREWCODE IN (1, 2)"),
+    ("03-LF", [], "ELEC_CONS_TOTAL", "SUM", None),
+    ("03-LF", ["HEATANNOUNCE_ACT__month"], "ELEC_CONS_TOTAL", "AVG", None),
+    ("05-CCM-Brame", ["CUT_TIME__month"], "PIECE_WEIGHT_MEAS", "SUM", None),
+    ("05-CCM-Brame", ["CUT_TIME__shift"], "PIECE_WEIGHT_MEAS", "MAX", None),
+]
+
+
+def build_db(source, scale):
+    """Copy the hot tables, replicated `scale` times, into a temporary db"""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(path)
+    for table in TABLES:
+        info = list(src.execute(f'PRAGMA table_info("{table}")'))
+        quoted = ", ".join(f'"{r[1]}"' for r in info)
+        rows = src.execute(f'SELECT {quoted} FROM "{table}"').fetchall()
+        # Base columns only: the calendar keys are added back below
+        dst.execute(f'CREATE TABLE "{table}" ({", ".join(f"{q} {r[2]}" for q, r in zip(quoted.split(", "), info))})')
+        placeholders = ", ".join("?" * len(info))
+        with dst:
+            for _ in range(scale):
+                dst.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', rows)
+        date_cols = [r[1] for r in info if r[2] == "TIMESTAMP"]
+        calendar_keys.add_calendar_keys(dst, table, date_cols)
+    src.close()
+    dst.close()
+    return path
+
+
+def to_sql(table, group_by, value, func, where):
+    groups = ", ".join(f'"{c}"' for c in group_by)
+    sql = f'SELECT {groups + ", " if groups else ""}{func}("{value}") FROM "{table}"'
+    if where:
+        sql += f" WHERE {where}"
+    if groups:
+        sql += f" GROUP BY {groups}"
+    return sql
+
+
+def same(a, b):
+    return len(a) == len(b) and all(
+        x[:-1] == y[:-1] and (x[-1] == y[-1] or abs(x[-1] - y[-1]) <= 1e-9 * abs(x[-1]))
+        for x, y in zip(a, b)
+    )
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="databasevf.db")
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = build_db(args.db, args.scale)
+    conn = sqlite3.connect(path)
+    cache = ColumnarCache(TABLES, path=path)
+
+    start = time.perf_counter()
+    for table in TABLES:
+        cache.get(table)
+    print(f"Columnar load: {(time.perf_counter() - start) * 1000:.0f} ms (one-off, per db change)\n")
+
+    print(f"{'query':70} {'rows':>8} {'sqlite ms':>10} {'columnar ms':>12} {'speedup':>8}")
+    total_sql = total_col = 0.0
+    for table, group_by, value, func, where in QUERIES:
+        sql = to_sql(table, group_by, value, func, where)
+        sql_ms, expected = timed(lambda: conn.execute(sql).fetchall(), args.repeat)
+        col_ms, got = timed(lambda: cache.aggregate(table, group_by, value, func, where), args.repeat)
+        assert same(expected, got), f"Mismatch for {sql}"
+        n = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        total_sql += sql_ms
+        total_col += col_ms
+        print(f"{sql[:70]:70} {n:>8} {sql_ms:>10.2f} {col_ms:>12.2f} {sql_ms / col_ms:>7.1f}x")
+    print(f"\n{'total':70} {'':>8} {total_sql:>10.2f} {total_col:>12.2f} {total_sql / total_col:>7.1f}x")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Single-pass tool-call parser (tool_call_parser) vs the previous
+five-strategy LLM.parse_tool_call (kept below as reference).
+
+Each sample reply is parsed --repeat times by both parsers, with their
+debug output discarded; the streaming case feeds the same reply to
+ToolCallParser in small chunks. The first call found must match
+(same tool and argument names).
+
+Usage: python benchmarks/bench_tool_call_parser.py [--repeat 2000] [--chunk 16]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_call_parser import ToolCallParser, parse_tool_calls  # noqa: E402
+
+TOOL_TAG_RE = re.compile(
+    r"tool▁call▁begin.*?tool▁sep.*?(\w+)\s*```json\s*([\s\S]+?)```",
+    re.DOTALL
+)
+
+
+def legacy_parse_tool_call(msg):
+    print("[DEBUG] Parsing tool call from message")
+    
+    # 1) Format natif {"tool_call": …}
+    blocks = re.findall(r"```json\s*([\s\S]*?)\s*```", msg)
+    for b in blocks:
+        try:
+            # Normalize whitespace and newlines in JSON before parsing
+            normalized_json = re.sub(r'(?<!\\)\n', '\\n', b)
+            obj = json.loads(normalized_json)
+            if "tool_call" in obj:
+                print(f"[DEBUG] Found tool call in JSON format: {obj['tool_call']['name']}")
+                return obj["tool_call"]
+        except json.JSONDecodeError as e:
+            print(f"[DEBUG] JSON decode error in tool call parsing: {str(e)}")
+            # Try to fix common JSON errors
+            try:
+                # Fix trailing commas
+                fixed_json = re.sub(r',\s*}', '}', b)
+                fixed_json = re.sub(r',\s*]', ']', fixed_json)
+                # Normalize newlines in strings
+                fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
+                obj = json.loads(fixed_json)
+                if "tool_call" in obj:
+                    print(f"[DEBUG] Found tool call after fixing JSON: {obj['tool_call']['name']}")
+                    return obj["tool_call"]
+            except Exception:
+                print("[DEBUG] Failed to fix JSON format")
+                pass
+
+    # 2) Try direct JSON format without tool_call wrapper
+    for b in blocks:
+        try:
+            # Normalize whitespace and newlines in JSON before parsing
+            normalized_json = re.sub(r'(?<!\\)\n', '\\n', b)
+            obj = json.loads(normalized_json)
+            if "name" in obj and "arguments" in obj:
+                print(f"[DEBUG] Found direct tool call format: {obj['name']}")
+                return obj
+        except json.JSONDecodeError as e:
+            print(f"[DEBUG] JSON decode error in direct format parsing: {str(e)}")
+            # Try to fix common JSON errors
+            try:
+                # Fix trailing commas
+                fixed_json = re.sub(r',\s*}', '}', b)
+                fixed_json = re.sub(r',\s*]', ']', fixed_json)
+                # Normalize newlines in strings
+                fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
+                obj = json.loads(fixed_json)
+                if "name" in obj and "arguments" in obj:
+                    print(f"[DEBUG] Found direct tool call after fixing JSON: {obj['name']}")
+                    return obj
+            except Exception:
+                print("[DEBUG] Failed to fix JSON format")
+                pass
+            
+    # 3) Fallback : balises <|tool▁call▁begin|>
+    m = TOOL_TAG_RE.search(msg)
+    if m:
+        try:
+            name = m.group(1)
+            args_text = m.group(2)
+            # Normalize whitespace and newlines in JSON before parsing
+            normalized_json = re.sub(r'(?<!\\)\n', '\\n', args_text)
+            args = json.loads(normalized_json)
+            print(f"[DEBUG] Found tool call using regex: {name}")
+            return {"name": name, "arguments": args}
+        except json.JSONDecodeError as e:
+            print(f"[DEBUG] JSON decode error in regex pattern: {str(e)}")
+            # Try to fix common JSON errors
+            try:
+                # Fix trailing commas
+                fixed_json = re.sub(r',\s*}', '}', args_text)
+                fixed_json = re.sub(r',\s*]', ']', fixed_json)
+                # Normalize newlines in strings
+                fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
+                args = json.loads(fixed_json)
+                print(f"[DEBUG] Found tool call after fixing JSON: {name}")
+                return {"name": name, "arguments": args}
+            except Exception:
+                print("[DEBUG] Failed to fix JSON format")
+                pass
+
+    # 4) Last attempt: Try to find any JSON object with name and arguments
+    try:
+        # Look for any JSON-like structure in the message
+        potential_json_matches = re.finditer(r'{[\s\S]*?}', msg)
+        for match in potential_json_matches:
+            try:
+                json_str = match.group(0)
+                # Normalize whitespace and newlines in JSON before parsing
+                normalized_json = re.sub(r'(?<!\\)\n', '\\n', json_str)
+                obj = json.loads(normalized_json)
+                
+                # Check for tool_call wrapper
+                if "tool_call" in obj and "name" in obj["tool_call"] and "arguments" in obj["tool_call"]:
+                    print(f"[DEBUG] Found tool call in raw JSON: {obj['tool_call']['name']}")
+                    return obj["tool_call"]
+                
+                # Check for direct format
+                if "name" in obj and "arguments" in obj:
+                    print(f"[DEBUG] Found tool call in raw JSON: {obj['name']}")
+                    return obj
+            except json.JSONDecodeError as e:
+                print(f"[DEBUG] Failed to parse potential JSON match: {str(e)}")
+                # Try to fix common JSON errors
+                try:
+                    # Fix trailing commas
+                    fixed_json = re.sub(r',\s*}', '}', json_str)
+                    fixed_json = re.sub(r',\s*]', ']', fixed_json)
+                    # Normalize newlines in strings
+                    fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
+                    obj = json.loads(fixed_json)
+                    
+                    # Check for tool_call wrapper
+                    if "tool_call" in obj and "name" in obj["tool_call"] and "arguments" in obj["tool_call"]:
+                        print(f"[DEBUG] Found tool call after fixing JSON: {obj['tool_call']['name']}")
+                        return obj["tool_call"]
+                    
+                    # Check for direct format
+                    if "name" in obj and "arguments" in obj:
+                        print(f"[DEBUG] Found tool call after fixing JSON: {obj['name']}")
+                        return obj
+                except Exception:
+                    print("[DEBUG] Failed to fix JSON format")
+                    continue
+    except Exception as e:
+        print(f"[DEBUG] Failed to parse raw JSON: {str(e)}")
+        pass
+
+    # 5) Special case: Fix SQL query fragments with line breaks
+    try:
+        # Look for tool_call with sql_query and fix the query parameter
+        sql_pattern = re.search(r'{\s*"tool_call"\s*:\s*{\s*"name"\s*:\s*"sql_query"\s*,\s*"arguments"\s*:\s*{\s*"query"\s*:\s*"(.*?)"\s*}\s*}\s*}', msg, re.DOTALL)
+        if sql_pattern:
+            query_text = sql_pattern.group(1)
+            # Clean up the query text - remove unescaped newlines and trailing fragments
+            clean_query = re.sub(r'(?<!\\)\n', ' ', query_text)
+            # Remove any trailing fragments that might cause JSON parsing issues
+            clean_query = re.sub(r',\s*\w+,\s*$', '', clean_query)
+            clean_query = re.sub(r'\w+,\s*$', '', clean_query)
+            clean_query = re.sub(r'\w+;\s*"\s*$', '"', clean_query)
+            
+            fixed_json = f'{{"tool_call": {{"name": "sql_query", "arguments": {{"query": "{clean_query}"}}}}}}'
+            obj = json.loads(fixed_json)
+            print(f"[DEBUG] Fixed SQL query tool call")
+            return obj["tool_call"]
+    except Exception as e:
+        print(f"[DEBUG] Failed to fix SQL query: {str(e)}")
+        pass
+
+    print("[DEBUG] No tool call found in message")
+    return None
+
+
+REASONING = "Je dois d'abord vérifier la consommation électrique de l'EAF par coulée, puis agréger par jour. " * 80
+SAMPLES = {
+    "fenced call": '```json\n{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT SUM(\\"kWh\\") FROM \\"EAF-Consommation\\""}}}\n```',
+    "multiline SQL": '```json\n{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT DATE_TIME,\n  SUM(kwh)\nFROM t\nGROUP BY 1"}}}\n```',
+    "after reasoning": REASONING + '\n```json\n{"tool_call": {"name": "get_db_schema", "arguments": {}}}\n```',
+    "deepseek tag": '<｜tool▁calls▁begin｜><｜tool▁call▁begin｜>function<｜tool▁sep｜>get_db_schema\n```json\n{"table": "EAF-Analyses"}\n```<｜tool▁call▁end｜>',
+    "final html": "```html\n<html><style>body { margin: 0 } .kpi { color: red }</style><body>" + "<p>Total : 12345.678 kWh</p>" * 40 + "</body></html>\n```",
+}
+
+
+def _shape(call):
+    # The legacy parser only recovers multi-line SQL through its last
+    # fallback, which collapses the newlines: compare names and argument keys
+    return call and (call["name"], sorted(call["arguments"]))
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def stream(text, size):
+    parser = ToolCallParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    parser.close()
+    return parser.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{args.repeat} parses per sample, stream chunks of {args.chunk} chars")
+    print(f"{'sample':<17}{'chars':>7}{'legacy ms':>11}{'new ms':>9}{'stream ms':>11}{'speedup':>9}")
+    total_old = total_new = 0.0
+    for name, text in SAMPLES.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected, t_old = timed(lambda: legacy_parse_tool_call(text), args.repeat)
+        got, t_new = timed(lambda: parse_tool_calls(text), args.repeat)
+        streamed, t_stream = timed(lambda: stream(text, args.chunk), args.repeat)
+        assert _shape(got[0] if got else None) == _shape(expected), name
+        assert streamed == got, name
+        total_old += t_old
+        total_new += t_new
+        per = 1000 / args.repeat
+        print(f"{name:<17}{len(text):>7}{t_old * per:>11.4f}{t_new * per:>9.4f}{t_stream * per:>11.4f}{t_old / t_new:>8.1f}x")
+    print(f"{'total':<17}{'':>7}{total_old * 1000 / args.repeat:>11.4f}{total_new * 1000 / args.repeat:>9.4f}{'':>11}{total_old / total_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+NumPy statistics helpers of Tools vs the previous pure-Python versions.
+
+A value column of EAF-Analyses is tiled to --points values, then each
+helper runs through the legacy implementation (kept below as reference)
+and through Tools; outputs are checked to match.
+
+Usage: python benchmarks/bench_tools_stats.py [--db databasevf.db] [--column _Mn] [--points 1000000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import Tools  # noqa: E402
+
+
+def legacy_moving_average(values, window):
+    ma = []
+    for i in range(len(values)):
+        if i < window - 1:
+            ma.append(values[i])
+        else:
+            ma.append(sum(values[i - window + 1 : i + 1]) / window)
+    return ma
+
+
+def legacy_zscore(values):
+    mean_val = sum(values) / len(values)
+    std = (sum((v - mean_val) ** 2 for v in values) / len(values)) ** 0.5
+    return [(v - mean_val) / std if std != 0 else 0.0 for v in values]
+
+
+def legacy_detect_outliers(values, threshold=1.5):
+    q1 = sorted(values)[len(values) // 4]
+    q3 = sorted(values)[3 * len(values) // 4]
+    iqr = q3 - q1
+    lo, hi = q1 - threshold * iqr, q3 + threshold * iqr
+    return [i for i, v in enumerate(values) if v < lo or v > hi]
+
+
+def legacy_normalize_series(values):
+    vmin, vmax = min(values), max(values)
+    if vmax == vmin:
+        return [0.0] * len(values)
+    return [(v - vmin) / (vmax - vmin) for v in values]
+
+
+def load_series(db, column, points):
+    conn = sqlite3.connect(db)
+    try:
+        base = [r[0] for r in conn.execute(
+            f'SELECT "{column}" FROM "EAF-Analyses" WHERE "{column}" IS NOT NULL ORDER BY DATE_TIME'
+        )]
+    finally:
+        conn.close()
+    if not base:
+        raise SystemExit(f"No values in EAF-Analyses.{column}")
+    reps = points // len(base) + 1
+    return (base * reps)[:points]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="databasevf.db")
+    parser.add_argument("--column", default="_Mn")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=20)
+    args = parser.parse_args()
+
+    values = load_series(args.db, args.column, args.points)
+    tools = Tools()
+    w = args.window
+    cases = [
+        ("moving_average", lambda: legacy_moving_average(values, w), lambda: tools.moving_average(values, w)),
+        ("zscore", lambda: legacy_zscore(values), lambda: tools.zscore(values)),
+        ("detect_outliers", lambda: legacy_detect_outliers(values), lambda: tools.detect_outliers(values)),
+        ("normalize_series", lambda: legacy_normalize_series(values), lambda: tools.normalize_series(values)),
+    ]
+
+    print(f"{len(values):,} points from EAF-Analyses.{args.column}, window={w}")
+    print(f"{'helper':<18}{'legacy s':>10}{'numpy s':>10}{'speedup':>9}")
+    total_old = total_new = 0.0
+    for name, legacy, vectorized in cases:
+        expected, t_old = timed(legacy)
+        got, t_new = timed(vectorized)
+        if name == "detect_outliers":
+            assert got == expected, name
+        else:
+            assert max(abs(a - b) for a, b in zip(got, expected)) < 1e-9, name
+        total_old += t_old
+        total_new += t_new
+        print(f"{name:<18}{t_old:>10.3f}{t_new:>10.3f}{t_old / t_new:>8.1f}x")
+    print(f"{'total':<18}{total_old:>10.3f}{total_new:>10.3f}{total_old / total_new:>8.1f}x")
+
+    for name, fn in [
+        ("rolling_std", lambda: tools.rolling_std(values, w)),
+        ("rolling_median", lambda: tools.rolling_median(values, w)),
+        ("ewma", lambda: tools.ewma(values, 0.3)),
+    ]:
+        _, t = timed(fn)
+        print(f"{name:<18}{'':>10}{t:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
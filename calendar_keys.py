@@ -0,0 +1,190 @@
+# calendar_keys.py
+"""
+Dates typées + clés calendaires précalculées pour *databasevf.db*.
+
+À l'import, les colonnes date (HEATANNOUNCE_ACT, DATE_TIME,
+LADLE_ARRIVAL_TIME…) sont normalisées en texte ISO
+`YYYY-MM-DD HH:MM:SS` (déclaré TIMESTAMP) : l'ordre lexical = l'ordre
+chronologique, donc les bornes `>=` / `<` utilisent les index.
+
+Chaque colonne date `<col>` reçoit ensuite des colonnes générées
+VIRTUAL indexées :
+
+    <col>__day    'YYYY-MM-DD'
+    <col>__week   'YYYY-Www'   (semaine commençant le lundi, %W)
+    <col>__month  'YYYY-MM'
+    <col>__shift  1 (06h-14h) | 2 (14h-22h) | 3 (22h-06h)
+
+Les outils de séries temporelles regroupent directement sur ces clés
+au lieu de rappeler strftime() ligne par ligne.
+
+Usage sur une base existante : `python calendar_keys.py [databasevf.db]`
+"""
+from __future__ import annotations
+
+import itertools
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+DATE_STORAGE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Début des postes (3 x 8 h)
+SHIFT_START_HOURS = (6, 14, 22)
+
+# Format strftime → suffixe de clé (utilisé par get_timeseries_data_for_chart)
+FORMAT_TO_KEY = {
+    "%Y-%m-%d": "day",
+    "%Y-W%W": "week",
+    "%Y-%m": "month",
+}
+
+_DATE_TEXT_RE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$")
+_SAMPLE_SIZE = 200
+
+
+def key_expressions(col: str) -> Dict[str, str]:
+    """
+    Expressions SQL des clés calendaires de `col` (supposée normalisée).
+    """
+    c = f'"{col}"'
+    hour = f"substr({c}, 12, 2)"
+    morning, afternoon, night = (f"'{h:02d}'" for h in SHIFT_START_HOURS)
+    return {
+        "day": f"substr({c}, 1, 10)",
+        "week": f"strftime('%Y-W%W', {c})",
+        "month": f"substr({c}, 1, 7)",
+        "shift": (
+            f"CASE WHEN {c} IS NULL THEN NULL "
+            f"WHEN {hour} >= {night} OR {hour} < {morning} THEN 3 "
+            f"WHEN {hour} >= {afternoon} THEN 2 ELSE 1 END"
+        ),
+    }
+
+
+def key_column(col: str, key: str) -> str:
+    return f"{col}__{key}"
+
+
+def looks_like_dates(values: Iterable[Any]) -> bool:
+    """
+    Vrai si les valeurs non nulles (échantillon) sont des datetime ou du
+    texte au format date ISO.
+    """
+    sample = [v for v in itertools.islice((v for v in values if v is not None), _SAMPLE_SIZE)]
+    return bool(sample) and all(
+        isinstance(v, datetime) or (isinstance(v, str) and _DATE_TEXT_RE.match(v.strip()))
+        for v in sample
+    )
+
+
+def to_storage(value: Any) -> Optional[str]:
+    """
+    Une valeur date (datetime ou texte ISO) au format `DATE_STORAGE_FORMAT`.
+    Un texte non reconnu est conservé tel quel.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return value
+    return value.strftime(DATE_STORAGE_FORMAT)
+
+
+def detect_date_columns(df: pd.DataFrame) -> List[str]:
+    """
+    Colonnes datetime64, ou texte dont toutes les valeurs échantillonnées
+    ressemblent à une date ISO.
+    """
+    cols = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            cols.append(col)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if looks_like_dates(series.dropna().head(_SAMPLE_SIZE)):
+                cols.append(col)
+    return cols
+
+
+def normalize_dates(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Réécrit les colonnes date au format `DATE_STORAGE_FORMAT`.
+
+    Returns
+    -------
+    (DataFrame, list[str])
+        Le DataFrame modifié et les colonnes date détectées.
+    """
+    date_cols = detect_date_columns(df)
+    for col in date_cols:
+        parsed = pd.to_datetime(df[col], errors="coerce")
+        df[col] = parsed.dt.strftime(DATE_STORAGE_FORMAT).astype(object).where(parsed.notna(), None)
+    return df, date_cols
+
+
+def add_calendar_keys(
+    conn: sqlite3.Connection,
+    table: str,
+    date_cols: List[str],
+    commit: bool = True,
+) -> List[str]:
+    """
+    Ajoute (si absentes) les colonnes générées + leurs index.
+    `commit=False` pour rester dans la transaction de l'appelant.
+
+    Returns
+    -------
+    list[str]
+        Colonnes générées créées.
+    """
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_xinfo("{table}")')}
+    created = []
+    for col in date_cols:
+        for key, expr in key_expressions(col).items():
+            name = key_column(col, key)
+            if name not in existing:
+                conn.execute(
+                    f'ALTER TABLE "{table}" ADD COLUMN "{name}" '
+                    f"GENERATED ALWAYS AS ({expr}) VIRTUAL"
+                )
+                created.append(name)
+            index = re.sub(r"\W+", "_", f"idx_{table}_{name}".lower())
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{index}" ON "{table}" ("{name}")')
+    if commit:
+        conn.commit()
+    return created
+
+
+def upgrade_database(db_file: str) -> None:
+    """
+    Normalise et ajoute les clés calendaires sur une base déjà importée.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for table in tables:
+            df = pd.read_sql_query(f'SELECT * FROM "{table}" LIMIT {_SAMPLE_SIZE}', conn)
+            date_cols = [c for c in detect_date_columns(df) if "__" not in c]
+            if not date_cols:
+                continue
+            for col in date_cols:
+                # Même format que normalize_dates, sans recharger la table
+                conn.execute(
+                    f'UPDATE "{table}" SET "{col}" = strftime(\'%Y-%m-%d %H:%M:%S\', "{col}") '
+                    f'WHERE "{col}" IS NOT NULL'
+                )
+            created = add_calendar_keys(conn, table, date_cols)
+            print(f"[DEBUG] {table}: {len(date_cols)} date column(s), {len(created)} calendar key(s) added")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    upgrade_database(sys.argv[1] if len(sys.argv) > 1 else "databasevf.db")
@@ -0,0 +1,381 @@
+# columnar_cache.py
+"""
+Cache analytique colonnaire (NumPy) pour les tables « chaudes »
+(02-EAF, 03-LF, 05-CCM-Brame par défaut).
+
+Chaque table est chargée une fois en mémoire, colonne par colonne :
+
+- numérique → tableau int64 / float64 + masque des NULL,
+- texte     → codes int32 vers un dictionnaire trié (dictionary encoding).
+
+Les appels aggregate / filter / group-by des outils sont servis par des
+noyaux vectorisés (bincount, unique, masques) au lieu d'un scan SQLite
+ligne à ligne. Le cache se recharge quand la base change (même empreinte
+que query_cache) et renvoie None pour tout ce qu'il ne sait pas traiter :
+l'appelant retombe alors sur le SQL.
+
+Activation : `COLUMNAR_CACHE=1` (désactivé par défaut),
+tables : `COLUMNAR_CACHE_TABLES=02-EAF,03-LF,05-CCM-Brame`.
+"""
+from __future__ import annotations
+
+import operator
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import db_pool
+from query_cache import db_fingerprint
+
+_OPS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne, "<>": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+_LITERAL = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?"
+_IDENT = r'"([^"]+)"|(\w+)'
+_CMP_RE = re.compile(rf"^\s*(?:{_IDENT})\s*(==|=|!=|<>|<=|>=|<|>)\s*({_LITERAL})\s*$")
+_IN_RE = re.compile(rf"^\s*(?:{_IDENT})\s+(NOT\s+)?IN\s*\(\s*((?:{_LITERAL})(?:\s*,\s*(?:{_LITERAL}))*)\s*\)\s*$", re.IGNORECASE)
+_NULL_RE = re.compile(rf"^\s*(?:{_IDENT})\s+IS\s+(NOT\s+)?NULL\s*$", re.IGNORECASE)
+_AND_RE = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+def _literal(text: str) -> Any:
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    return float(text) if any(c in text for c in ".eE") else int(text)
+
+
+class Column:
+    """
+    Une colonne en mémoire.
+
+    kind = "int" | "float" → `values` numériques ;
+    kind = "text" → `values` = codes int32 (-1 = NULL) vers `dictionary`.
+    `valid` = masque des valeurs non NULL.
+    """
+
+    __slots__ = ("kind", "values", "valid", "dictionary", "_ranks", "_levels")
+
+    def __init__(self, kind: str, values: np.ndarray, valid: np.ndarray, dictionary: Optional[np.ndarray] = None):
+        self.kind = kind
+        self.values = values
+        self.valid = valid
+        self.dictionary = dictionary
+        self._ranks: Optional[np.ndarray] = None
+        self._levels: Optional[List[Any]] = None
+
+    @classmethod
+    def from_values(cls, values: Tuple[Any, ...]) -> Optional["Column"]:
+        """Encode une colonne SQLite ; None si les types sont mélangés."""
+        valid = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+        present = [v for v in values if v is not None]
+        if all(isinstance(v, int) for v in present):
+            return cls("int", np.array([v if v is not None else 0 for v in values], dtype=np.int64), valid)
+        if all(isinstance(v, (int, float)) for v in present):
+            return cls("float", np.array([v if v is not None else np.nan for v in values], dtype=np.float64), valid)
+        if all(isinstance(v, str) for v in present):
+            dictionary, codes = np.unique(np.array(present, dtype=object), return_inverse=True)
+            full = np.full(len(values), -1, dtype=np.int32)
+            full[valid] = codes
+            return cls("text", full, valid, dictionary)
+        return None
+
+    def to_list(self, rows: Any) -> List[Any]:
+        """Valeurs Python (types SQLite) des lignes `rows`, NULL → None."""
+        valid = self.valid[rows]
+        if self.kind == "text":
+            values = self.dictionary[np.where(valid, self.values[rows], 0)] if len(self.dictionary) else np.full(len(valid), None)
+        else:
+            values = self.values[rows]
+        out = values.tolist()
+        if not valid.all():
+            for i in np.flatnonzero(~valid):
+                out[i] = None
+        return out
+
+    def ranks(self) -> Tuple[np.ndarray, List[Any]]:
+        """
+        Rang trié de chaque ligne (0 = NULL, en premier comme SQLite) et
+        valeur de chaque rang ; calculé une fois par chargement.
+        """
+        if self._ranks is None:
+            if self.kind == "text":
+                # Dictionnaire trié : l'ordre des codes est l'ordre des chaînes
+                self._ranks = self.values.astype(np.int64) + 1
+                self._levels = [None] + self.dictionary.tolist()
+            else:
+                uniq, inverse = np.unique(self.values[self.valid], return_inverse=True)
+                self._ranks = np.zeros(len(self.values), dtype=np.int64)
+                self._ranks[self.valid] = inverse.reshape(-1) + 1
+                self._levels = [None] + uniq.tolist()
+        return self._ranks, self._levels
+
+    def mask(self, op: str, literal: Any) -> Optional[np.ndarray]:
+        """Masque booléen de `col <op> literal` (NULL → faux)."""
+        fn = _OPS[op]
+        if self.kind == "text":
+            if not isinstance(literal, str):
+                return None  # affinité TEXT vs nombre : laissé à SQLite
+            lut = np.fromiter((fn(v, literal) for v in self.dictionary), dtype=bool, count=len(self.dictionary))
+            return np.append(lut, False)[self.values]
+        if isinstance(literal, str):
+            return None
+        return fn(self.values, literal) & self.valid
+
+
+class ColumnarTable:
+    def __init__(self, name: str, columns: Dict[str, Column], n_rows: int, complete: bool):
+        self.name = name
+        self.columns = columns
+        self.n_rows = n_rows
+        # False si une colonne aux types mélangés n'a pas pu être encodée
+        self.complete = complete
+        self._lookup = {c.lower(): c for c in columns}
+
+    def column(self, name: str) -> Optional[Column]:
+        key = self._lookup.get(name.strip().strip('"').lower())
+        return self.columns.get(key) if key else None
+
+    def where(self, clause: Optional[str]) -> Any:
+        """
+        Lignes retenues par une conjonction simple (`col op littéral`,
+        `col [NOT] IN (…)`, `col IS [NOT] NULL`, reliés par AND) : tableau
+        d'indices, `slice(None)` sans filtre, None si la clause sort de ce
+        sous-ensemble.
+        """
+        if not clause or not clause.strip():
+            return slice(None)
+        if any(_AND_RE.search(lit) for lit in _STRING_LITERAL_RE.findall(clause)):
+            return None  # AND dans un littéral : découpage ambigu
+        mask = np.ones(self.n_rows, dtype=bool)
+        for term in _AND_RE.split(clause):
+            term_mask = self._term_mask(term)
+            if term_mask is None:
+                return None
+            mask &= term_mask
+        return np.flatnonzero(mask)
+
+    def _term_mask(self, term: str) -> Optional[np.ndarray]:
+        m = _CMP_RE.match(term)
+        if m:
+            col = self.column(m.group(1) or m.group(2))
+            return col.mask(m.group(3), _literal(m.group(4))) if col else None
+        m = _IN_RE.match(term)
+        if m:
+            col = self.column(m.group(1) or m.group(2))
+            if col is None:
+                return None
+            mask = np.zeros(self.n_rows, dtype=bool)
+            for lit in re.findall(_LITERAL, m.group(4)):
+                part = col.mask("=", _literal(lit))
+                if part is None:
+                    return None
+                mask |= part
+            return (~mask & col.valid) if m.group(3) else mask
+        m = _NULL_RE.match(term)
+        if m:
+            col = self.column(m.group(1) or m.group(2))
+            if col is None:
+                return None
+            return col.valid.copy() if m.group(3) else ~col.valid
+        return None
+
+
+class ColumnarCache:
+    """
+    Tables chaudes en mémoire, rechargées quand la base change.
+
+    Parameters
+    ----------
+    tables : list[str]
+        Tables éligibles.
+    enabled : bool
+    path : str, optional
+        Base SQLite (défaut : db_pool.DB_PATH).
+    """
+
+    AGG_FUNCS = ("SUM", "AVG", "MIN", "MAX", "COUNT")
+
+    def __init__(self, tables: List[str], enabled: bool = True, path: Optional[str] = None):
+        self.tables = {t.lower(): t for t in tables}
+        self.enabled = enabled
+        self.path = path
+        self._loaded: Dict[str, ColumnarTable] = {}
+        self._fingerprint: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.served = 0
+
+    def get(self, table_name: str) -> Optional[ColumnarTable]:
+        """Table en mémoire (chargée à la demande), ou None si non éligible."""
+        if not self.enabled:
+            return None
+        name = self.tables.get(table_name.strip().strip('"').lower())
+        if name is None:
+            return None
+        path = self.path or db_pool.DB_PATH
+        with self._lock:
+            fp = db_fingerprint(path)
+            if fp != self._fingerprint:
+                self._loaded.clear()
+                self._fingerprint = fp
+            table = self._loaded.get(name)
+            if table is None:
+                table = self._load(name, path)
+                if table is not None:
+                    self._loaded[name] = table
+            return table
+
+    def _load(self, name: str, path: str) -> Optional[ColumnarTable]:
+        try:
+            cols, rows = db_pool.execute_with_columns(f'SELECT * FROM "{name}" ORDER BY rowid', path=path)
+        except Exception as e:
+            print(f"[DEBUG] Columnar cache cannot load {name}: {e}")
+            return None
+        columns = {}
+        for col, values in zip(cols, zip(*rows) if rows else [()] * len(cols)):
+            encoded = Column.from_values(values)
+            if encoded is not None:
+                columns[col] = encoded
+        self.loads += 1
+        print(f"[DEBUG] Columnar cache loaded {name}: {len(rows)} rows, {len(columns)}/{len(cols)} columns")
+        return ColumnarTable(name, columns, len(rows), complete=len(columns) == len(cols))
+
+    # ──────────────────────────────────────────────
+    # Noyaux
+    # ──────────────────────────────────────────────
+    def aggregate(
+        self,
+        table_name: str,
+        group_by_cols: List[str],
+        agg_col: str,
+        agg_func: str = "SUM",
+        where_clause: Optional[str] = None,
+    ) -> Optional[List[tuple]]:
+        """
+        Équivalent de `SELECT g1, …, AGG(col) FROM t [WHERE …] GROUP BY g1, …`
+        (groupes dans l'ordre de tri SQLite, NULL en premier).
+
+        Returns
+        -------
+        list[tuple] | None
+            None = non servi, utiliser le SQL.
+        """
+        func = agg_func.strip().upper()
+        table = self.get(table_name)
+        if table is None or func not in self.AGG_FUNCS:
+            return None
+        value = table.column(agg_col)
+        groups = [table.column(c) for c in group_by_cols or []]
+        if value is None or any(g is None for g in groups):
+            return None
+        if value.kind == "text" and func not in ("MIN", "MAX", "COUNT"):
+            return None
+        rows = table.where(where_clause)
+        if rows is None:
+            return None
+        n = table.n_rows if isinstance(rows, slice) else len(rows)
+
+        if groups:
+            # Clé composite en base mixte : l'ordre des clés = ORDER BY g1, g2…
+            key = np.zeros(n, dtype=np.int64)
+            radix = 1
+            for col in groups:
+                ranks, levels = col.ranks()
+                radix *= len(levels)
+                if radix >= 1 << 62:
+                    return None
+                key = key * len(levels) + ranks[rows]
+            if radix <= 4 * n + 1024:
+                # Peu de combinaisons : comptage direct, O(n)
+                present = np.flatnonzero(np.bincount(key, minlength=radix))
+                remap = np.zeros(radix, dtype=np.int64)
+                remap[present] = np.arange(len(present))
+                keys, inverse = present, remap[key]
+            else:
+                keys, inverse = np.unique(key, return_inverse=True)
+                inverse = inverse.reshape(-1)
+            n_groups = len(keys)
+        else:
+            keys = np.zeros(1, dtype=np.int64)
+            inverse = np.zeros(n, dtype=np.int64)
+            n_groups = 1
+
+        results = self._reduce(value, rows, inverse, n_groups, func)
+        heads = []
+        for col in reversed(groups):
+            _, levels = col.ranks()
+            keys, digit = np.divmod(keys, len(levels))
+            heads.append([levels[d] for d in digit.tolist()])
+        heads.reverse()
+        self.served += 1
+        return [tuple(h[g] for h in heads) + (results[g],) for g in range(n_groups)]
+
+    @staticmethod
+    def _reduce(col: Column, rows: Any, inverse: np.ndarray, n_groups: int, func: str) -> List[Any]:
+        valid = col.valid[rows]
+        idx = inverse[valid]
+        counts = np.bincount(idx, minlength=n_groups)
+        if func == "COUNT":
+            return counts.tolist()
+        values = col.values[rows][valid]
+        if col.kind == "text":
+            levels = col.dictionary.tolist()
+            return ColumnarCache._min_max(values, idx, counts, n_groups, func, lambda c: levels[c])
+
+        cast = int if col.kind == "int" else float
+        if func in ("MIN", "MAX"):
+            return ColumnarCache._min_max(values, idx, counts, n_groups, func, cast)
+        if col.kind == "int":
+            sums = np.zeros(n_groups, dtype=np.int64)
+            np.add.at(sums, idx, values)
+        else:
+            # bincount additionne dans l'ordre des lignes, comme SQLite
+            sums = np.bincount(idx, weights=values, minlength=n_groups)
+        sums, counts = sums.tolist(), counts.tolist()
+        if func == "SUM":
+            return [cast(s) if c else None for s, c in zip(sums, counts)]
+        return [s / c if c else None for s, c in zip(sums, counts)]
+
+    @staticmethod
+    def _min_max(values, idx, counts, n_groups, func, cast) -> List[Any]:
+        if values.dtype.kind == "f":
+            init = np.inf if func == "MIN" else -np.inf
+        else:
+            info = np.iinfo(values.dtype)
+            init = info.max if func == "MIN" else info.min
+        picked = np.full(n_groups, init, dtype=values.dtype)
+        (np.minimum if func == "MIN" else np.maximum).at(picked, idx, values)
+        return [cast(v) if c else None for v, c in zip(picked.tolist(), counts.tolist())]
+
+    def filter(self, table_name: str, where_clause: Optional[str]) -> Optional[List[tuple]]:
+        """
+        Équivalent de `SELECT * FROM t WHERE …` ; None si non servi.
+        """
+        table = self.get(table_name)
+        if table is None or not table.complete:
+            return None
+        rows = table.where(where_clause)
+        if rows is None:
+            return None
+        columns = [col.to_list(rows) for col in table.columns.values()]
+        self.served += 1
+        return list(zip(*columns)) if columns else []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tables": sorted(self._loaded),
+            "loads": self.loads,
+            "served": self.served,
+        }
+
+
+COLUMNAR_CACHE = ColumnarCache(
+    [t.strip() for t in os.getenv("COLUMNAR_CACHE_TABLES", "02-EAF,03-LF,05-CCM-Brame").split(",") if t.strip()],
+    enabled=os.getenv("COLUMNAR_CACHE", "0") == "1",
+)
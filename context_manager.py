@@ -0,0 +1,211 @@
+# context_manager.py
+"""
+Compactage de l'historique de conversation sous un budget de tokens.
+
+- Le nombre de tokens de chaque message est calculé une seule fois
+  (mémo par message) ; un passage ne tokenise que les nouveaux messages.
+- Ancres toujours conservées : messages system de tête et dernier
+  message utilisateur (la demande en cours).
+- Au-delà du budget, les anciens résultats d'outils sont d'abord
+  déportés dans le scratchpad et remplacés par une référence
+  {"$ref": clé} ; puis les plus anciens échanges sont retirés.
+
+Partagé par llm.LLM et les agents prototypes (ulti_llm, revallm).
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+import uuid
+from collections.abc import MutableMapping
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Surcoût fixe par message (rôle, séparateurs) dans les formats chat
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # tiktoken absent ou encodage non téléchargeable
+        print(f"[DEBUG] tiktoken unavailable ({e}); estimating 4 characters per token")
+        return None
+
+
+@lru_cache(maxsize=32)
+def count_tokens(text: str) -> int:
+    """
+    Tokens d'un texte (cl100k_base si disponible, sinon ~4 caractères par
+    token). Petit mémo : le préfixe system, identique d'une requête à
+    l'autre, n'est tokenisé qu'une fois.
+    """
+    enc = _encoding()
+    if enc is None:
+        return math.ceil(len(text) / 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Texte d'un message (contenu chaîne ou liste de blocs texte)."""
+    content = message.get("content")
+    if content is None:
+        text = ""
+    elif isinstance(content, str):
+        text = content
+    elif isinstance(content, list):
+        text = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    else:
+        text = str(content)
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"], ensure_ascii=False, default=str)
+    return text
+
+
+class ContextManager:
+    """
+    Parameters
+    ----------
+    budget_tokens : int
+        Taille maximale de l'historique envoyé au modèle.
+    count : callable(str) -> int, optional
+        Compteur de tokens d'un texte (défaut : count_tokens).
+    store : MutableMapping, optional
+        Scratchpad où déporter les résultats d'outils élidés ; sans store,
+        ils sont simplement tronqués.
+    keep_recent : int
+        Nombre de derniers messages jamais élidés.
+    elide_min_tokens : int
+        Un résultat d'outil plus petit n'est pas élidé.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int,
+        count: Optional[Callable[[str], int]] = None,
+        store: Optional[MutableMapping] = None,
+        keep_recent: int = 4,
+        elide_min_tokens: int = 200,
+    ) -> None:
+        self.budget_tokens = budget_tokens
+        self.count = count or count_tokens
+        self.store = store
+        self.keep_recent = keep_recent
+        self.elide_min_tokens = elide_min_tokens
+        # id(message) -> (message, tokens) ; le message est gardé pour que l'id reste valide
+        self._counts: Dict[int, Tuple[Dict[str, Any], int]] = {}
+        self._lock = threading.Lock()
+        self.elided = 0
+        self.dropped = 0
+
+    def tokens(self, message: Dict[str, Any]) -> int:
+        entry = self._counts.get(id(message))
+        if entry is None or entry[0] is not message:
+            entry = (message, self.count(message_text(message)) + MESSAGE_OVERHEAD_TOKENS)
+            self._counts[id(message)] = entry
+        return entry[1]
+
+    def fit(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Renvoie l'historique tenant dans le budget (la liste d'entrée n'est
+        pas modifiée si rien n'est à compacter).
+        """
+        with self._lock:
+            sizes = [self.tokens(m) for m in messages]
+            # Oublie les messages sortis de l'historique
+            live = {id(m) for m in messages}
+            for key in [k for k in self._counts if k not in live]:
+                del self._counts[key]
+
+            total = sum(sizes)
+            if total <= self.budget_tokens:
+                return messages
+
+            messages = list(messages)
+            anchors = self._anchors(messages)
+            recent_start = len(messages) - self.keep_recent
+
+            # 1) Anciens résultats d'outils → scratchpad
+            stored: Dict[int, str] = {}
+            for i in range(recent_start):
+                if total <= self.budget_tokens:
+                    break
+                if i in anchors or messages[i].get("role") != "tool" or sizes[i] < self.elide_min_tokens:
+                    continue
+                stub, key = self._elide(messages[i], sizes[i])
+                new_size = self.tokens(stub)
+                if new_size >= sizes[i]:
+                    if key is not None:
+                        del self.store[key]
+                    continue
+                total += new_size - sizes[i]
+                messages[i], sizes[i] = stub, new_size
+                if key is not None:
+                    stored[i] = key
+                self.elided += 1
+
+            # 2) Plus anciens échanges (un appel assistant et ses réponses d'outils ensemble)
+            keep = [True] * len(messages)
+            i = 0
+            while total > self.budget_tokens and i < len(messages) - 1:
+                if i in anchors:
+                    i += 1
+                    continue
+                end = i + 1
+                while end < len(messages) - 1 and end not in anchors and messages[end].get("role") == "tool":
+                    end += 1
+                for j in range(i, end):
+                    keep[j] = False
+                    total -= sizes[j]
+                    self.dropped += 1
+                    if j in stored:  # élidé puis retiré dans le même passage
+                        del self.store[stored[j]]
+                i = end
+            messages = [m for m, k in zip(messages, keep) if k]
+
+            print(f"[DEBUG] Context compacted to {total} tokens ({len(messages)} messages)")
+            return messages
+
+    @staticmethod
+    def _anchors(messages: List[Dict[str, Any]]) -> set:
+        """Indices des system de tête et du dernier message utilisateur."""
+        anchors = set()
+        for i, message in enumerate(messages):
+            if message.get("role") != "system":
+                break
+            anchors.add(i)
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i].get("role") == "user":
+                anchors.add(i)
+                break
+        return anchors
+
+    def _elide(self, message: Dict[str, Any], tokens: int) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Message de remplacement et clé scratchpad utilisée (None sans store)."""
+        name = message.get("name", "tool")
+        content = message_text(message)
+        key = None
+        if self.store is None:
+            note = f"[Elided {name} result, {tokens} tokens] {content[:200]}…"
+        else:
+            key = f"{name}_context_{uuid.uuid4().hex[:6]}"
+            try:
+                self.store[key] = json.loads(content)
+            except (TypeError, ValueError):
+                self.store[key] = content
+            note = (
+                f"[Elided {name} result, {tokens} tokens] Saved to scratchpad key '{key}'. "
+                f'Pass {{"$ref": "{key}"}} as a tool argument to reuse it.'
+            )
+        return {**message, "content": note}, key
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "tracked_messages": len(self._counts),
+            "elided": self.elided,
+            "dropped": self.dropped,
+        }
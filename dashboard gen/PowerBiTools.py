@@ -4,8 +4,12 @@ import sqlite3
 from typing import Dict, List, Optional, Any
 from jinja2 import Environment, FileSystemLoader
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+
 # Global schema cache
 _SCHEM = None
 
@@ -22,13 +26,16 @@ def load_schema(path="databasevf_schema.json") -> dict:
 
 SCHEMA = load_schema() 
 
+# Les filtres de période portent sur les clés calendaires indexées
+# (<col>__day / <col>__month, cf. calendar_keys.py) : range scan au lieu
+# d'un strftime() par ligne.
 MEASURE_ROUTER = {
     "revenue_monthly": {
         "sql": (
-            "SELECT strftime('%Y-%m', CUT_TIME) AS month, "
-            "SUM(PIECE_WEIGHT_MEAS)                              AS revenue "
+            "SELECT CUT_TIME__month         AS month, "
+            "SUM(PIECE_WEIGHT_MEAS)         AS revenue "
             "FROM \"05-CCM-Brame\" "
-            "WHERE strftime('%Y', CUT_TIME) = :year "
+            "WHERE CUT_TIME__month BETWEEN :year || '-01' AND :year || '-12' "
             "GROUP BY 1 ORDER BY 1"
         ),
         "type": "timeseries",
@@ -39,7 +46,7 @@ MEASURE_ROUTER = {
             "SELECT STEELGRADECODE_ACT         AS product, "
             "SUM(TAPPING_WEIGHT)               AS total_production "
             "FROM \"02-EAF\" "
-            "WHERE strftime('%Y', HEATANNOUNCE_ACT) = :year "
+            "WHERE HEATANNOUNCE_ACT__month BETWEEN :year || '-01' AND :year || '-12' "
             "GROUP BY product "
             "ORDER BY total_production DESC "
             "LIMIT :top_n"
@@ -51,7 +58,7 @@ MEASURE_ROUTER = {
             "SELECT ROUND(AVG(((POWER_ON_DUR) / "
             "(POWER_ON_DUR + POWER_OFF_DUR)) * 100), 2) AS availability "
             "FROM \"02-EAF\" "
-            "WHERE date(HEATANNOUNCE_ACT) >= date('now','-30 day')"
+            "WHERE HEATANNOUNCE_ACT__day >= date('now','-30 day')"
         ),
         "type": "kpi",
         "title": "Disponibilité EAF (%)"
@@ -61,7 +68,7 @@ MEASURE_ROUTER = {
             "SELECT STEELGRADECODE_ACT AS category, "
             "SUM(TAPPING_WEIGHT)      AS value "
             "FROM \"02-EAF\" "
-            "WHERE date(HEATANNOUNCE_ACT) >= date('now','-90 day') "
+            "WHERE HEATANNOUNCE_ACT__day >= date('now','-90 day') "
             "GROUP BY category "
             "ORDER BY value DESC "
             "LIMIT 6"
@@ -120,19 +127,13 @@ def query_powerbi(
     sql  = cfg["sql"]
     year = str(year or datetime.now().year)
 
-    conn = sqlite3.connect("databasevf.db")
-    cur  = conn.cursor()
     try:
-        cur.execute(sql, {"year": year, "top_n": top_n})
-        rows = cur.fetchall()
-        cols = [d[0] for d in cur.description]
+        cols, rows = db_pool.execute_with_columns(sql, {"year": year, "top_n": top_n})
     except sqlite3.Error as e:
         return {
             "type": "table",
             "data": {"headers": ["SQL error"], "rows": [[str(e)]]}
         }
-    finally:
-        conn.close()
 
     # ---------- post-processing ----------
     if cfg["type"] == "timeseries":
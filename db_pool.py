@@ -0,0 +1,137 @@
+# db_pool.py
+"""
+Couche de connexion SQLite partagée par tous les outils « data »
+(sql_query, Tools, SteelMillTools, query_powerbi).
+
+Chaque thread garde sa propre connexion en lecture seule vers
+*databasevf.db* : plus de connect()/close() à chaque requête, et le cache
+de pages (cache_size + mmap) reste chaud d'un appel d'outil à l'autre.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+DB_PATH = os.getenv("DATA_DB_PATH", "databasevf.db")
+
+# Cache de pages par connexion (KiB) et fenêtre mmap (octets)
+CACHE_SIZE_KIB = int(os.getenv("DATA_DB_CACHE_KIB", str(64 * 1024)))
+MMAP_SIZE = int(os.getenv("DATA_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+_local = threading.local()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    Ouvre une connexion `mode=ro` + `query_only`, réglée pour la lecture.
+    """
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def get_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Connexion en lecture seule du thread courant.
+
+    La connexion est rouverte si le fichier a été remplacé sur le disque
+    (ré-import de la base), sinon elle est réutilisée telle quelle.
+
+    Parameters
+    ----------
+    path : str, optional
+        Chemin de la base (défaut : DB_PATH).
+
+    Returns
+    -------
+    sqlite3.Connection
+    """
+    path = path or DB_PATH
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise sqlite3.OperationalError(f"unable to open database file: {path}") from None
+    identity = (st.st_dev, st.st_ino)
+
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+
+    entry = pool.get(path)
+    if entry is not None and entry[1] == identity:
+        return entry[0]
+    if entry is not None:
+        entry[0].close()
+
+    conn = _connect(path)
+    pool[path] = (conn, identity)
+    return conn
+
+
+def execute(
+    query: str,
+    params: Sequence[Any] | dict = (),
+    *,
+    path: Optional[str] = None,
+    row_factory: Any = None,
+) -> List[Any]:
+    """
+    Exécute une requête de lecture et renvoie toutes les lignes.
+
+    Parameters
+    ----------
+    query : str
+    params : séquence ou dict
+        Paramètres liés (`?` ou `:nom`).
+    path : str, optional
+    row_factory : callable, optional
+        Ex. `sqlite3.Row` pour des lignes adressables par nom.
+
+    Returns
+    -------
+    list
+    """
+    return execute_with_columns(query, params, path=path, row_factory=row_factory)[1]
+
+
+def execute_with_columns(
+    query: str,
+    params: Sequence[Any] | dict = (),
+    *,
+    path: Optional[str] = None,
+    row_factory: Any = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    Comme `execute`, mais renvoie aussi les noms de colonnes.
+
+    Returns
+    -------
+    (list[str], list)
+    """
+    cur = get_connection(path).cursor()
+    try:
+        if row_factory is not None:
+            cur.row_factory = row_factory
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cols = [d[0] for d in cur.description or ()]
+        return cols, rows
+    finally:
+        cur.close()
+
+
+def close_thread_connections() -> None:
+    """
+    Ferme les connexions du thread courant (fin de worker, tests…).
+    """
+    pool = getattr(_local, "connections", None) or {}
+    for conn, _ in pool.values():
+        conn.close()
+    pool.clear()
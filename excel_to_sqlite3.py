@@ -1,39 +1,393 @@
-import pandas as pd
-import sqlite3
+import hashlib
 import os
+import posixpath
+import re
+import sqlite3
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time as dtime
+
+import openpyxl
+
+import calendar_keys
+import index_advisor
+
+# Sheets are parsed in parallel worker processes, written by the parent
+IMPORT_WORKERS = int(os.getenv("EXCEL_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+
+# First column that is unique and never empty becomes the primary key
+PRIMARY_KEY_CANDIDATES = ("HEATID", "ID_ANALYSE", "DFB_ID")
+
+FINGERPRINT_TABLE = "_sheet_fingerprints"
+
+_XLSX_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def _column_names(header):
+    """Header row -> unique column names (same fallbacks as pandas)"""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = str(value).strip() if value is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _cell(value):
+    """Cell value -> value sqlite3 can bind"""
+    if isinstance(value, datetime):
+        return value.strftime(calendar_keys.DATE_STORAGE_FORMAT)
+    if isinstance(value, (date, dtime)):
+        return value.isoformat()
+    return value
+
+
+# Text pandas.read_excel treats as missing (its default na_values)
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def _number(value):
+    """Numeric text -> int / float, anything else unchanged"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _coerce_column(values):
+    """
+    Missing values and numeric text handled like pandas.read_excel,
+    with the SQLite type DataFrame.to_sql would declare.
+
+    Returns:
+        tuple: (column type, values)
+    """
+    values = [None if isinstance(v, str) and v in NA_VALUES else v for v in values]
+    present = [v for v in values if v is not None]
+    if not present:
+        return "REAL", values
+
+    numbers = [_number(v) for v in values]
+    if all(isinstance(v, (bool, int, float)) for v in numbers if v is not None):
+        # A missing value turns an integer column into float64 in pandas
+        if len(present) == len(values) and all(isinstance(v, (bool, int)) for v in numbers):
+            return "INTEGER", numbers
+        return "REAL", numbers
+    return "TEXT", values
+
+
+def sheet_sources(excel_file):
+    """
+    Cheap per-sheet fingerprint of the raw workbook, without parsing cells.
+
+    Combines the zip CRC of the sheet XML with the shared strings and styles
+    (cell text and date formats live there). An unchanged source means an
+    unchanged sheet; a changed one still gets its content hash compared.
+
+    Returns:
+        dict: {sheet name: source fingerprint}, in workbook order
+    """
+    with zipfile.ZipFile(excel_file) as zf:
+        crc = {info.filename: info.CRC for info in zf.infolist()}
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+
+    targets = {}
+    for rel in rels.findall("rel:Relationship", _XLSX_NS):
+        target = rel.get("Target")
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+
+    shared = f"{crc.get('xl/sharedStrings.xml', 0):08x}-{crc.get('xl/styles.xml', 0):08x}"
+    return {
+        sheet.get("name"): f"{crc.get(targets.get(sheet.get(_REL_ID)), 0):08x}-{shared}"
+        for sheet in workbook.find("main:sheets", _XLSX_NS)
+    }
+
+
+def _content_hash(columns, types, rows):
+    h = hashlib.sha256(repr((columns, types)).encode())
+    for row in rows:
+        h.update(repr(row).encode())
+    return h.hexdigest()
+
+
+def _primary_key(columns, rows):
+    """First PRIMARY_KEY_CANDIDATES column that is unique and never empty"""
+    for name in PRIMARY_KEY_CANDIDATES:
+        if name in columns:
+            i = columns.index(name)
+            values = [row[i] for row in rows]
+            if None not in values and len(set(values)) == len(values):
+                return name
+    return None
+
+
+def read_sheet(excel_file, sheet_name):
+    """
+    Parse one sheet in openpyxl read-only (streaming) mode.
+
+    Runs in a worker process: returns plain Python rows ready for
+    executemany, with date columns already normalized to ISO text.
+    """
+    start = time.perf_counter()
+    wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows_iter = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows_iter, None) or ()
+        rows = list(rows_iter)
+    finally:
+        wb.close()
+
+    # Read-only mode pads with empty rows up to the sheet dimension
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+
+    # Same for unnamed, empty trailing columns
+    width = len(header)
+    while width and header[width - 1] is None and all(
+        len(row) < width or row[width - 1] is None for row in rows
+    ):
+        width -= 1
+    columns = _column_names(header[:width])
+    rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+
+    date_cols, types, table_columns = [], [], []
+    for name, values in zip(columns, zip(*rows) if rows else [()] * width):
+        if calendar_keys.looks_like_dates(values):
+            date_cols.append(name)
+            types.append("TIMESTAMP")
+            values = [calendar_keys.to_storage(v) for v in values]
+        else:
+            col_type, values = _coerce_column(values)
+            types.append(col_type)
+            values = [_cell(v) for v in values]
+        table_columns.append(values)
+
+    rows = list(zip(*table_columns)) if table_columns else []
+    return {
+        "sheet": sheet_name,
+        "columns": columns,
+        "types": types,
+        "date_cols": date_cols,
+        "rows": rows,
+        "primary_key": _primary_key(columns, rows),
+        "content_hash": _content_hash(columns, types, rows),
+        "read_s": time.perf_counter() - start,
+    }
+
+
+def load_fingerprints(conn):
+    """
+    Stored fingerprints, creating the bookkeeping table on first use.
+
+    Returns:
+        dict: {sheet: (source, content_hash, row_count)}
+    """
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{FINGERPRINT_TABLE}" ('
+        "sheet TEXT PRIMARY KEY, source TEXT, content_hash TEXT, "
+        "row_count INTEGER, imported_at TEXT)"
+    )
+    rows = conn.execute(f'SELECT sheet, source, content_hash, row_count FROM "{FINGERPRINT_TABLE}"')
+    return {sheet: (source, content_hash, row_count) for sheet, source, content_hash, row_count in rows}
+
+
+def save_fingerprint(conn, sheet, source, content_hash, row_count):
+    conn.execute(
+        f'INSERT INTO "{FINGERPRINT_TABLE}" VALUES (?, ?, ?, ?, ?) '
+        "ON CONFLICT(sheet) DO UPDATE SET source = excluded.source, "
+        "content_hash = excluded.content_hash, row_count = excluded.row_count, "
+        "imported_at = excluded.imported_at",
+        (sheet, source, content_hash, row_count, datetime.now().strftime(calendar_keys.DATE_STORAGE_FORMAT)),
+    )
+
+
+def _slug(text):
+    return re.sub(r"\W+", "_", text.lower())
+
+
+def _base_columns(conn, table):
+    """(name, type) of the stored columns, generated calendar keys excluded"""
+    return [(r[1], r[2]) for r in conn.execute(f'PRAGMA table_xinfo("{table}")') if r[6] == 0]
+
+
+def _changed_rows(conn, name, columns, pk, rows):
+    """
+    Rows inserted, updated or deleted by key compared with the live table
+    (row hashes, duplicate live keys tolerated).
+    """
+    col_list = ", ".join(f'"{c}"' for c in columns)
+    pk_index = columns.index(pk)
+    live = {
+        row[pk_index]: hash(row)
+        for row in conn.execute(f'SELECT {col_list} FROM "{name}" WHERE "{pk}" IS NOT NULL')
+    }
+    changed, keys = 0, set()
+    for row in rows:
+        key = row[pk_index]
+        keys.add(key)
+        if live.get(key) != hash(tuple(row)):
+            changed += 1
+    return changed + sum(1 for key in live if key not in keys)
+
+
+def write_sheet(conn, sheet):
+    """
+    Load the sheet's new content in a shadow table, then swap it in.
 
-def excel_to_sqlite(excel_file, db_file):
+    When the live table has the same columns and the sheet has a primary
+    key, the rows inserted, updated or deleted by key are counted against
+    the live table; otherwise every row counts as written. Everything, swap
+    included, runs in one transaction: WAL readers keep seeing the previous
+    table until commit.
+
+    Returns:
+        tuple: (write time in seconds, rows inserted, updated or deleted)
+    """
+    start = time.perf_counter()
+    name = sheet["sheet"]
+    shadow = f"{name}__shadow"
+    pk = sheet["primary_key"]
+    columns = sheet["columns"]
+    col_defs = ", ".join(f'"{c}" {t}' for c, t in zip(columns, sheet["types"]))
+    placeholders = ", ".join("?" * len(columns))
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Indexes to carry over (index advisor, calendar keys…)
+        saved_indexes = [
+            sql for (sql,) in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (name,),
+            )
+        ]
+        live_columns = _base_columns(conn, name)
+        conn.execute(f'DROP TABLE IF EXISTS "{shadow}"')
+        conn.execute(f'CREATE TABLE "{shadow}" ({col_defs})')
+        conn.executemany(f'INSERT INTO "{shadow}" VALUES ({placeholders})', sheet["rows"])
+        if pk and live_columns == list(zip(columns, sheet["types"])):
+            written = _changed_rows(conn, name, columns, pk, sheet["rows"])
+        else:
+            written = len(sheet["rows"])
+
+        # Atomic swap
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute(f'ALTER TABLE "{shadow}" RENAME TO "{name}"')
+        if pk:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{_slug(name)}__pk" ON "{name}" ("{pk}")')
+        # Indexed day / week / month / shift keys for time-series grouping
+        calendar_keys.add_calendar_keys(conn, name, sheet["date_cols"], commit=False)
+        for sql in saved_indexes:
+            try:
+                conn.execute(re.sub(r"^CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS)", r"CREATE \1INDEX IF NOT EXISTS ", sql))
+            except sqlite3.OperationalError as e:
+                # e.g. the indexed column no longer exists in the sheet
+                print(f"Dropped index on {name}: {e}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return time.perf_counter() - start, written
+
+
+def excel_to_sqlite(excel_file, db_file, force=False):
+    """
+    Import (or refresh) every sheet of the workbook into SQLite.
+
+    Sheets whose fingerprint (content hash + row count) did not change are
+    skipped. The first import, or force=True, reloads every sheet with the
+    bulk-load pragmas; later refreshes run in WAL mode so readers never block.
+    """
     # Check if Excel file exists
     if not os.path.exists(excel_file):
         print(f"Error: {excel_file} not found!")
         return
 
-    # Create a connection to the SQLite database
-    conn = sqlite3.connect(db_file)
-    
+    # Create a connection to the SQLite database (transactions are explicit)
+    conn = sqlite3.connect(db_file, isolation_level=None)
+
     try:
-        # Read all sheets from the Excel file
-        excel = pd.ExcelFile(excel_file)
-        sheet_names = excel.sheet_names
-        
-        # Process each sheet
-        for sheet_name in sheet_names:
-            print(f"Processing sheet: {sheet_name}")
-            
-            # Read the sheet into a pandas DataFrame
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            
-            
-            
-            # Write the DataFrame to SQLite
-            df.to_sql(sheet_name, conn, if_exists='replace', index=False)
-            print(f"Successfully imported {sheet_name} to database")
-            
-        print(f"\nAll sheets have been successfully imported to {db_file}")
-        
+        fingerprints = load_fingerprints(conn)
+        sources = sheet_sources(excel_file)
+        bulk = force or not fingerprints
+
+        if bulk:
+            # Bulk-load settings, restored once every sheet is written
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+
+        to_read = []
+        for name, source in sources.items():
+            if not force and fingerprints.get(name, (None,))[0] == source:
+                print(f"Skipped {name}: unchanged")
+            else:
+                to_read.append(name)
+
+        total_start = time.perf_counter()
+        total_rows = 0
+        changed = []
+        workers = max(1, min(IMPORT_WORKERS, len(to_read)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(read_sheet, excel_file, name) for name in to_read]
+            for future in as_completed(futures):
+                sheet = future.result()
+                name = sheet["sheet"]
+                n = len(sheet["rows"])
+                previous = fingerprints.get(name)
+                if not force and previous and previous[1:] == (sheet["content_hash"], n):
+                    # Workbook re-saved but the data is identical
+                    save_fingerprint(conn, name, sources[name], sheet["content_hash"], n)
+                    print(f"Skipped {name}: same content (read {sheet['read_s']:.2f}s)")
+                    continue
+
+                write_s, written = write_sheet(conn, sheet)
+                save_fingerprint(conn, name, sources[name], sheet["content_hash"], n)
+                changed.append(name)
+                total_rows += n
+                elapsed = sheet["read_s"] + write_s
+                print(
+                    f"Imported {name}: {n} rows, {written} written "
+                    f"(key {sheet['primary_key'] or 'none'}, read {sheet['read_s']:.2f}s, "
+                    f"write {write_s:.2f}s, {n / elapsed if elapsed else 0:.0f} rows/s)"
+                )
+
+        total_s = time.perf_counter() - total_start
+        print(f"\n{len(changed)}/{len(sources)} sheet(s) imported to {db_file} "
+              f"({total_rows} rows in {total_s:.2f}s, {workers} worker(s))")
+
+        if bulk:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+
+        # New tables get their indexes; swapped tables already carried theirs over
+        if changed:
+            index_advisor.build_indexes(db_file)
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
-    
+
     finally:
         # Close the database connection
         conn.close()
@@ -41,4 +395,4 @@ def excel_to_sqlite(excel_file, db_file):
 if __name__ == "__main__":
     excel_file = "DATA-ACIERIE.xlsx"
     db_file = "databasevf.db"
-    excel_to_sqlite(excel_file, db_file)
+    excel_to_sqlite(excel_file, db_file, force="--full" in sys.argv)
@@ -0,0 +1,363 @@
+# index_advisor.py
+"""
+Conseiller d'index pour *databasevf.db*.
+
+Les feuilles importées depuis Excel n'ont aucun index, alors que les
+requêtes de l'agent filtrent / joignent / regroupent presque toujours sur
+`HEATID` ou une colonne date. Ce module :
+
+1. rejoue le SQL de l'agent (logs) et les requêtes du `MEASURE_ROUTER`,
+2. lit leur `EXPLAIN QUERY PLAN` pour repérer les `SCAN` de table,
+3. propose (ou crée) des index — couvrants quand c'est raisonnable,
+4. mesure chaque requête avant / après.
+
+Usage : `python index_advisor.py [databasevf.db] [--dry-run]`
+(appelé aussi en fin de `excel_to_sqlite3.excel_to_sqlite`).
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from query_cache import normalize_sql
+
+# Au-delà, on n'indexe que les colonnes clés (index non couvrant)
+MAX_COVERING_COLUMNS = int(os.getenv("INDEX_ADVISOR_MAX_COVERING", "6"))
+INDEX_PREFIX = "idx_advisor_"
+
+_ROUTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard gen", "PowerBiTools.py")
+
+_QUERY_ARG_RE = re.compile(r'"query"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_DEBUG_SQL_RE = re.compile(r"\[DEBUG\] Executing SQL query:\s*(.+)$", re.MULTILINE)
+_ESCAPE_RE = re.compile(r"\\(.)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_IDENT_RE = re.compile(r'"([^"]+)"|\b([^\W\d]\w*)\b')
+_TABLE_REF_RE = re.compile(
+    r'\b(?:FROM|JOIN)\s+(?:"([^"]+)"|(\w+))'
+    r'(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|GROUP|ORDER|LIMIT|LEFT|RIGHT|INNER|OUTER|CROSS|NATURAL|USING|HAVING|UNION)\b)(\w+))?',
+    re.IGNORECASE,
+)
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(.+?)(?: USING .*)?$")
+_CLAUSE_END = r"\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bHAVING\b|\bWINDOW\b|\bUNION\b|$"
+_WHERE_RE = re.compile(rf"\b(?:WHERE|ON)\b(.*?)(?=\bJOIN\b|\bWHERE\b|{_CLAUSE_END})", re.IGNORECASE | re.DOTALL)
+_GROUP_RE = re.compile(rf"\bGROUP\s+BY\b(.*?)(?={_CLAUSE_END})", re.IGNORECASE | re.DOTALL)
+
+
+# ──────────────────────────────────────────────
+# Collecte des requêtes
+# ──────────────────────────────────────────────
+def _unescape_once(text: str) -> str:
+    """Retire un niveau d'échappement façon repr() Python (\\" → \", \\n → saut de ligne)."""
+    unescape = {"n": "\n", "t": "\t", '"': '\\"'}
+    return _ESCAPE_RE.sub(lambda m: unescape.get(m.group(1), m.group(1)), text)
+
+
+def collect_logged_queries(log_globs: Iterable[str] = ("logs/*.log", "*.log")) -> List[str]:
+    """
+    Extrait le SQL envoyé par l'agent à `sql_query` depuis les logs.
+
+    Les logs de debug contiennent les messages sous forme de repr() Python
+    (JSON échappé une fois de plus) : on retire alors un niveau
+    d'échappement avant de chercher les arguments `"query"`.
+    """
+    queries = []
+    for pattern in log_globs:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    raw = f.read()
+            except OSError:
+                continue
+            queries.extend(m.group(1).strip() for m in _DEBUG_SQL_RE.finditer(raw))
+            text = _unescape_once(raw) if '\\\\"' in raw else raw
+            for m in _QUERY_ARG_RE.finditer(text):
+                try:
+                    queries.append(json.loads(f'"{m.group(1)}"', strict=False).strip())
+                except json.JSONDecodeError:
+                    continue
+    return [q for q in queries if re.match(r"(?is)^\s*(SELECT|WITH)\b", q)]
+
+
+def collect_router_queries() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Requêtes pré-mappées du `MEASURE_ROUTER` avec des paramètres réalistes.
+    """
+    try:
+        spec = importlib.util.spec_from_file_location("PowerBiTools", _ROUTER_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception as e:
+        print(f"[DEBUG] MEASURE_ROUTER unavailable: {e}")
+        return []
+    params = {"year": str(datetime.now().year), "top_n": 5}
+    return [(cfg["sql"], params) for cfg in module.MEASURE_ROUTER.values()]
+
+
+def collect_queries() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Logs + MEASURE_ROUTER, dédoublonnés sur le SQL normalisé.
+    """
+    seen, out = set(), []
+    for sql, params in [(q, {}) for q in collect_logged_queries()] + collect_router_queries():
+        key = normalize_sql(sql)
+        if key not in seen:
+            seen.add(key)
+            out.append((sql, params))
+    return out
+
+
+# ──────────────────────────────────────────────
+# Analyse des plans
+# ──────────────────────────────────────────────
+def explain(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[str]:
+    """Lignes `detail` de EXPLAIN QUERY PLAN."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    # table_xinfo : inclut les colonnes générées (clés calendaires)
+    return [row[1] for row in conn.execute(f'PRAGMA table_xinfo("{table}")')]
+
+
+def _columns_in(text: str, columns: Dict[str, str]) -> List[str]:
+    """Colonnes (casse réelle) citées dans un fragment SQL, dans l'ordre d'apparition."""
+    found = []
+    for m in _IDENT_RE.finditer(text):
+        col = columns.get((m.group(1) or m.group(2)).lower())
+        if col and col not in found:
+            found.append(col)
+    return found
+
+
+def _equality_columns(text: str, columns: Dict[str, str]) -> List[str]:
+    found = []
+    for m in re.finditer(r'(?:"([^"]+)"|\b(\w+))\s*(?:=(?!=)|\bIN\b)', text, re.IGNORECASE):
+        col = columns.get((m.group(1) or m.group(2)).lower())
+        if col and col not in found:
+            found.append(col)
+    return found
+
+
+def propose_index(conn: sqlite3.Connection, sql: str, table: str) -> Optional[List[str]]:
+    """
+    Colonnes d'index pour `table` dans `sql` : égalités d'abord, puis
+    autres filtres / jointures, puis GROUP BY ; le reste des colonnes
+    lues est ajouté à la fin si l'index peut rester couvrant.
+    """
+    columns = {c.lower(): c for c in _table_columns(conn, table)}
+    if not columns:
+        return None
+    body = _LITERAL_RE.sub("''", sql)
+
+    filters = " ".join(m.group(1) for m in _WHERE_RE.finditer(body))
+    groups = " ".join(m.group(1) for m in _GROUP_RE.finditer(body))
+    keys = _equality_columns(filters, columns)
+    keys += [c for c in _columns_in(filters, columns) + _columns_in(groups, columns) if c not in keys]
+    if not keys:
+        return None
+
+    rest = [c for c in _columns_in(body, columns) if c not in keys]
+    if len(keys) + len(rest) <= MAX_COVERING_COLUMNS:
+        return keys + rest
+    return keys[:MAX_COVERING_COLUMNS]
+
+
+def _scanned_tables(conn: sqlite3.Connection, sql: str, params: Any) -> List[str]:
+    """Tables (noms réels) parcourues intégralement selon le plan."""
+    aliases = {}
+    for m in _TABLE_REF_RE.finditer(_LITERAL_RE.sub("''", sql)):
+        table = m.group(1) or m.group(2)
+        aliases[table] = table
+        if m.group(3):
+            aliases[m.group(3)] = table
+    scanned = []
+    for detail in explain(conn, sql, params):
+        m = _SCAN_RE.match(detail)
+        if m and " USING " not in detail and m.group(1) in aliases:
+            table = aliases[m.group(1)]
+            if table not in scanned:
+                scanned.append(table)
+    return scanned
+
+
+def index_name(table: str, columns: List[str]) -> str:
+    slug = re.sub(r"\W+", "_", f"{table}_{'_'.join(columns)}".lower()).strip("_")[:40]
+    digest = hashlib.sha1(f"{table}|{'|'.join(columns)}".encode()).hexdigest()[:8]
+    return f"{INDEX_PREFIX}{slug}_{digest}"
+
+
+def advise(conn: sqlite3.Connection, queries: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Propositions d'index pour les requêtes qui font un SCAN de table.
+
+    Returns
+    -------
+    list[dict]
+        {"table", "columns", "name", "sql", "queries"} ; une proposition
+        dont les colonnes préfixent une autre sur la même table est fusionnée.
+    """
+    proposals: Dict[Tuple[str, Tuple[str, ...]], List[str]] = {}
+    for sql, params in queries:
+        try:
+            tables = _scanned_tables(conn, sql, params)
+        except sqlite3.Error as e:
+            print(f"[DEBUG] Index advisor skipped query ({e}): {sql[:80]}")
+            continue
+        for table in tables:
+            cols = propose_index(conn, sql, table)
+            if cols:
+                proposals.setdefault((table, tuple(cols)), []).append(sql)
+
+    merged = []
+    for (table, cols), sqls in proposals.items():
+        wider = [
+            other for (t, other) in proposals
+            if t == table and len(other) > len(cols) and other[:len(cols)] == cols
+        ]
+        if wider:
+            proposals[(table, wider[0])].extend(sqls)
+            continue
+        merged.append((table, cols, sqls))
+
+    out = []
+    for table, cols, sqls in merged:
+        name = index_name(table, list(cols))
+        col_list = ", ".join(f'"{c}"' for c in cols)
+        out.append({
+            "table": table,
+            "columns": list(cols),
+            "name": name,
+            "sql": f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({col_list})',
+            "queries": proposals.get((table, cols), sqls),
+        })
+    return out
+
+
+# ──────────────────────────────────────────────
+# Construction + mesures
+# ──────────────────────────────────────────────
+def _time_query(conn: sqlite3.Connection, sql: str, params: Any, repeat: int = 3) -> Optional[float]:
+    """Meilleur temps (ms) sur `repeat` exécutions, None si la requête échoue."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            conn.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _connect_readonly(db_file: str) -> sqlite3.Connection:
+    """
+    Connexion `mode=ro` + `query_only` pour rejouer les requêtes des logs :
+    un WITH … DELETE journalisé ne doit pas modifier la base.
+    """
+    uri = f"{Path(db_file).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def build_indexes(
+    db_file: str = "databasevf.db",
+    queries: Optional[List[Tuple[str, Any]]] = None,
+    apply: bool = True,
+) -> Dict[str, Any]:
+    """
+    Analyse les requêtes, crée les index proposés et mesure avant / après.
+
+    Parameters
+    ----------
+    db_file : str
+        Base SQLite : requêtes rejouées en lecture seule, connexion en
+        écriture réservée à CREATE INDEX et ANALYZE.
+    queries : list[(sql, params)], optional
+        Requêtes à rejouer (défaut : logs + MEASURE_ROUTER).
+    apply : bool
+        False = simple proposition (dry-run).
+
+    Returns
+    -------
+    dict
+        {"indexes": [...], "queries": [{"sql", "before_ms", "after_ms",
+        "plan_before", "plan_after"}]}
+    """
+    queries = collect_queries() if queries is None else queries
+    conn = _connect_readonly(db_file)
+    try:
+        proposals = advise(conn, queries)
+        timings = []
+        for sql, params in queries:
+            try:
+                plan = explain(conn, sql, params)
+            except sqlite3.Error:
+                continue
+            timings.append({
+                "sql": sql,
+                "params": params,
+                "before_ms": _time_query(conn, sql, params),
+                "plan_before": plan,
+            })
+
+        if apply and proposals:
+            writer = sqlite3.connect(db_file)
+            try:
+                with writer:
+                    for p in proposals:
+                        writer.execute(p["sql"])
+                writer.execute("ANALYZE")
+                writer.commit()
+            finally:
+                writer.close()
+            # Nouvelle connexion : les plans EXPLAIN déjà préparés ignorent les nouveaux index
+            conn.close()
+            conn = _connect_readonly(db_file)
+
+        for t in timings:
+            if apply:
+                t["after_ms"] = _time_query(conn, t["sql"], t["params"])
+                t["plan_after"] = explain(conn, t["sql"], t["params"])
+            del t["params"]
+    finally:
+        conn.close()
+
+    report = {"indexes": proposals, "queries": timings, "applied": apply}
+    print_report(report)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    verb = "Created" if report.get("applied") else "Proposed"
+    print(f"\n[INDEX] {verb} {len(report['indexes'])} index(es)")
+    for p in report["indexes"]:
+        print(f"  - {p['sql']}")
+    for t in report["queries"]:
+        before = t.get("before_ms")
+        after = t.get("after_ms")
+        line = " ".join(t["sql"].split())[:70]
+        if before is not None and after is not None:
+            speedup = before / after if after else float("inf")
+            print(f"  {before:8.2f} ms → {after:8.2f} ms  (x{speedup:.1f})  {line}")
+        elif before is not None:
+            print(f"  {before:8.2f} ms  {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose / create indexes for databasevf.db")
+    parser.add_argument("db_file", nargs="?", default="databasevf.db")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the proposals")
+    args = parser.parse_args()
+    build_indexes(args.db_file, apply=not args.dry_run)
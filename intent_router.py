@@ -0,0 +1,438 @@
+# intent_router.py
+"""
+Routeur d'intentions : réponse déterministe aux questions KPI connues,
+devant la boucle ReAct (get_completion, /chat).
+
+- Règles : chaque intention exige ses mots-clés (regex sur la question
+  normalisée). Une fois ces mots retirés, chaque mot restant doit être
+  expliqué (formule de question, mot vide, mot des exemples ou du
+  vocabulaire de l'intention) : une mise en forme (dashboard, par
+  équipe…), un autre sigle d'étape, un « pourquoi » ou un nombre non
+  attendu renvoient à l'agent.
+- Classifieur : plus proche voisin (cosinus sur trigrammes de caractères)
+  entre la question et les exemples des intentions candidates ; le score
+  est la confiance. Deux candidates trop proches = ambiguïté.
+- Exécution : SQL via l'outil sql_query puis fonction KPI de tools.Tools
+  (calculate_*), ou mesure pré-mappée du MEASURE_ROUTER
+  (dashboard gen/PowerBiTools.py).
+
+Sous le seuil de confiance, ou si une requête ne renvoie rien, la
+question passe à l'agent complet.
+
+INTENT_ROUTER=0 (défaut) | 1, INTENT_ROUTER_THRESHOLD
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from answer_cache import _STOPWORDS, _cosine, _trigrams, normalize_prompt
+
+_ROUTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard gen", "PowerBiTools.py")
+
+# Mise en forme / découpage que les réponses routées ne savent pas produire
+_RESHAPE_RE = re.compile(
+    r"\b(?:dashboard|tableau de bord|graph\w*|courbe\w*|chart|plot|html|visualis\w*|compar\w*"
+    r"|evolution|tendance|chaque|moyen\w*|mensuel\w*|quotidien\w*|hebdo\w*"
+    r"|par (?:jour|semaine|mois|an|annee|equipe|nuance|grade|poche|coulee|heure|type|categorie))\b"
+)
+# Formules de question sans effet sur l'intention
+_QUESTION_WORDS = frozenset(
+    "quel quelle quels quelles est sont etait c ce cela combien donne donner donnez moi svp stp "
+    "calcule calculer calculez affiche afficher montre montrer indique indiquer peux pouvez tu vous "
+    "il y on me valeur total totale totaux global globale actuel actuelle please tell current value".split()
+)
+_YEAR_RE = re.compile(r"\b(20\d{2})\b")
+_TOP_N_RE = re.compile(r"\btop (\d{1,3})\b|\b(\d{1,3}) (?:premier|principa|meilleur)\w*")
+
+_ELEC = (r"\b(?:conso\w*|energie)\b", r"\belec\w*")
+
+ToolCaller = Callable[[str, Dict[str, Any]], Any]
+
+
+class Intent:
+    """
+    Question KPI routable.
+
+    Parameters
+    ----------
+    name : str
+        Identifiant (renvoyé dans l'événement final).
+    examples : list[str]
+        Formulations de référence du classifieur.
+    required : tuple[str]
+        Regex qui doivent toutes trouver une correspondance.
+    vocabulary : frozenset
+        Mots admis en plus de ceux des exemples (sigles…).
+    run : callable
+        (call_tool, params) -> réponse texte ; LookupError = pas de réponse.
+    forbidden : str, optional
+        Regex qui exclut l'intention.
+    params : tuple[str]
+        Paramètres extraits de la question ("year", "top_n").
+    """
+
+    __slots__ = ("name", "examples", "required", "vocabulary", "run", "forbidden", "params", "grams", "words")
+
+    def __init__(
+        self,
+        name: str,
+        examples: List[str],
+        required: Tuple[str, ...],
+        vocabulary: frozenset,
+        run: Callable[[ToolCaller, Dict[str, Any]], str],
+        forbidden: Optional[str] = None,
+        params: Tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.examples = examples
+        self.required = tuple(re.compile(p) for p in required)
+        self.vocabulary = vocabulary
+        self.run = run
+        self.forbidden = re.compile(forbidden) if forbidden else None
+        self.params = params
+        self.grams = [_trigrams(normalize_prompt(e)) for e in examples]
+        self.words = vocabulary.union(*(normalize_prompt(e).split() for e in examples))
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        """Paramètres si la question normalisée relève de l'intention, sinon None."""
+        if self.forbidden is not None and self.forbidden.search(text):
+            return None
+        if not all(p.search(text) for p in self.required):
+            return None
+        params, rest = _extract_params(text, self.params)
+        if params is None:
+            return None
+        for pattern in self.required:
+            rest = pattern.sub(" ", rest)
+        if _RESHAPE_RE.search(rest):
+            return None
+        if set(rest.split()) - self.words - _QUESTION_WORDS - _STOPWORDS:
+            return None
+        return params
+
+    def score(self, text: str) -> float:
+        grams = _trigrams(text)
+        return max(_cosine(grams, g) for g in self.grams)
+
+
+def _extract_params(text: str, accepted: Tuple[str, ...]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(paramètres, reste de la question) ; None si un nombre n'est pas attendu."""
+    params: Dict[str, Any] = {}
+    if "top_n" in accepted:
+        m = _TOP_N_RE.search(text)
+        if m:
+            params["top_n"] = int(m.group(1) or m.group(2))
+            text = text[:m.start()] + " top " + text[m.end():]
+    if "year" in accepted:
+        m = _YEAR_RE.search(text)
+        if m:
+            params["year"] = m.group(1)
+            text = text[:m.start()] + " " + text[m.end():]
+    if any(c.isdigit() for c in text):
+        return None, text
+    return params, text
+
+
+# ──────────────────────────────────────────────
+# Exécution
+# ──────────────────────────────────────────────
+def _fmt(value: Any) -> str:
+    """Nombre sans séparateur de milliers, 2 décimales au plus."""
+    if isinstance(value, float):
+        value = round(value, 2)
+        return str(int(value)) if value.is_integer() else str(value)
+    return str(value)
+
+
+def _row(call_tool: ToolCaller, query: str) -> tuple:
+    """Première ligne d'une requête sql_query (LookupError si vide ou en erreur)."""
+    rows = call_tool("sql_query", {"query": query})
+    if isinstance(rows, str) or not rows or rows[0][0] in (None, "Error executing query:"):
+        raise LookupError(f"no value for {query!r}")
+    return rows[0]
+
+
+def _scalar(call_tool: ToolCaller, query: str) -> Any:
+    return _row(call_tool, query)[0]
+
+
+def _kpi(call_tool: ToolCaller, name: str, **arguments: Any) -> float:
+    """Fonction KPI de tools.Tools via le registre d'outils."""
+    result = call_tool(name, arguments)
+    if not isinstance(result, (int, float)):
+        raise LookupError(f"{name} failed: {result}")
+    return result
+
+
+_CONSO_EAF = 'SELECT SUM(TOTAL_ELEC_EGY) FROM "02-EAF"'
+_CONSO_LF = 'SELECT SUM(ELEC_CONS_TOTAL) FROM "03-LF"'
+_ARRETS_EAF = 'SELECT SUM(DURATION), COUNT(*) FROM "EAF_Arrêts"'
+
+
+def _conso_eaf(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    return f"Consommation électrique EAF totale : {_fmt(_scalar(call_tool, _CONSO_EAF))}"
+
+
+def _conso_lf(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    return f"Consommation électrique LF totale : {_fmt(_scalar(call_tool, _CONSO_LF))}"
+
+
+def _conso_totale(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    total = _kpi(
+        call_tool, "calculate_conso_elec",
+        cons_elec_eaf=_scalar(call_tool, _CONSO_EAF),
+        cons_elec_lf=_scalar(call_tool, _CONSO_LF),
+    )
+    return f"Consommation électrique totale (EAF + LF) : {_fmt(total)}"
+
+
+def _mttr_eaf(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    duration, count = _row(call_tool, _ARRETS_EAF)
+    mttr = _kpi(call_tool, "calculate_mttr", somme_des_arrets=duration, nombre_des_arrets=count)
+    return f"MTTR EAF : {_fmt(mttr)} s par arrêt ({count} arrêts, {_fmt(duration)} s au total)"
+
+
+def _nb_arrets_eaf(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    return f"Nombre d'arrêts EAF : {_row(call_tool, _ARRETS_EAF)[1]}"
+
+
+def _duree_arrets_eaf(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+    duration, count = _row(call_tool, _ARRETS_EAF)
+    return f"Durée totale des arrêts EAF : {_fmt(duration)} s ({count} arrêts)"
+
+
+_measure_module = None
+_measure_lock = threading.Lock()
+
+
+def _measure_router():
+    """Module PowerBiTools (MEASURE_ROUTER, query_powerbi), chargé une fois."""
+    global _measure_module
+    with _measure_lock:
+        if _measure_module is None:
+            spec = importlib.util.spec_from_file_location("PowerBiTools", _ROUTER_FILE)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _measure_module = module
+        return _measure_module
+
+
+def _render_measure(payload: Dict[str, Any], title: str) -> str:
+    """Payload query_powerbi → réponse texte (LookupError si vide ou en erreur)."""
+    kind, data = payload.get("type"), payload.get("data") or {}
+    if kind == "kpi":
+        if not data.get("value"):
+            raise LookupError("empty KPI")
+        return f"{data['title']} : {_fmt(data['value'])}"
+    if kind == "timeseries":
+        pairs = list(zip(data.get("labels", []), data["series"][0]["data"] if data.get("series") else []))
+    elif kind == "pie":
+        pairs = list(zip(data.get("labels", []), data.get("values", [])))
+    else:
+        headers, rows = data.get("headers", []), data.get("rows", [])
+        if not rows or headers[:1] in (["Error"], ["SQL error"]):
+            raise LookupError(f"measure failed: {rows[:1]}")
+        lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+        lines += ["| " + " | ".join(str(c) for c in r) + " |" for r in rows]
+        return f"{title} :\n\n" + "\n".join(lines)
+    if not pairs:
+        raise LookupError("empty measure")
+    return f"{title} :\n" + "\n".join(f"- {label} : {_fmt(value)}" for label, value in pairs)
+
+
+def _measure(slug: str, title: str) -> Callable[[ToolCaller, Dict[str, Any]], str]:
+    def run(call_tool: ToolCaller, params: Dict[str, Any]) -> str:
+        try:
+            module = _measure_router()
+        except Exception as e:
+            raise LookupError(f"MEASURE_ROUTER unavailable: {e}")
+        payload = module.query_powerbi(slug, **params)
+        label = f"{title} {params['year']}" if "year" in params else title
+        return _render_measure(payload, label)
+    return run
+
+
+_STAGES = frozenset({"eaf", "four", "arc"})
+
+INTENTS: List[Intent] = [
+    Intent(
+        "conso_elec_eaf",
+        ["conso electrique EAF totale", "consommation électrique du four EAF", "énergie électrique EAF"],
+        _ELEC + (r"\beaf\b",),
+        _STAGES | {"kwh"},
+        _conso_eaf,
+        forbidden=r"\blf\b",
+    ),
+    Intent(
+        "conso_elec_lf",
+        ["conso electrique LF totale", "consommation électrique du four poche LF", "énergie électrique LF"],
+        _ELEC + (r"\blf\b",),
+        frozenset({"lf", "four", "poche", "kwh"}),
+        _conso_lf,
+        forbidden=r"\beaf\b",
+    ),
+    Intent(
+        "conso_elec_totale",
+        ["conso electrique totale", "consommation électrique totale EAF et LF", "énergie électrique globale de l'aciérie"],
+        _ELEC + (r"\b(?:total\w*|global\w*|cumul\w*)\b",),
+        _STAGES | {"lf", "kwh"},
+        _conso_totale,
+        # un seul des deux sigles : c'est la conso de cette étape
+        forbidden=r"^(?=.*\beaf\b)(?!.*\blf\b)|^(?=.*\blf\b)(?!.*\beaf\b)",
+    ),
+    Intent(
+        "mttr_eaf",
+        ["MTTR EAF", "temps moyen de réparation EAF", "durée moyenne des arrêts EAF"],
+        (r"\bmttr\b|\btemps moyen de reparation\b|\bduree moyenne des arrets\b",),
+        _STAGES,
+        _mttr_eaf,
+    ),
+    Intent(
+        "nb_arrets_eaf",
+        ["nombre d'arrêts EAF", "combien d'arrêts au four EAF"],
+        (r"\b(?:nombre|combien|nb)\b", r"\barrets?\b"),
+        _STAGES,
+        _nb_arrets_eaf,
+    ),
+    Intent(
+        "duree_arrets_eaf",
+        ["durée totale des arrêts EAF", "temps d'arrêt cumulé EAF"],
+        (r"\b(?:duree|temps)\b", r"\barrets?\b", r"\b(?:total\w*|cumul\w*|somme)\b"),
+        _STAGES,
+        _duree_arrets_eaf,
+    ),
+    Intent(
+        "availability_kpi",
+        ["disponibilité EAF", "taux de disponibilité du four EAF"],
+        (r"\bdisponibilite\b",),
+        _STAGES,
+        _measure("availability_kpi", "Disponibilité EAF (%), 30 derniers jours"),
+    ),
+    Intent(
+        "top_products",
+        ["top 5 des nuances produites", "principales nuances par production", "top grades EAF"],
+        (r"\btop\b", r"\b(?:nuances?|grades?|produits?)\b"),
+        _STAGES | {"top"},
+        _measure("top_products", "Top nuances par production EAF"),
+        params=("year", "top_n"),
+    ),
+    Intent(
+        "revenue_monthly",
+        ["production mensuelle de brames", "poids des brames par mois"],
+        (r"\b(?:production|poids)\b", r"\bbrames?\b", r"\bmensuel\w*|\bpar mois\b"),
+        frozenset({"ccm"}),
+        _measure("revenue_monthly", "Production de brames par mois"),
+        params=("year",),
+    ),
+    Intent(
+        "production_by_type",
+        ["répartition de la production par nuance", "distribution de la production EAF par grade"],
+        (r"\b(?:repartition|distribution)\b", r"\bproduction\b", r"\bpar (?:nuance|grade|type)\b"),
+        _STAGES,
+        _measure("production_by_type", "Répartition de la production EAF par nuance, 90 derniers jours"),
+    ),
+]
+
+
+class IntentRouter:
+    """
+    Routeur thread-safe des questions KPI connues.
+
+    Parameters
+    ----------
+    intents : list[Intent]
+        Intentions routables.
+    threshold : float
+        Confiance minimale (cosinus avec l'exemple le plus proche).
+    margin : float
+        Écart minimal de confiance avec la deuxième candidate.
+    enabled : bool
+        Routeur désactivé : route() renvoie toujours None.
+    """
+
+    def __init__(
+        self,
+        intents: Optional[List[Intent]] = None,
+        threshold: float = 0.45,
+        margin: float = 0.05,
+        enabled: bool = True,
+    ) -> None:
+        self.intents = INTENTS if intents is None else intents
+        self.threshold = threshold
+        self.margin = margin
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.routed: Counter = Counter()
+        self.fallthrough = 0
+        self.errors = 0
+
+    def classify(self, prompt: str) -> Optional[Tuple[Intent, Dict[str, Any], float]]:
+        """(intention, paramètres, confiance), ou None si la confiance est trop faible."""
+        text = normalize_prompt(prompt)
+        candidates = []
+        for intent in self.intents:
+            params = intent.match(text)
+            if params is not None:
+                candidates.append((intent.score(text), intent, params))
+        if not candidates:
+            return None
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        confidence, intent, params = candidates[0]
+        if confidence < self.threshold:
+            return None
+        if len(candidates) > 1 and confidence - candidates[1][0] < self.margin:
+            return None
+        return intent, params, confidence
+
+    def route(self, prompt: str, call_tool: ToolCaller) -> Optional[Dict[str, Any]]:
+        """
+        {"intent", "content", "confidence", "elapsed_ms"} pour une question
+        reconnue ; None pour laisser la main à l'agent.
+        """
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        match = self.classify(prompt)
+        if match is None:
+            with self._lock:
+                self.fallthrough += 1
+            return None
+        intent, params, confidence = match
+        try:
+            content = intent.run(call_tool, params)
+        except LookupError as e:
+            print(f"[DEBUG] Intent '{intent.name}' not answered: {e}")
+            with self._lock:
+                self.errors += 1
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.routed[intent.name] += 1
+        print(f"[DEBUG] Intent '{intent.name}' answered in {elapsed_ms:.1f} ms (confidence {confidence:.2f})")
+        return {"intent": intent.name, "content": content, "confidence": round(confidence, 3), "elapsed_ms": elapsed_ms}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = sum(self.routed.values())
+            lookups = routed + self.fallthrough + self.errors
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "routed": routed,
+                "fallthrough": self.fallthrough,
+                "errors": self.errors,
+                "route_rate": routed / lookups if lookups else 0.0,
+                "by_intent": dict(self.routed),
+            }
+
+
+INTENT_ROUTER = IntentRouter(
+    threshold=float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.45")),
+    enabled=os.getenv("INTENT_ROUTER", "0") == "1",
+)
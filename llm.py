@@ -1,10 +1,25 @@
 import re
-from openai import OpenAI
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from openai import OpenAI, AsyncOpenAI
 import json
 import inspect
-from typing import Dict, Callable, Any, List, Optional
+from typing import Dict, Callable, Any, AsyncIterator, Generator, Iterator, List, Optional, Tuple
 from system_prompt import SystemPrompt
-from tools import Tools  # Import the Tools class
+from tools import Tools, make_kpi, make_line, make_multi_series_chart, make_table  # Import the Tools class
+import db_pool
+from query_cache import cached_execute
+from scratchpad_store import SCRATCHPAD_STORE
+from tool_catalog import ToolCatalog
+from context_manager import ContextManager
+from prompt_cache import PROMPT_CACHE_STATS, supports_cache_control, with_cache_control
+from tool_call_parser import parse_tool_calls
+from speculation import SPECULATION_ENABLED, SPECULATION_STATS, Speculator
+from answer_cache import ANSWER_CACHE
+from plan_cache import PLAN_CACHE
+from intent_router import INTENT_ROUTER
 import os
 from dotenv import load_dotenv
 
@@ -14,11 +29,43 @@ KEY = os.getenv("OPENROUTER_API_KEY")
 print("[DEBUG] API Key loaded:", KEY[:5] + "*" * 10 + (KEY[-5:] if KEY else "Not found"))
 
 
-TOOL_TAG_RE = re.compile(
-    r"tool▁call▁begin.*?tool▁sep.*?(\w+)\s*```json\s*([\s\S]+?)```",
-    re.DOTALL
+MODEL = "deepseek/deepseek-r1-0528:free"
+# Passerelle OpenAI-compatible : OpenRouter, ou mock_llm_server.py hors ligne
+BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+# Argument {"$ref": "<clé>"} : résolu côté serveur depuis scratchpad["data_cache"]
+SCRATCHPAD_REF = "$ref"
+# Dernier chunk de streaming avec `usage` (tokens de prompt en cache)
+STREAM_OPTIONS = {"include_usage": True}
+# Bloc statique ajouté au prompt système (fait partie du préfixe mis en cache)
+META_COGNITIVE_PROMPT = """
+### 🧠 Meta-Cognition
+If you find yourself stuck, making repetitive errors, or if your plan is not working, use the self_reflect tool to critique your own work and formulate a new plan. This is your most powerful ability.
+
+### 🛠️ The Toolsmith
+You are not limited to the existing tools. If you need a specific function that doesn't exist, use create_new_tool to write it yourself in Python. For example, if you need to aggregate data by week, you can write a get_weekly_data tool and then use it.
+
+### 🎯 Mission Command
+At the beginning of your task, use update_goal_state to set your plan. After each significant step, update your state with the step you completed and any key findings. This helps you track progress on complex tasks.
+"""
+# Budget de tokens de l'historique envoyé au modèle (voir ContextManager)
+CONTEXT_MAX_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "32000"))
+MAX_TOOL_CALLS_MESSAGE = "⚠️ J'ai atteint la limite d'appels d'outils."
+
+# Pool borné pour les outils synchrones appelés depuis le moteur asyncio :
+# les requêtes SQLite & co. ne bloquent jamais la boucle d'événements.
+TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_EXECUTOR_WORKERS", "16")),
+    thread_name_prefix="llm-tool"
 )
 
+# Outils qui modifient l'état de l'agent : dans un lot, ils s'exécutent
+# en séquence dans l'ordre d'appel ; les autres tournent en parallèle.
+SEQUENTIAL_TOOLS = frozenset({
+    "save_to_scratchpad", "self_reflect", "update_goal_state", "create_new_tool",
+})
+# Nom du message "tool" qui regroupe les résultats d'un lot d'appels
+BATCH_TOOL_NAME = "tool_batch"
+
 def sql_query(query: str) -> List[tuple]:
     """
     Execute a SQL query on the SQLite database.
@@ -28,14 +75,9 @@ def sql_query(query: str) -> List[tuple]:
     Returns:
         List[tuple]: The query results as a list of tuples
     """
-    import sqlite3
     try:
         print("[DEBUG] Executing SQL query:", query)
-        conn = sqlite3.connect('databasevf.db')
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchall()
-        conn.close()
+        result = cached_execute(query)
         print("[DEBUG] SQL query result count:", len(result))
         return result
     except Exception as e:
@@ -52,21 +94,27 @@ class LLM:
     def __init__(self):
         print("[DEBUG] Initializing LLM")
         self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=BASE_URL,
             api_key=KEY
         )
-        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.async_client = AsyncOpenAI(
+            base_url=BASE_URL,
+            api_key=KEY
+        )
+        # Description / schémas des outils calculés une fois par version
+        self.tools = ToolCatalog()
+        # (clé, messages system) du dernier préfixe construit
+        self._prefix_cache: Optional[tuple] = None
         
         # Initialize the structured scratchpad with goal state tracking
-        self.scratchpad: Dict[str, Any] = {
-            "goal_state": {
-                "original_request": "",
-                "current_plan": [],
-                "completed_steps": [],
-                "key_findings": {}
-            },
-            "data_cache": {}  # Where large data blobs go
-        }
+        self.scratchpad: Dict[str, Any] = self._new_scratchpad()
+        self.context = ContextManager(CONTEXT_MAX_TOKENS, store=self.scratchpad["data_cache"])
+        self.dashboard_components: List[Dict[str, Any]] = []
+        # Outils en lecture seule lancés pendant la génération (opt-in)
+        self.speculative = SPECULATION_ENABLED
+        self.last_speculation: Optional[Dict[str, Any]] = None
+        # Appels d'outils de la dernière requête : [{"name", "arguments", "ok", "turn"}]
+        self.last_trace: List[Dict[str, Any]] = []
         
         # Register SQL query tool by default
         self.register_tool("sql_query", sql_query)
@@ -76,6 +124,10 @@ class LLM:
 
         # Register the Tools class methods
         self.register_tools_from_class(self.tool_instance) #New line
+
+        # Helpers UI : les composants de assemble_dashboard se construisent avec eux
+        for helper in (make_kpi, make_line, make_multi_series_chart, make_table):
+            self.register_tool(helper.__name__, helper)
         
         # Register scratchpad and meta-cognitive tools
         self.register_tool("save_to_scratchpad", self.save_to_scratchpad)
@@ -85,6 +137,51 @@ class LLM:
         self.register_tool("create_new_tool", self.create_new_tool)
         
         print("[DEBUG] LLM initialization complete with advanced cognitive capabilities")
+
+    @staticmethod
+    def _new_scratchpad() -> Dict[str, Any]:
+        """
+        Scratchpad vierge : goal state + cache des gros résultats.
+        """
+        return {
+            "goal_state": {
+                "original_request": "",
+                "current_plan": [],
+                "completed_steps": [],
+                "key_findings": {}
+            },
+            # Where large data blobs go : espace borné du store partagé
+            "data_cache": SCRATCHPAD_STORE.namespace()
+        }
+
+    def fork(self) -> "LLM":
+        """
+        Crée un agent léger pour une conversation : scratchpad, goal state,
+        composants de dashboard et outils créés à la volée lui sont propres,
+        tandis que le registre d'outils et les clients HTTP sont partagés.
+        """
+        session = copy.copy(self)
+        session.scratchpad = self._new_scratchpad()
+        session.context = ContextManager(self.context.budget_tokens, store=session.scratchpad["data_cache"])
+        session.dashboard_components = []
+        session.last_trace = []
+        # Les outils créés par create_new_tool vont dans la couche locale
+        session.tools = self.tools.child()
+        session.tool_instance = copy.copy(self.tool_instance)
+        return session
+
+    def _resolve_tool(self, tool_name: str) -> Callable:
+        """
+        Renvoie la fonction d'un outil. Les meta-outils (scratchpad, goal
+        state…) sont des méthodes liées à l'agent qui les a enregistrés :
+        on les relie à l'agent courant pour qu'une session n'écrive jamais
+        dans l'état d'une autre.
+        """
+        func = self.tools[tool_name]["function"]
+        owner = getattr(func, "__self__", None)
+        if isinstance(owner, LLM) and owner is not self:
+            return func.__func__.__get__(self)
+        return func
         
     def register_tool(self, name: str, func: Callable) -> None:
         """
@@ -163,6 +260,43 @@ class LLM:
         print(f"[DEBUG] Key '{key}' not found in scratchpad")
         return f"Error: Key '{key}' not found in scratchpad."
         
+    def resolve_scratchpad_refs(self, value: Any) -> Any:
+        """
+        Remplace récursivement chaque {"$ref": "<clé>"} par la donnée du
+        scratchpad, pour que les gros résultats passent d'un outil à l'autre
+        sans transiter par le modèle. "<clé>.series.0.data" désigne une
+        partie du résultat.
+
+        Raises:
+            LookupError: si la référence n'existe pas
+        """
+        if isinstance(value, dict):
+            if len(value) == 1 and SCRATCHPAD_REF in value:
+                return self._lookup_scratchpad_ref(str(value[SCRATCHPAD_REF]))
+            return {k: self.resolve_scratchpad_refs(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.resolve_scratchpad_refs(v) for v in value]
+        return value
+
+    def _lookup_scratchpad_ref(self, ref: str) -> Any:
+        cache = self.scratchpad["data_cache"]
+        key, path = ref, []
+        if key not in cache and key != "goal_state":
+            key, *path = ref.split(".")
+        if key == "goal_state":
+            value = self.scratchpad["goal_state"]
+        elif key in cache:
+            value = cache[key]
+        else:
+            raise LookupError(f"Scratchpad reference '{ref}' not found. Available keys: {list(cache)}")
+        try:
+            for part in path:
+                value = value[int(part)] if isinstance(value, (list, tuple)) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise LookupError(f"Scratchpad reference '{ref}': invalid path '{'.'.join(path)}'")
+        print(f"[DEBUG] Resolved scratchpad reference '{ref}'")
+        return value
+
     def _generate_scratchpad_key(self, prefix: str = "result") -> str:
         """
         Helper to create unique keys for the scratchpad.
@@ -261,6 +395,7 @@ class LLM:
             self.register_tool(tool_name, bound_method)
             # Update the function's docstring
             self.tools[tool_name]['description'] = description
+            self.tools.invalidate(tool_name)
             
             print(f"[DEBUG] Successfully created and registered new tool: '{tool_name}'")
             return f"Success! The tool '{tool_name}' has been created and is now available for use."
@@ -271,24 +406,18 @@ class LLM:
     def get_tools_description(self) -> str:
         """
         Generate a string description of all available tools.
+        The catalog caches it until a tool is added.
         
         Returns:
             str: A formatted string describing all available tools
         """
-        print("[DEBUG] Generating tools description")
-        if not self.tools:
-            return "No tools available."
-            
-        descriptions = ["Available tools:"]
-        for name, tool_info in self.tools.items():
-            descriptions.append(f"\n- {name}: {tool_info['description']}")
-            if tool_info['parameters']:
-                descriptions.append("  Parameters:")
-                for param_name, param_info in tool_info['parameters'].items():
-                    required = "required" if param_info['required'] else "optional"
-                    descriptions.append(f"    - {param_name} ({param_info['type']}): {required}")
-        
-        return "\n".join(descriptions)
+        return self.tools.description()
+
+    def get_tool_schemas(self) -> List[Dict[str, Any]]:
+        """
+        Function-calling schemas (OpenAI format) of all available tools, cached like the description.
+        """
+        return self.tools.schemas()
         
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
         """
@@ -307,7 +436,13 @@ class LLM:
             return f"Error: Tool '{tool_name}' not found. Available tools: {list(self.tools.keys())}"
             
         try:
-            tool_func = self.tools[tool_name]["function"]
+            arguments = self.resolve_scratchpad_refs(arguments)
+        except LookupError as e:
+            print(f"[DEBUG] {e}")
+            return f"Error: {e}"
+
+        try:
+            tool_func = self._resolve_tool(tool_name)
             result = tool_func(**arguments)
             print(f"[DEBUG] Tool '{tool_name}' executed successfully")
             return result
@@ -316,162 +451,173 @@ class LLM:
             print(f"[DEBUG] {error_msg}")
             return error_msg
 
+    async def aexecute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Version asyncio de execute_tool. Les outils `async def` sont attendus
+        directement ; les outils synchrones tournent dans TOOL_EXECUTOR pour
+        ne jamais bloquer la boucle d'événements.
+        """
+        tool = self.tools.get(tool_name)
+        if tool is None or not inspect.iscoroutinefunction(tool["function"]):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(TOOL_EXECUTOR, partial(self.execute_tool, tool_name, arguments))
 
-    
-    def parse_tool_call(self,msg:str):
-        print("[DEBUG] Parsing tool call from message")
-        
-        # 1) Format natif {"tool_call": …}
-        blocks = re.findall(r"```json\s*([\s\S]*?)\s*```", msg)
-        for b in blocks:
-            try:
-                # Normalize whitespace and newlines in JSON before parsing
-                normalized_json = re.sub(r'(?<!\\)\n', '\\n', b)
-                obj = json.loads(normalized_json)
-                if "tool_call" in obj:
-                    print(f"[DEBUG] Found tool call in JSON format: {obj['tool_call']['name']}")
-                    return obj["tool_call"]
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] JSON decode error in tool call parsing: {str(e)}")
-                # Try to fix common JSON errors
-                try:
-                    # Fix trailing commas
-                    fixed_json = re.sub(r',\s*}', '}', b)
-                    fixed_json = re.sub(r',\s*]', ']', fixed_json)
-                    # Normalize newlines in strings
-                    fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
-                    obj = json.loads(fixed_json)
-                    if "tool_call" in obj:
-                        print(f"[DEBUG] Found tool call after fixing JSON: {obj['tool_call']['name']}")
-                        return obj["tool_call"]
-                except Exception:
-                    print("[DEBUG] Failed to fix JSON format")
-                    pass
-
-        # 2) Try direct JSON format without tool_call wrapper
-        for b in blocks:
-            try:
-                # Normalize whitespace and newlines in JSON before parsing
-                normalized_json = re.sub(r'(?<!\\)\n', '\\n', b)
-                obj = json.loads(normalized_json)
-                if "name" in obj and "arguments" in obj:
-                    print(f"[DEBUG] Found direct tool call format: {obj['name']}")
-                    return obj
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] JSON decode error in direct format parsing: {str(e)}")
-                # Try to fix common JSON errors
-                try:
-                    # Fix trailing commas
-                    fixed_json = re.sub(r',\s*}', '}', b)
-                    fixed_json = re.sub(r',\s*]', ']', fixed_json)
-                    # Normalize newlines in strings
-                    fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
-                    obj = json.loads(fixed_json)
-                    if "name" in obj and "arguments" in obj:
-                        print(f"[DEBUG] Found direct tool call after fixing JSON: {obj['name']}")
-                        return obj
-                except Exception:
-                    print("[DEBUG] Failed to fix JSON format")
-                    pass
-                
-        # 3) Fallback : balises <|tool▁call▁begin|>
-        m = TOOL_TAG_RE.search(msg)
-        if m:
-            try:
-                name = m.group(1)
-                args_text = m.group(2)
-                # Normalize whitespace and newlines in JSON before parsing
-                normalized_json = re.sub(r'(?<!\\)\n', '\\n', args_text)
-                args = json.loads(normalized_json)
-                print(f"[DEBUG] Found tool call using regex: {name}")
-                return {"name": name, "arguments": args}
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] JSON decode error in regex pattern: {str(e)}")
-                # Try to fix common JSON errors
-                try:
-                    # Fix trailing commas
-                    fixed_json = re.sub(r',\s*}', '}', args_text)
-                    fixed_json = re.sub(r',\s*]', ']', fixed_json)
-                    # Normalize newlines in strings
-                    fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
-                    args = json.loads(fixed_json)
-                    print(f"[DEBUG] Found tool call after fixing JSON: {name}")
-                    return {"name": name, "arguments": args}
-                except Exception:
-                    print("[DEBUG] Failed to fix JSON format")
-                    pass
-
-        # 4) Last attempt: Try to find any JSON object with name and arguments
+        print(f"[DEBUG] Executing async tool: {tool_name} with arguments: {arguments}")
         try:
-            # Look for any JSON-like structure in the message
-            potential_json_matches = re.finditer(r'{[\s\S]*?}', msg)
-            for match in potential_json_matches:
-                try:
-                    json_str = match.group(0)
-                    # Normalize whitespace and newlines in JSON before parsing
-                    normalized_json = re.sub(r'(?<!\\)\n', '\\n', json_str)
-                    obj = json.loads(normalized_json)
-                    
-                    # Check for tool_call wrapper
-                    if "tool_call" in obj and "name" in obj["tool_call"] and "arguments" in obj["tool_call"]:
-                        print(f"[DEBUG] Found tool call in raw JSON: {obj['tool_call']['name']}")
-                        return obj["tool_call"]
-                    
-                    # Check for direct format
-                    if "name" in obj and "arguments" in obj:
-                        print(f"[DEBUG] Found tool call in raw JSON: {obj['name']}")
-                        return obj
-                except json.JSONDecodeError as e:
-                    print(f"[DEBUG] Failed to parse potential JSON match: {str(e)}")
-                    # Try to fix common JSON errors
-                    try:
-                        # Fix trailing commas
-                        fixed_json = re.sub(r',\s*}', '}', json_str)
-                        fixed_json = re.sub(r',\s*]', ']', fixed_json)
-                        # Normalize newlines in strings
-                        fixed_json = re.sub(r'(?<!\\)\n', '\\n', fixed_json)
-                        obj = json.loads(fixed_json)
-                        
-                        # Check for tool_call wrapper
-                        if "tool_call" in obj and "name" in obj["tool_call"] and "arguments" in obj["tool_call"]:
-                            print(f"[DEBUG] Found tool call after fixing JSON: {obj['tool_call']['name']}")
-                            return obj["tool_call"]
-                        
-                        # Check for direct format
-                        if "name" in obj and "arguments" in obj:
-                            print(f"[DEBUG] Found tool call after fixing JSON: {obj['name']}")
-                            return obj
-                    except Exception:
-                        print("[DEBUG] Failed to fix JSON format")
-                        continue
-        except Exception as e:
-            print(f"[DEBUG] Failed to parse raw JSON: {str(e)}")
-            pass
+            arguments = self.resolve_scratchpad_refs(arguments)
+        except LookupError as e:
+            print(f"[DEBUG] {e}")
+            return f"Error: {e}"
 
-        # 5) Special case: Fix SQL query fragments with line breaks
         try:
-            # Look for tool_call with sql_query and fix the query parameter
-            sql_pattern = re.search(r'{\s*"tool_call"\s*:\s*{\s*"name"\s*:\s*"sql_query"\s*,\s*"arguments"\s*:\s*{\s*"query"\s*:\s*"(.*?)"\s*}\s*}\s*}', msg, re.DOTALL)
-            if sql_pattern:
-                query_text = sql_pattern.group(1)
-                # Clean up the query text - remove unescaped newlines and trailing fragments
-                clean_query = re.sub(r'(?<!\\)\n', ' ', query_text)
-                # Remove any trailing fragments that might cause JSON parsing issues
-                clean_query = re.sub(r',\s*\w+,\s*$', '', clean_query)
-                clean_query = re.sub(r'\w+,\s*$', '', clean_query)
-                clean_query = re.sub(r'\w+;\s*"\s*$', '"', clean_query)
-                
-                fixed_json = f'{{"tool_call": {{"name": "sql_query", "arguments": {{"query": "{clean_query}"}}}}}}'
-                obj = json.loads(fixed_json)
-                print(f"[DEBUG] Fixed SQL query tool call")
-                return obj["tool_call"]
+            result = await self._resolve_tool(tool_name)(**arguments)
+            print(f"[DEBUG] Tool '{tool_name}' executed successfully")
+            return result
         except Exception as e:
-            print(f"[DEBUG] Failed to fix SQL query: {str(e)}")
-            pass
+            error_msg = f"Error executing tool '{tool_name}': {str(e)}"
+            print(f"[DEBUG] {error_msg}")
+            return error_msg
+
+    def execute_tools(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        speculator: Optional[Speculator] = None
+    ) -> List[Any]:
+        """
+        Exécute un lot d'appels d'outils et renvoie les résultats dans
+        l'ordre des appels. Les outils indépendants tournent en parallèle
+        dans TOOL_EXECUTOR (chaque thread a sa propre connexion db_pool) ;
+        ceux de SEQUENTIAL_TOOLS s'exécutent dans l'ordre, dans le thread
+        appelant. Les appels déjà lancés par `speculator` sont réutilisés.
+        """
+        claimed = self._claim_speculative(calls, speculator)
+        if len(calls) == 1 and not claimed:
+            return [self.execute_tool(*calls[0])]
+        print(f"[DEBUG] Executing batch of {len(calls)} tool calls ({len(claimed)} already running)")
+        futures = {
+            i: claimed.get(i) or TOOL_EXECUTOR.submit(self.execute_tool, name, arguments)
+            for i, (name, arguments) in enumerate(calls)
+            if name not in SEQUENTIAL_TOOLS
+        }
+        results: List[Any] = [None] * len(calls)
+        for i, (name, arguments) in enumerate(calls):
+            if i not in futures:
+                results[i] = self.execute_tool(name, arguments)
+        for i, future in futures.items():
+            results[i] = future.result()
+        return results
+
+    async def aexecute_tools(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        speculator: Optional[Speculator] = None
+    ) -> List[Any]:
+        """
+        Version asyncio de execute_tools.
+        """
+        claimed = self._claim_speculative(calls, speculator)
+        if len(calls) == 1 and not claimed:
+            return [await self.aexecute_tool(*calls[0])]
+        print(f"[DEBUG] Executing batch of {len(calls)} tool calls ({len(claimed)} already running)")
+        tasks = {
+            i: asyncio.wrap_future(claimed[i]) if i in claimed
+            else asyncio.ensure_future(self.aexecute_tool(name, arguments))
+            for i, (name, arguments) in enumerate(calls)
+            if name not in SEQUENTIAL_TOOLS
+        }
+        results: List[Any] = [None] * len(calls)
+        for i, (name, arguments) in enumerate(calls):
+            if i not in tasks:
+                results[i] = await self.aexecute_tool(name, arguments)
+        for i, task in tasks.items():
+            results[i] = await task
+        return results
+
 
-        print("[DEBUG] No tool call found in message")
-        return None
     
+    @staticmethod
+    def _claim_speculative(
+        calls: List[Tuple[str, Dict[str, Any]]],
+        speculator: Optional[Speculator]
+    ) -> Dict[int, Any]:
+        """
+        Index de l'appel → future déjà lancée pendant la génération.
+        """
+        if speculator is None:
+            return {}
+        claimed = {}
+        for i, (name, arguments) in enumerate(calls):
+            future = speculator.claim(name, arguments)
+            if future is not None:
+                claimed[i] = future
+        return claimed
+
+    def _cached_answer(self, prompt: str, system_prompt_override: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Événement final servi par ANSWER_CACHE, ou None (prompt système standard seulement)."""
+        if system_prompt_override is not None:
+            return None
+        answer = ANSWER_CACHE.get(prompt)
+        if answer is None:
+            return None
+        return {"type": "final", "content": answer, "cached": True}
+
+    def _routed_answer(self, prompt: str, system_prompt_override: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Événement final d'une question KPI reconnue par INTENT_ROUTER (SQL +
+        fonction KPI, sans appel au modèle), ou None pour la boucle ReAct.
+        """
+        if system_prompt_override is not None:
+            return None
+        routed = INTENT_ROUTER.route(prompt, self.execute_tool)
+        if routed is None:
+            return None
+        return {"type": "final", "content": routed["content"], "routed": routed["intent"]}
+
+    def _remember_run(self, prompt: str, system_prompt_override: Optional[str], answer: str) -> None:
+        """
+        Met en cache la réponse finale (ANSWER_CACHE) et le plan d'appels
+        (PLAN_CACHE) d'une requête terminée sans erreur d'outil.
+        """
+        if system_prompt_override is not None or answer == MAX_TOOL_CALLS_MESSAGE:
+            return
+        if not answer or not all(call["ok"] for call in self.last_trace):
+            return
+        ANSWER_CACHE.put(prompt, answer, self.last_trace)
+        PLAN_CACHE.record(prompt, self.last_trace)
+
+    def _speculator(self) -> Optional[Speculator]:
+        """Spéculation de la requête en cours (None si désactivée)."""
+        if not self.speculative:
+            return None
+        return Speculator(lambda name, arguments: TOOL_EXECUTOR.submit(self.execute_tool, name, arguments))
+
+    def _finish_speculation(self, speculator: Optional[Speculator]) -> Optional[Dict[str, Any]]:
+        """Clôt la spéculation de la requête : événement à remonter, ou None."""
+        if speculator is None:
+            return None
+        speculator.settle()
+        self.last_speculation = speculator.report()
+        SPECULATION_STATS.record(self.last_speculation)
+        return {"type": "speculation", **self.last_speculation}
+
+    def parse_tool_call(self, msg: str) -> Optional[Dict[str, Any]]:
+        """
+        Premier appel d'outil de la réponse (None s'il n'y en a pas).
+        """
+        calls = self.parse_tool_calls(msg)
+        return calls[0] if calls else None
+
+    def parse_tool_calls(self, msg: str) -> List[Dict[str, Any]]:
+        """
+        Tous les appels d'outils d'une réponse, dans l'ordre : blocs
+        ```json, {"tool_calls": [...]}, JSON brut ou balises DeepSeek
+        (scanner en une passe de tool_call_parser).
+        """
+        calls = parse_tool_calls(msg)
+        if calls:
+            print(f"[DEBUG] Found {len(calls)} tool call(s): {[c['name'] for c in calls]}")
+        return calls
+
     def clean_response_for_context(self, response: str) -> str:
         """
         Clean assistant response for inclusion in conversation context.
@@ -502,174 +648,470 @@ class LLM:
         return cleaned if cleaned else ""
 
 
-    def get_completion(
+    def _build_chat_history(
         self,
         prompt: str,
-        system_prompt_override: Optional[str] = None,
-        max_tool_calls: int = 10
-    ) -> str:
+        system_prompt_override: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Boucle ReAct complète : appels d'outils, gestion des rôles,
-        nettoyage du HTML final.
+        Prépare les messages "system" + le message utilisateur initial.
+        Le préfixe system est identique d'une requête à l'autre (cache
+        de prompt du fournisseur) ; seul le message utilisateur varie.
         """
-        print(f"[DEBUG] Getting completion for prompt: {prompt[:50]}...")
+        return [
+            *self._system_messages(system_prompt_override),
+            {"role": "user",   "content": prompt},
+        ]
+
+    def _system_messages(self, system_prompt_override: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Préfixe statique (prompt métier + méta-cognition + catalogue
+        d'outils), reconstruit seulement si le catalogue change.
+        """
+        key = (system_prompt_override, self.tools.version, MODEL)
+        if self._prefix_cache is None or self._prefix_cache[0] != key:
+            sys_base = (system_prompt_override or SystemPrompt().system_prompt) + META_COGNITIVE_PROMPT
+            messages = [
+                {"role": "system", "content": sys_base},
+                {"role": "system", "content": self.get_tools_description()},
+            ]
+            if supports_cache_control(MODEL):
+                messages[-1] = with_cache_control(messages[-1])
+            self._prefix_cache = (key, messages)
+        return [dict(m) for m in self._prefix_cache[1]]
+
+    def _model_request(self, chat_history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Paramètres communs à tous les appels chat.completions.
+        """
+        return dict(
+            model=MODEL,
+            messages=chat_history,
+            extra_headers={
+                "HTTP-Referer": "<YOUR_SITE_URL>",
+                "X-Title": "<YOUR_SITE_NAME>",
+            },
+        )
+
+    @staticmethod
+    def _chunk_events(chunk: Any) -> List[Dict[str, Any]]:
+        """
+        Traduit un chunk de streaming en événements "reasoning" / "token".
+        """
+        if not chunk.choices:
+            return []
+        delta = chunk.choices[0].delta
+        events = []
+        # OpenRouter expose `reasoning`, l'API DeepSeek `reasoning_content`
+        reasoning = getattr(delta, "reasoning", None) or getattr(delta, "reasoning_content", None)
+        if reasoning:
+            events.append({"type": "reasoning", "content": reasoning})
+        if delta.content:
+            events.append({"type": "token", "content": delta.content})
+        return events
 
-        # ────────────────────────────────────────────────────────────
-        # 1) Prépare les messages "system"
-        # ────────────────────────────────────────────────────────────
-        sys_base = system_prompt_override or SystemPrompt().system_prompt
+    def _call_model(
+        self,
+        chat_history: List[Dict[str, Any]],
+        stream: bool = False
+    ) -> Generator[Dict[str, Any], None, str]:
+        """
+        Un appel au modèle. En mode `stream`, yield les événements
+        "reasoning" / "token" au fil de l'eau ; renvoie le contenu complet
+        (valeur de retour du générateur, à récupérer via `yield from`).
+        """
+        request = self._model_request(chat_history)
+        if not stream:
+            completion = self.client.chat.completions.create(**request)
+            PROMPT_CACHE_STATS.record(getattr(completion, "usage", None))
+            return completion.choices[0].message.content or ""
+
+        parts: List[str] = []
+        for chunk in self.client.chat.completions.create(stream=True, stream_options=STREAM_OPTIONS, **request):
+            PROMPT_CACHE_STATS.record(getattr(chunk, "usage", None))
+            for event in self._chunk_events(chunk):
+                if event["type"] == "token":
+                    parts.append(event["content"])
+                yield event
+        return "".join(parts)
+
+    async def _acall_model(self, chat_history: List[Dict[str, Any]]) -> str:
+        """
+        Version asyncio de _call_model (sans streaming).
+        """
+        completion = await self.async_client.chat.completions.create(**self._model_request(chat_history))
+        PROMPT_CACHE_STATS.record(getattr(completion, "usage", None))
+        return completion.choices[0].message.content or ""
+
+    async def _astream_model(self, chat_history: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Version asyncio de _call_model en mode streaming.
+        """
+        response = await self.async_client.chat.completions.create(
+            stream=True, stream_options=STREAM_OPTIONS, **self._model_request(chat_history)
+        )
+        async for chunk in response:
+            PROMPT_CACHE_STATS.record(getattr(chunk, "usage", None))
+            for event in self._chunk_events(chunk):
+                yield event
+
+    def _self_reflection_history(
+        self,
+        chat_history: List[Dict[str, Any]],
+        tool_result: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Élague l'historique jusqu'au dernier message utilisateur et injecte
+        la critique + le nouveau plan renvoyés par self_reflect.
+        """
+        print("[DEBUG] Self-reflection triggered. Pruning history and injecting new plan.")
+        critique = tool_result.get("critique", "No critique provided.")
+        new_plan = tool_result.get("new_plan", "No new plan provided.")
         
-        # Add meta-cognitive capabilities to the system prompt
-        meta_cognitive_prompt = """
-### 🧠 Meta-Cognition
-If you find yourself stuck, making repetitive errors, or if your plan is not working, use the self_reflect tool to critique your own work and formulate a new plan. This is your most powerful ability.
+        # Find the last user message to prune back to
+        last_user_msg_index = -1
+        for i in range(len(chat_history) - 1, -1, -1):
+            if chat_history[i]["role"] == "user":
+                last_user_msg_index = i
+                break
+        
+        # Prune the history, keeping system prompts and the last user message
+        if last_user_msg_index != -1:
+            chat_history = chat_history[:last_user_msg_index + 1]
+        
+        # Inject a summary of the self-correction
+        correction_summary = f"System Note: The previous attempt failed. Critique: '{critique}'. Adopting a new plan: '{new_plan}'"
+        chat_history.append({"role": "system", "content": correction_summary})
+        
+        print("[DEBUG] Chat history pruned and reset with new plan")
+        return chat_history
 
-### 🛠️ The Toolsmith
-You are not limited to the existing tools. If you need a specific function that doesn't exist, use create_new_tool to write it yourself in Python. For example, if you need to aggregate data by week, you can write a get_weekly_data tool and then use it.
+    def _tool_message(self, name: str, tool_result: Any) -> Dict[str, Any]:
+        """
+        Construit le message rôle "tool" avec gestion intelligente des gros
+        résultats (déportés dans le scratchpad).
+        """
+        tool_content_for_history = ""
+        
+        # Define what constitutes a "large" result
+        is_large_result = False
+        result_size = 0
+        
+        if isinstance(tool_result, list):
+            result_size = len(tool_result)
+            is_large_result = result_size > 10  # More than 10 items is considered large
+        
+        try:
+            payload = json.dumps(tool_result, ensure_ascii=False, default=str)
+            print(f"[DEBUG] Tool result serialized, length: {len(payload)}")
+            # Also consider character length for string results
+            is_large_result = is_large_result or len(payload) > 1000  # More than 1000 chars is large
+        except TypeError:
+            print("[DEBUG] Failed to serialize tool result")
+            payload = json.dumps({"error": "Unserialisable result"}, ensure_ascii=False)
+            
+        # Handle large results with the scratchpad pattern
+        if is_large_result and name != "load_from_scratchpad":
+            # The result is too big! Save it to the scratchpad
+            key = self._generate_scratchpad_key(prefix=f"{name}_result")
+            try:
+                self.scratchpad["data_cache"][key] = tool_result
+            except ValueError as e:
+                print(f"[DEBUG] Large result not stored: {e}")
+                return {
+                    "role": "tool",
+                    "name": name,
+                    "content": f"Error: tool '{name}' returned a result too large to keep ({len(payload)} chars). "
+                               "Narrow it down (filters, aggregation, LIMIT) and call the tool again.",
+                }
+            
+            # Create a summary message for the AI instead of the raw data
+            summary = f"Tool '{name}' executed. Result is large ({result_size} items or {len(payload)} chars). "
+            summary += f"It has been saved to your scratchpad with key '{key}'. "
+            summary += f'Pass {{"{SCRATCHPAD_REF}": "{key}"}} as a tool argument to use it without loading it '
+            summary += f'(e.g. {{"{SCRATCHPAD_REF}": "{key}.0"}} for a part); use load_from_scratchpad only to read it.'
+            
+            # Also save a reference to this result in the goal state's key_findings
+            if name.startswith("sql_query") or name.startswith("get_timeseries"):
+                finding_key = f"data_{len(self.scratchpad['goal_state']['key_findings']) + 1}"
+                self.scratchpad['goal_state']['key_findings'][finding_key] = f"Large dataset from {name} stored at key: {key}"
+            
+            tool_content_for_history = summary
+            print(f"[DEBUG] Large result detected. Saved to scratchpad with key '{key}'")
+        else:
+            # The result is small enough, pass it directly
+            tool_content_for_history = payload
 
-### 🎯 Mission Command
-At the beginning of your task, use update_goal_state to set your plan. After each significant step, update your state with the step you completed and any key findings. This helps you track progress on complex tasks.
-"""
-        sys_base += meta_cognitive_prompt
-        sys_tools = self.get_tools_description()
+        return {
+            "role": "tool",
+            "name": name,
+            "content": tool_content_for_history
+        }
 
-        chat_history = [
-            {"role": "system", "content": sys_base},
-            {"role": "system", "content": sys_tools},
-            {"role": "user",   "content": prompt},
-        ]
+    def _react_loop(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10
+    ) -> Generator[tuple, Any, None]:
+        """
+        Cœur de la boucle ReAct, indépendant des E/S pour être partagé entre
+        le moteur synchrone et le moteur asyncio. Yield des étapes :
+        - ("model", chat_history)            → le driver renvoie le contenu
+        - ("tools", [(name, arguments), …])  → le driver renvoie les résultats
+        - ("event", {...})                   → événement à remonter à l'appelant
+        La boucle se termine toujours par un événement "final".
+        """
+        chat_history = self._build_chat_history(prompt, system_prompt_override)
 
         # Save the original request to the goal state
         self.update_goal_state(original_request=prompt)
+        self.last_trace = []
 
         tool_call_count = 0
+        turn = 0
         print(f"[DEBUG] Starting ReAct loop with max {max_tool_calls} tool calls")
+        # Plan d'une question de même gabarit : premier lot joué sans appel au modèle
+        replay = PLAN_CACHE.plan(prompt) if system_prompt_override is None else None
 
-        # ────────────────────────────────────────────────────────────
-        # 2) Boucle ReAct
-        # ────────────────────────────────────────────────────────────
         while tool_call_count < max_tool_calls:
             print(f"[DEBUG] ReAct iteration {tool_call_count + 1}")
-            completion = self.client.chat.completions.create(
-                model="deepseek/deepseek-r1-0528:free",
-                messages=chat_history,
-                extra_headers={
-                    "HTTP-Referer": "<YOUR_SITE_URL>",
-                    "X-Title": "<YOUR_SITE_NAME>",
-                },
-            )
-
-            assistant_msg = completion.choices[0].message
-            content       = assistant_msg.content or ""
+            # Compactage au budget de tokens (ancres system + demande conservées)
+            chat_history = self.context.fit(chat_history)
+            replaying = replay is not None
+            if replaying:
+                yield ("event", {"type": "plan_replay", "calls": len(replay)})
+                content, replay = _tool_calls_text(replay), None
+            else:
+                content = yield ("model", chat_history)
             chat_history.append({"role": "assistant", "content": content})
 
             print(f"[DEBUG] LLM Response: {content[:200]}...")
 
-            # ── 2.a Détection de l'appel d'outil ────────────────────
-            tool_call = self.parse_tool_call(content)
-            if not tool_call:
+            # ── Détection des appels d'outils ───────────────────────
+            tool_calls = self.parse_tool_calls(content)
+            if not tool_calls:
                 # Pas d'appel d'outil ⇒ réponse finale
                 print("[DEBUG] No tool call detected, returning final response")
-                cleaned = _extract_html_if_any(content)
-                return cleaned
-
-            name      = tool_call.get("name")
-            arguments = tool_call.get("arguments", {})
-
-            print(f"[DEBUG] Tool call detected: {name} with args: {arguments}")
-            tool_result = self.execute_tool(name, arguments)
-
-            # --- NEW: Self-Correction Logic ---
-            if name == "self_reflect":
-                print("[DEBUG] Self-reflection triggered. Pruning history and injecting new plan.")
-                critique = tool_result.get("critique", "No critique provided.")
-                new_plan = tool_result.get("new_plan", "No new plan provided.")
-                
-                # Find the last user message to prune back to
-                last_user_msg_index = -1
-                for i in range(len(chat_history) - 1, -1, -1):
-                    if chat_history[i]["role"] == "user":
-                        last_user_msg_index = i
-                        break
-                
-                # Prune the history, keeping system prompts and the last user message
-                if last_user_msg_index != -1:
-                    chat_history = chat_history[:last_user_msg_index + 1]
-                
-                # Inject a summary of the self-correction
-                correction_summary = f"System Note: The previous attempt failed. Critique: '{critique}'. Adopting a new plan: '{new_plan}'"
-                chat_history.append({"role": "system", "content": correction_summary})
-                
-                # Restart the loop iteration with the new, corrected history
-                print("[DEBUG] Chat history pruned and reset with new plan")
+                yield ("event", {"type": "final", "content": _extract_html_if_any(content)})
+                return
+
+            # Un lot par tour, dans la limite des appels restants
+            batch = [
+                (call.get("name"), call.get("arguments") or {})
+                for call in tool_calls[:max_tool_calls - tool_call_count]
+            ]
+            # self_reflect réinitialise l'historique : il s'exécute seul
+            reflection = next((call for call in batch if call[0] == "self_reflect"), None)
+            if reflection is not None:
+                batch = [reflection]
+
+            for name, arguments in batch:
+                print(f"[DEBUG] Tool call detected: {name} with args: {arguments}")
+                yield ("event", {"type": "tool_call_start", "name": name, "arguments": arguments})
+            tool_results = yield ("tools", batch)
+            self.last_trace.extend(
+                {"name": name, "arguments": arguments, "ok": not _tool_failed(result), "turn": turn}
+                for (name, arguments), result in zip(batch, tool_results)
+            )
+            turn += 1
+            if replaying and not all(call["ok"] for call in self.last_trace):
+                PLAN_CACHE.discard(prompt)
+
+            # --- Self-Correction Logic ---
+            if reflection is not None and isinstance(tool_results[0], dict):
+                yield ("event", {"type": "tool_call_end", "name": "self_reflect", "result": tool_results[0]})
+                chat_history = self._self_reflection_history(chat_history, tool_results[0])
                 continue
-            # --- END of Self-Correction Logic ---
 
-            # Mettez à jour la liste de composants si on vient de builder le dashboard
-            if name == "assemble_dashboard" and isinstance(arguments, dict):
-                self.dashboard_components = arguments.get("components", [])
-                print(f"[DEBUG] Updated dashboard components: {len(self.dashboard_components)} items")
+            tool_messages = []
+            for (name, arguments), tool_result in zip(batch, tool_results):
+                # Mettez à jour la liste de composants si on vient de builder le dashboard
+                if name == "assemble_dashboard" and isinstance(arguments, dict):
+                    self.dashboard_components = arguments.get("components", [])
+                    print(f"[DEBUG] Updated dashboard components: {len(self.dashboard_components)} items")
 
-            # ── 2.b Ajout du message rôle "tool" avec gestion intelligente des gros résultats ─────
-            tool_content_for_history = ""
-            
-            # Define what constitutes a "large" result
-            is_large_result = False
-            result_size = 0
-            
-            if isinstance(tool_result, list):
-                result_size = len(tool_result)
-                is_large_result = result_size > 10  # More than 10 items is considered large
-            
+                tool_message = self._tool_message(name, tool_result)
+                tool_messages.append(tool_message)
+                yield ("event", {"type": "tool_call_end", "name": name, "result": tool_message["content"]})
+            chat_history.append(_batch_tool_message(tool_messages))
+
+            tool_call_count += len(batch)
+
+        # Sécurité : trop d'appels d'outil
+        print("[DEBUG] Max tool calls reached – aborting.")
+        yield ("event", {"type": "final", "content": MAX_TOOL_CALLS_MESSAGE})
+
+    def _run_loop(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10,
+        stream: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Driver synchrone de _react_loop : client OpenAI bloquant, lots
+        d'outils indépendants exécutés en parallèle (execute_tools). En
+        mode spéculatif, le modèle est toujours lu en streaming pour lancer
+        les outils en lecture seule dès que leur appel est complet.
+        """
+        cached = self._cached_answer(prompt, system_prompt_override)
+        if cached is None:
+            cached = self._routed_answer(prompt, system_prompt_override)
+        if cached is not None:
+            yield cached
+            return
+        steps = self._react_loop(prompt, system_prompt_override, max_tool_calls)
+        speculator = self._speculator()
+        reply = None
+        while True:
             try:
-                payload = json.dumps(tool_result, ensure_ascii=False, default=str)
-                print(f"[DEBUG] Tool result serialized, length: {len(payload)}")
-                # Also consider character length for string results
-                is_large_result = is_large_result or len(payload) > 1000  # More than 1000 chars is large
-            except TypeError:
-                print("[DEBUG] Failed to serialize tool result")
-                payload = json.dumps({"error": "Unserialisable result"}, ensure_ascii=False)
-                
-            # Handle large results with the scratchpad pattern
-            if is_large_result and name != "load_from_scratchpad":
-                # The result is too big! Save it to the scratchpad
-                key = self._generate_scratchpad_key(prefix=f"{name}_result")
-                self.scratchpad["data_cache"][key] = tool_result
-                
-                # Create a summary message for the AI instead of the raw data
-                summary = f"Tool '{name}' executed. Result is large ({result_size} items or {len(payload)} chars). "
-                summary += f"It has been saved to your scratchpad with key '{key}'. "
-                summary += "Use load_from_scratchpad to access it when needed."
-                
-                # Also save a reference to this result in the goal state's key_findings
-                if name.startswith("sql_query") or name.startswith("get_timeseries"):
-                    finding_key = f"data_{len(self.scratchpad['goal_state']['key_findings']) + 1}"
-                    self.scratchpad['goal_state']['key_findings'][finding_key] = f"Large dataset from {name} stored at key: {key}"
-                
-                tool_content_for_history = summary
-                print(f"[DEBUG] Large result detected. Saved to scratchpad with key '{key}'")
+                step = steps.send(reply)
+            except StopIteration:
+                return
+            reply = None
+            if step[0] == "model":
+                if speculator is None:
+                    reply = yield from self._call_model(step[1], stream=stream)
+                    continue
+                events = self._call_model(step[1], stream=True)
+                while True:
+                    try:
+                        event = next(events)
+                    except StopIteration as done:
+                        reply = done.value
+                        break
+                    if event["type"] == "token":
+                        speculator.feed(event["content"])
+                    if stream:
+                        yield event
+                speculator.model_done()
+            elif step[0] == "tools":
+                reply = self.execute_tools(step[1], speculator)
+                if speculator is not None:
+                    speculator.settle()
             else:
-                # The result is small enough, pass it directly
-                tool_content_for_history = payload
+                if step[1]["type"] == "final":
+                    self._remember_run(prompt, system_prompt_override, step[1]["content"])
+                    report = self._finish_speculation(speculator)
+                    if report is not None:
+                        yield report
+                yield step[1]
 
-            chat_history.append({
-                "role": "tool",
-                "name": name,
-                "content": tool_content_for_history
-            })
+    async def _arun_loop(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10,
+        stream: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Driver asyncio de _react_loop : AsyncOpenAI, outils synchrones
+        déportés dans TOOL_EXECUTOR (même mode spéculatif que _run_loop).
+        """
+        cached = self._cached_answer(prompt, system_prompt_override)
+        if cached is None and INTENT_ROUTER.enabled:
+            cached = await asyncio.wrap_future(
+                TOOL_EXECUTOR.submit(self._routed_answer, prompt, system_prompt_override)
+            )
+        if cached is not None:
+            yield cached
+            return
+        steps = self._react_loop(prompt, system_prompt_override, max_tool_calls)
+        speculator = self._speculator()
+        reply = None
+        while True:
+            try:
+                step = steps.send(reply)
+            except StopIteration:
+                return
+            reply = None
+            if step[0] == "model":
+                if not stream and speculator is None:
+                    reply = await self._acall_model(step[1])
+                    continue
+                parts: List[str] = []
+                async for event in self._astream_model(step[1]):
+                    if event["type"] == "token":
+                        parts.append(event["content"])
+                        if speculator is not None:
+                            speculator.feed(event["content"])
+                    if stream:
+                        yield event
+                reply = "".join(parts)
+                if speculator is not None:
+                    speculator.model_done()
+            elif step[0] == "tools":
+                reply = await self.aexecute_tools(step[1], speculator)
+                if speculator is not None:
+                    speculator.settle()
+            else:
+                if step[1]["type"] == "final":
+                    self._remember_run(prompt, system_prompt_override, step[1]["content"])
+                    report = self._finish_speculation(speculator)
+                    if report is not None:
+                        yield report
+                yield step[1]
 
-            tool_call_count += 1
+    def get_completion(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10
+    ) -> str:
+        """
+        Boucle ReAct complète : appels d'outils, gestion des rôles,
+        nettoyage du HTML final.
+        """
+        print(f"[DEBUG] Getting completion for prompt: {prompt[:50]}...")
+        for event in self._run_loop(prompt, system_prompt_override, max_tool_calls):
+            if event["type"] == "final":
+                return event["content"]
+        return MAX_TOOL_CALLS_MESSAGE
 
-            # Gardez l'historique compact (20 messages max)
-            if len(chat_history) > 20:
-                print(f"[DEBUG] Trimming chat history from {len(chat_history)} to 20 messages")
-                chat_history = chat_history[:2] + chat_history[-18:]
+    def stream_completion(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Variante streaming de get_completion : yield les tokens de
+        raisonnement et de réponse, le début/la fin de chaque appel d'outil,
+        puis un événement {"type": "final", "content": ...}.
+        """
+        print(f"[DEBUG] Streaming completion for prompt: {prompt[:50]}...")
+        yield from self._run_loop(prompt, system_prompt_override, max_tool_calls, stream=True)
 
-        # ────────────────────────────────────────────────────────────
-        # 3) Sécurité : trop d'appels d'outil
-        # ────────────────────────────────────────────────────────────
-        print("[DEBUG] Max tool calls reached – aborting.")
-        return "⚠️ J'ai atteint la limite d'appels d'outils."
+    async def aget_completion(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10
+    ) -> str:
+        """
+        Version asyncio de get_completion : l'attente du modèle ne bloque
+        aucun thread, ce qui permet à un seul worker de servir de
+        nombreuses conversations en parallèle.
+        """
+        print(f"[DEBUG] Getting async completion for prompt: {prompt[:50]}...")
+        async for event in self._arun_loop(prompt, system_prompt_override, max_tool_calls):
+            if event["type"] == "final":
+                return event["content"]
+        return MAX_TOOL_CALLS_MESSAGE
+
+    async def astream_completion(
+        self,
+        prompt: str,
+        system_prompt_override: Optional[str] = None,
+        max_tool_calls: int = 10
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Version asyncio de stream_completion.
+        """
+        print(f"[DEBUG] Streaming async completion for prompt: {prompt[:50]}...")
+        async for event in self._arun_loop(prompt, system_prompt_override, max_tool_calls, stream=True):
+            yield event
 
 # ────────────────────────────────────────────────────────────────
 # Helpers
@@ -687,6 +1129,33 @@ def _extract_html_if_any(text: str) -> str:
     print("[DEBUG] No HTML content found, returning plain text")
     return text.strip()
 
+def _tool_failed(result: Any) -> bool:
+    """Résultat d'outil en erreur (message "Error…" ou ligne d'erreur de sql_query)."""
+    if isinstance(result, str):
+        return result.startswith("Error")
+    if isinstance(result, list) and result and isinstance(result[0], tuple):
+        return result[0][:1] == ("Error executing query:",)
+    return False
+
+def _tool_calls_text(calls: List[Tuple[str, Dict[str, Any]]]) -> str:
+    """Réponse assistant équivalente à un lot d'appels (un bloc ```json par appel)."""
+    return "\n".join(
+        "```json\n" + json.dumps({"tool_call": {"name": name, "arguments": arguments}}, ensure_ascii=False) + "\n```"
+        for name, arguments in calls
+    )
+
+def _batch_tool_message(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Un seul message "tool" pour tous les résultats d'un lot (inchangé
+    pour un appel unique).
+    """
+    if len(messages) == 1:
+        return messages[0]
+    parts = [f"Results of {len(messages)} tool calls, in call order:"]
+    for i, message in enumerate(messages, 1):
+        parts.append(f"### {i}. {message['name']}\n{message['content']}")
+    return {"role": "tool", "name": BATCH_TOOL_NAME, "content": "\n\n".join(parts)}
+
 def format_sql_for_json(sql_query: str) -> str:
     """
     Format a SQL query for safe inclusion in JSON.
@@ -0,0 +1,301 @@
+# mock_llm_server.py
+"""
+Serveur OpenAI-compatible hors ligne : rejoue des complétions enregistrées
+pour mesurer le surcoût de nos moteurs sans bruit réseau.
+
+- Enregistrements : chat_log_*.log (User message / Agent response),
+  test_results.json (question / get_completion, objets concaténés), et
+  scripts JSON / JSONL {"prompt": ..., "turns": ["<appel d'outil>", ..., "<réponse>"]}
+  pour rejouer une boucle ReAct tour par tour.
+- Réponse déterministe : dernier message utilisateur normalisé (sinon
+  l'enregistrement le plus proche, sinon FALLBACK_REPLY) ; le tour est le
+  nombre de messages assistant qui le suivent.
+- Latence : MOCK_LLM_LATENCY_MS avant le premier token, puis
+  MOCK_LLM_TOKENS_PER_S (0 = instantané), en streaming SSE comme sans.
+
+Usage : python mock_llm_server.py [--port 8001] [--latency-ms 800] [--tokens-per-s 40] [fichiers…]
+puis LLM_BASE_URL=http://127.0.0.1:8001/v1 pour llm.py, ulti_llm.py,
+revallm.py et agent/llm.py (n'importe quelle clé d'API).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from answer_cache import _cosine, _trigrams, normalize_prompt
+
+DEFAULT_REPLAYS = ["chat_log_*.log", "test_results.json"]
+FALLBACK_REPLY = "Réponse simulée : aucun enregistrement pour cette question."
+# Cosinus minimal pour rejouer l'enregistrement d'une question voisine
+NEAREST_SIMILARITY = 0.5
+
+_LOG_LINE_RE = re.compile(r"^\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\] ?(.*)$")
+# ~ un token : jusqu'à 4 caractères non blancs avec l'espace qui les précède
+_TOKEN_RE = re.compile(r"\s*\S{1,4}|\s+")
+
+Recording = Tuple[str, List[str]]
+
+
+# ──────────────────────────────────────────────
+# Chargement des enregistrements
+# ──────────────────────────────────────────────
+def load_chat_log(path: str) -> List[Recording]:
+    """Paires (question, [réponse]) d'un chat_log_*.log ; les suites de ligne sont recollées."""
+    entries: List[str] = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = _LOG_LINE_RE.match(line.rstrip("\n"))
+            if m:
+                entries.append(m.group(1))
+            elif entries:
+                entries[-1] += "\n" + line.rstrip("\n")
+    recordings, prompt = [], None
+    for entry in entries:
+        if entry.startswith("User message:"):
+            prompt = entry[len("User message:"):].strip()
+        elif entry.startswith("Agent response:") and prompt:
+            recordings.append((prompt, [entry[len("Agent response:"):].strip()]))
+            prompt = None
+    return recordings
+
+
+def _json_objects(text: str) -> Iterator[Any]:
+    """Objets JSON d'un fichier : liste, JSONL, ou objets séparés par des virgules (test_results.json)."""
+    decoder = json.JSONDecoder()
+    text = text.strip()
+    if text.startswith("["):
+        yield from json.loads(text)
+        return
+    pos = 0
+    while pos < len(text):
+        while pos < len(text) and (text[pos].isspace() or text[pos] == ","):
+            pos += 1
+        if pos >= len(text):
+            break
+        obj, pos = decoder.raw_decode(text, pos)
+        yield obj
+
+
+def load_json_records(path: str) -> List[Recording]:
+    """Scripts {"prompt", "turns"} et résultats {"question", "get_completion"}."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    recordings = []
+    for obj in _json_objects(text):
+        prompt = obj.get("prompt") or obj.get("question")
+        turns = obj.get("turns") or ([obj["get_completion"]] if obj.get("get_completion") else [])
+        if prompt and turns:
+            recordings.append((prompt.strip(), [str(t) for t in turns]))
+    return recordings
+
+
+def load_replays(patterns: Iterable[str]) -> List[Recording]:
+    recordings: List[Recording] = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            loaded = load_chat_log(path) if path.endswith(".log") else load_json_records(path)
+            print(f"[DEBUG] Loaded {len(loaded)} recordings from {path}")
+            recordings.extend(loaded)
+    return recordings
+
+
+# ──────────────────────────────────────────────
+# Rejeu
+# ──────────────────────────────────────────────
+def _text(content: Any) -> str:
+    """Contenu d'un message : texte brut ou liste de parties (cache_control)."""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpage en pseudo-tokens dont la concaténation redonne le texte."""
+    return _TOKEN_RE.findall(text)
+
+
+class ReplayStore:
+    """
+    Complétions enregistrées par question normalisée (thread-safe).
+
+    Parameters
+    ----------
+    recordings : iterable[(str, list[str])]
+        (question, tours de réponse) ; le premier enregistrement d'une
+        question l'emporte.
+    fallback : str
+        Réponse aux questions sans enregistrement proche.
+    """
+
+    def __init__(self, recordings: Iterable[Recording] = (), fallback: str = FALLBACK_REPLY) -> None:
+        self.fallback = fallback
+        self._turns: Dict[str, List[str]] = {}
+        self._grams: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.exact = 0
+        self.nearest = 0
+        self.misses = 0
+        for prompt, turns in recordings:
+            self.add(prompt, turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def add(self, prompt: str, turns: List[str]) -> None:
+        key = normalize_prompt(prompt)
+        if key and turns and key not in self._turns:
+            self._turns[key] = list(turns)
+            self._grams[key] = _trigrams(key)
+
+    def _lookup(self, key: str) -> Tuple[Optional[List[str]], str]:
+        if key in self._turns:
+            return self._turns[key], "exact"
+        grams = _trigrams(key)
+        best, best_score = None, NEAREST_SIMILARITY
+        for candidate, candidate_grams in self._grams.items():
+            score = _cosine(grams, candidate_grams)
+            if score > best_score:
+                best, best_score = candidate, score
+        return (self._turns[best], "nearest") if best is not None else (None, "miss")
+
+    def reply(self, messages: List[Dict[str, Any]]) -> str:
+        """Tour de réponse enregistré pour cet historique (déterministe)."""
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=None)
+        prompt = _text(messages[last_user].get("content")) if last_user is not None else ""
+        after = messages[last_user + 1:] if last_user is not None else messages
+        turn = sum(1 for m in after if m.get("role") == "assistant")
+        turns, how = self._lookup(normalize_prompt(prompt))
+        with self._lock:
+            self.requests += 1
+            if how == "exact":
+                self.exact += 1
+            elif how == "nearest":
+                self.nearest += 1
+            else:
+                self.misses += 1
+        if turns is None:
+            return self.fallback
+        return turns[min(turn, len(turns) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "recordings": len(self._turns),
+                "requests": self.requests,
+                "exact": self.exact,
+                "nearest": self.nearest,
+                "misses": self.misses,
+            }
+
+
+# ──────────────────────────────────────────────
+# Serveur
+# ──────────────────────────────────────────────
+def _usage(messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, int]:
+    prompt_tokens = sum(len(tokenize(_text(m.get("content")))) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(store: ReplayStore, latency_ms: float = 0.0, tokens_per_s: float = 0.0) -> FastAPI:
+    """
+    Application FastAPI : /v1/chat/completions (stream ou non), /v1/models, /stats.
+    """
+    app = FastAPI(title="Mock LLM server")
+    token_delay = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {**store.stats(), "latency_ms": latency_ms, "tokens_per_s": tokens_per_s}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model", "mock")
+        content = store.reply(messages)
+        tokens = tokenize(content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency_ms / 1000 + len(tokens) * token_delay)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(messages, len(tokens)),
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(latency_ms / 1000)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i and token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if include_usage:
+                usage = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": model, "choices": [], "usage": _usage(messages, len(tokens)),
+                }
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible server replaying recorded completions")
+    parser.add_argument("replays", nargs="*", default=os.getenv("MOCK_LLM_REPLAYS", ",".join(DEFAULT_REPLAYS)).split(","))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("MOCK_LLM_LATENCY_MS", "0")))
+    parser.add_argument("--tokens-per-s", type=float, default=float(os.getenv("MOCK_LLM_TOKENS_PER_S", "0")))
+    args = parser.parse_args()
+    store = ReplayStore(load_replays(args.replays))
+    print(f"[DEBUG] Mock LLM server: {len(store)} prompts, LLM_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(store, args.latency_ms, args.tokens_per_s), host=args.host, port=args.port)
@@ -0,0 +1,210 @@
+# plan_cache.py
+"""
+Cache de plans : rejoue les appels d'outils d'une requête réussie pour
+les questions de même gabarit.
+
+- Gabarit : question normalisée où nombres, dates ISO et chaînes entre
+  guillemets deviennent des paramètres (« top 5 … 2024 » ≈ « top 10 … 2025 »).
+  Les sigles et noms de tables restent littéraux (EAF ≠ LF).
+- Plan : appels des outils en lecture seule (speculation.SPECULATIVE_TOOLS)
+  du premier tour de la trace qui en contient, sans référence scratchpad,
+  dédupliqués, dans l'ordre. Les tours suivants peuvent dépendre des
+  résultats (« WHERE HEATID = 12345 ») : ils ne sont pas rejoués.
+- Rejeu : les valeurs des paramètres enregistrés sont remplacées par
+  celles de la nouvelle question dans les arguments (à frontière de
+  jeton) ; un remplacement ambigu annule le rejeu.
+
+La boucle ReAct exécute le plan en un lot avant le premier appel au
+modèle, qui conclut ou émet lui-même les appels dépendants.
+
+PLAN_CACHE=0 (défaut) | 1, PLAN_CACHE_MAX_ENTRIES
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from answer_cache import normalize_prompt
+from speculation import SPECULATIVE_TOOLS
+
+# Paramètres d'une question : "…" / «…» / '…', date ISO, nombre (pas dans 01-PAF)
+_SLOT_RE = re.compile(
+    r'"([^"]+)"|«\s*([^»]+?)\s*»|(?<!\w)\'([^\']+)\'(?!\w)'
+    r"|(?<![\w-])(\d{4}-\d{2}-\d{2})(?![\w-])"
+    r"|(?<![\w.,-])(\d+(?:[.,]\d+)?)(?![\w-]|[.,]\d)"
+)
+SLOT = "#"
+
+Call = Tuple[str, Dict[str, Any]]
+
+
+def prompt_template(prompt: str) -> Tuple[str, List[str]]:
+    """
+    (gabarit, valeurs des paramètres) d'une question ; décimales à virgule
+    ramenées au point.
+    """
+    parts, slots, last = [], [], 0
+    for m in _SLOT_RE.finditer(prompt):
+        parts.append(normalize_prompt(prompt[last:m.start()]))
+        parts.append(SLOT)
+        value = next(g for g in m.groups() if g is not None)
+        slots.append(value.replace(",", ".") if m.lastindex == 5 else value)
+        last = m.end()
+    parts.append(normalize_prompt(prompt[last:]))
+    return " ".join(p for p in parts if p), slots
+
+
+def _has_ref(value: Any) -> bool:
+    if isinstance(value, dict):
+        return "$ref" in value or any(_has_ref(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_ref(v) for v in value)
+    return False
+
+
+def plan_calls(trace: Iterable[Dict[str, Any]], tools: frozenset = SPECULATIVE_TOOLS) -> List[Call]:
+    """
+    Appels rejouables d'une trace (lecture seule, sans $ref), sans doublon,
+    limités au premier tour ("turn") qui en contient : leurs arguments ne
+    viennent que de la question. Entrées sans "turn" : un seul tour.
+    """
+    calls, seen, first_turn = [], set(), None
+    for call in trace:
+        name, arguments = call.get("name"), call.get("arguments") or {}
+        if name not in tools or not isinstance(arguments, dict) or _has_ref(arguments):
+            continue
+        if not calls:
+            first_turn = call.get("turn")
+        elif call.get("turn") != first_turn:
+            break
+        key = json.dumps([name, arguments], sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            calls.append((name, arguments))
+    return calls
+
+
+def rebind(calls: List[Call], old: List[str], new: List[str]) -> Optional[List[Call]]:
+    """
+    Arguments des appels avec les valeurs `old` remplacées par `new` ;
+    None si un même ancien paramètre prend deux nouvelles valeurs.
+    """
+    mapping: Dict[str, str] = {}
+    for before, after in zip(old, new):
+        if mapping.setdefault(before, after) != after:
+            return None
+    mapping = {k: v for k, v in mapping.items() if k != v}
+    if not mapping:
+        return calls
+    pattern = re.compile(
+        r"(?<![\w.])(" + "|".join(re.escape(k) for k in sorted(mapping, key=len, reverse=True)) + r")(?![\w]|\.\d)"
+    )
+
+    def bind(value: Any) -> Any:
+        if isinstance(value, str):
+            return pattern.sub(lambda m: mapping[m.group(1)], value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            replacement = mapping.get(repr(value))
+            return value if replacement is None else _number(replacement, value)
+        if isinstance(value, dict):
+            return {k: bind(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [bind(v) for v in value]
+        return value
+
+    return [(name, bind(arguments)) for name, arguments in calls]
+
+
+def _number(text: str, default: Any) -> Any:
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return default
+
+
+class PlanCache:
+    """
+    Cache LRU thread-safe gabarit → (paramètres enregistrés, appels).
+
+    Parameters
+    ----------
+    max_entries : int
+        Nombre maximal de plans gardés.
+    enabled : bool
+        Cache désactivé : plan() renvoie toujours None et record() ne fait rien.
+    """
+
+    def __init__(self, max_entries: int = 500, enabled: bool = True) -> None:
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._plans: "OrderedDict[Tuple[str, int], Tuple[List[str], List[Call]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def record(self, prompt: str, trace: Iterable[Dict[str, Any]]) -> None:
+        """Enregistre le plan d'une requête terminée sans erreur d'outil."""
+        if not self.enabled:
+            return
+        calls = plan_calls(trace)
+        if not calls:
+            return
+        template, slots = prompt_template(prompt)
+        with self._lock:
+            self._plans[(template, len(slots))] = (slots, calls)
+            self._plans.move_to_end((template, len(slots)))
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        print(f"[DEBUG] Plan recorded for '{template[:60]}' ({len(calls)} calls)")
+
+    def plan(self, prompt: str) -> Optional[List[Call]]:
+        """Appels à rejouer pour cette question, paramètres rebindés."""
+        if not self.enabled:
+            return None
+        template, slots = prompt_template(prompt)
+        with self._lock:
+            entry = self._plans.get((template, len(slots)))
+            if entry is not None:
+                self._plans.move_to_end((template, len(slots)))
+        calls = rebind(entry[1], entry[0], slots) if entry is not None else None
+        with self._lock:
+            if calls is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        print(f"[DEBUG] Plan cache hit for '{template[:60]}' ({len(calls)} calls)")
+        return calls
+
+    def discard(self, prompt: str) -> None:
+        """Oublie le plan d'un gabarit (rejeu en erreur)."""
+        template, slots = prompt_template(prompt)
+        with self._lock:
+            if self._plans.pop((template, len(slots)), None) is not None:
+                self.discarded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._plans),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "discarded": self.discarded,
+            }
+
+
+PLAN_CACHE = PlanCache(
+    max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500")),
+    enabled=os.getenv("PLAN_CACHE", "0") == "1",
+)
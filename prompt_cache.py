@@ -0,0 +1,103 @@
+# prompt_cache.py
+"""
+Cache de préfixe de prompt côté fournisseur.
+
+Le préfixe statique (SystemPrompt + méta-cognition + catalogue d'outils)
+est envoyé octet pour octet identique à chaque itération ReAct : les
+fournisseurs à cache automatique (OpenAI, DeepSeek…) le réutilisent tel
+quel, ceux qui demandent un marqueur explicite (Anthropic, Gemini via
+OpenRouter) reçoivent un `cache_control` sur le dernier bloc statique.
+
+Les tokens de prompt servis depuis le cache sont relevés dans le champ
+`usage` de chaque réponse (PROMPT_CACHE_STATS, exposé dans /health).
+
+PROMPT_CACHE_CONTROL = auto (défaut, selon le modèle) | on | off
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Modèles OpenRouter qui exigent un marqueur cache_control explicite
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+
+def supports_cache_control(model: str, mode: Optional[str] = None) -> bool:
+    mode = (mode or os.getenv("PROMPT_CACHE_CONTROL", "auto")).lower()
+    if mode in ("on", "1", "true"):
+        return True
+    if mode in ("off", "0", "false"):
+        return False
+    return model.startswith(CACHE_CONTROL_MODEL_PREFIXES)
+
+
+def with_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copie du message dont le contenu devient un bloc texte marqué
+    `cache_control: ephemeral` (fin du préfixe à mettre en cache).
+    """
+    return {
+        **message,
+        "content": [{"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}],
+    }
+
+
+def _field(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def cached_prompt_tokens(usage: Any) -> Optional[int]:
+    """
+    Tokens de prompt lus depuis le cache, quel que soit le format :
+    OpenAI / OpenRouter (prompt_tokens_details.cached_tokens), DeepSeek
+    (prompt_cache_hit_tokens), Anthropic (cache_read_input_tokens).
+    """
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    for value in (
+        _field(details, "cached_tokens"),
+        _field(usage, "prompt_cache_hit_tokens"),
+        _field(usage, "cache_read_input_tokens"),
+    ):
+        if value is not None:
+            return value
+    return None
+
+
+class PromptCacheStats:
+    """
+    Cumul thread-safe des tokens de prompt en cache / hors cache.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage: Any) -> None:
+        prompt_tokens = _field(usage, "prompt_tokens")
+        if prompt_tokens is None:
+            return
+        cached = cached_prompt_tokens(usage) or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached
+        print(f"[DEBUG] Prompt tokens: {prompt_tokens} ({cached} cached, {prompt_tokens - cached} uncached)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "uncached_tokens": self.prompt_tokens - self.cached_tokens,
+                "cached_share": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+PROMPT_CACHE_STATS = PromptCacheStats()
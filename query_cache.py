@@ -0,0 +1,182 @@
+# query_cache.py
+"""
+Cache de résultats SQL devant les outils d'agrégation (sql_query,
+Tools.aggregate_table, Tools.get_timeseries_data_for_chart).
+
+- Clé : SQL normalisé (espaces / casse hors littéraux et "...") + paramètres.
+- Éviction LRU bornée en octets (taille picklée du résultat).
+- Invalidation automatique dès que le fichier de la base change
+  (mtime / taille / inode de la base et de son WAL).
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import db_pool
+
+_LITERAL_RE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"\s*([(),=<>*+/])\s*")
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Forme canonique d'une requête : espaces compactés, minuscules et
+    `;` final retiré — sans toucher au contenu des littéraux '...' ni
+    des spans "..." : SQLite lit "abc" comme une chaîne quand aucune
+    colonne ne porte ce nom, "ABC" et "abc" peuvent donc différer.
+    """
+    parts = _LITERAL_RE.split(query.strip().rstrip(";"))
+    for i in range(0, len(parts), 2):  # indices pairs = hors littéraux et "..."
+        part = _SPACE_RE.sub(" ", parts[i]).lower()
+        parts[i] = _PUNCT_RE.sub(r"\1", part)
+    return "".join(parts).strip()
+
+
+def db_fingerprint(path: str) -> Tuple:
+    """
+    Empreinte bon marché (2 stat) qui change à chaque écriture sur la base.
+    Le WAL est inclus car les écritures y vivent jusqu'au checkpoint.
+    """
+    fp = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            fp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            fp.append(None)
+    return tuple(fp)
+
+
+class QueryCache:
+    """
+    Cache LRU thread-safe de résultats de requêtes, borné en octets.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Budget mémoire total (taille picklée des résultats).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, Tuple[List[Any], int]]" = OrderedDict()
+        self._fingerprints: Dict[str, Tuple] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def execute(
+        self,
+        query: str,
+        params: Sequence[Any] | dict = (),
+        *,
+        path: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Renvoie le résultat en cache, ou exécute la requête via db_pool.
+        Les erreurs SQL ne sont jamais mises en cache.
+        """
+        path = path or db_pool.DB_PATH
+        if isinstance(params, dict):
+            frozen = tuple(sorted(params.items()))
+        else:
+            frozen = tuple(params)
+        key = (path, normalize_sql(query), frozen)
+
+        with self._lock:
+            self._check_fingerprint(path)
+            fingerprint = self._fingerprints[path]
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+
+        rows = db_pool.execute(query, params, path=path)
+        self._store(key, rows, fingerprint)
+        return list(rows)
+
+    def _check_fingerprint(self, path: str) -> None:
+        """Vide les entrées de `path` si la base a changé depuis la dernière lecture."""
+        fp = db_fingerprint(path)
+        previous = self._fingerprints.get(path)
+        if previous == fp:
+            return
+        self._fingerprints[path] = fp
+        if previous is None:
+            return
+        stale = [k for k in self._entries if k[0] == path]
+        for k in stale:
+            self._bytes -= self._entries.pop(k)[1]
+        self.invalidations += 1
+        print(f"[DEBUG] Query cache invalidated for {path} ({len(stale)} entries)")
+
+    def _store(self, key: tuple, rows: List[Any], fingerprint: Tuple) -> None:
+        """
+        Met en cache `rows`, lu sous l'empreinte `fingerprint` ; rien si la
+        base a changé pendant la requête (lignes d'avant l'écriture).
+        """
+        try:
+            size = len(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return  # lignes non sérialisables (ex. sqlite3.Row) : pas de cache
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if db_fingerprint(key[0]) != fingerprint:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (rows, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Compteurs hit/miss exposés pour le monitoring.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+QUERY_CACHE = QueryCache(int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+
+
+def cached_execute(
+    query: str,
+    params: Sequence[Any] | dict = (),
+    *,
+    path: Optional[str] = None,
+) -> List[Any]:
+    """
+    Raccourci vers le cache partagé du process.
+    """
+    return QUERY_CACHE.execute(query, params, path=path)
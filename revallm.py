@@ -45,6 +45,9 @@ from openai import (
 )
 from pydantic import BaseModel, Field, ValidationError, create_model
 
+from context_manager import ContextManager
+from tool_catalog import ToolCatalog, spec_schema, spec_text
+
 ###############################################################################
 # 1.  Primitive helpers – Tool decorator & ScratchPad
 ###############################################################################
@@ -136,7 +139,8 @@ class UltimateReVALAgent:
         api_key = os.getenv("OPENROUTER_API_KEY") or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("Missing API key env var")
-        self.client = AsyncOpenAI(api_key=api_key, timeout=45)
+        # LLM_BASE_URL : passerelle OpenAI-compatible (ex. mock_llm_server.py) ; défaut OpenAI
+        self.client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("LLM_BASE_URL"), timeout=45)
 
         # ── core settings ───────────────────────────────────────────────────
         self.model = model
@@ -145,11 +149,14 @@ class UltimateReVALAgent:
         self.max_model_tokens = max_model_tokens
         self.max_response_tokens = max_response_tokens
         self._enc = tiktoken.get_encoding("cl100k_base")
+        self._context = ContextManager(max_model_tokens - max_response_tokens, count=self._tokens)
         self.debug = debug
 
         # ── runtime state ───────────────────────────────────────────────────
         self.scratch = ScratchPad()
-        self.tools: Dict[str, ToolSpec] = {}
+        # name -> ToolSpec ; prompt + schemas recalculés seulement à l'ajout d'un outil
+        self.tools = ToolCatalog(text=spec_text, schema=spec_schema, header="", empty="")
+        self._system_prompt: Optional[tuple] = None
         self._fc_supported: Optional[bool] = None  # unknown until first attempt
 
         # ── logging ─────────────────────────────────────────────────────────
@@ -171,7 +178,6 @@ class UltimateReVALAgent:
         self.persona_prompt = (
             persona_prompt or "You are SteelMillAI, an elite autonomous agent known for rigorous reasoning and brutal honesty."
         )
-        self._refresh_system_prompt()
 
     # ======================================================================
     # Tool registration & helpers
@@ -182,7 +188,6 @@ class UltimateReVALAgent:
             func = tool()(func)  # auto‑decorate if not already
         spec: ToolSpec = func.__tool_spec__  # type: ignore[attr-defined]
         self.tools[spec.name] = spec
-        self._refresh_system_prompt()
 
     def register_tools_from_instance(self, obj: Any):
         for name in dir(obj):
@@ -264,25 +269,25 @@ class UltimateReVALAgent:
         setattr(self, tool_name, fn.__get__(self))
         self.register_tool(getattr(self, tool_name))
         self.tools[tool_name].description = description  # type: ignore
+        self.tools.invalidate(tool_name)
         return f"Tool '{tool_name}' created and registered."
 
     # ======================================================================
     # System prompt
     # ======================================================================
-    def _refresh_system_prompt(self):
-        tool_lines = []
-        for spec in self.tools.values():
-            params = ", ".join(
-                spec.args_schema.model_json_schema().get("properties", {}).keys()
+    @property
+    def system_prompt(self) -> str:
+        """Persona + tool catalog, rebuilt only when the catalog version changes."""
+        key = (self.persona_prompt, self.tools.version)
+        if self._system_prompt is None or self._system_prompt[0] != key:
+            usage_doc = (
+                "Tools are available via *native function‑calling* (if supported) **or** via a JSON fall‑back.\n\n"  # noqa: E501
+                "When using the fall‑back, reply **only** with one JSON block:\n"
+                "```json\n{\"tool_call\": {\"name\": <tool_name>, \"arguments\": {…}}}\n```"
             )
-            tool_lines.append(f"- `{spec.name}({params})`: {spec.description}")
-        tools_doc = "\n".join(tool_lines)
-        usage_doc = (
-            "Tools are available via *native function‑calling* (if supported) **or** via a JSON fall‑back.\n\n"  # noqa: E501
-            "When using the fall‑back, reply **only** with one JSON block:\n"
-            "```json\n{\"tool_call\": {\"name\": <tool_name>, \"arguments\": {…}}}\n```"
-        )
-        self.system_prompt = f"{self.persona_prompt}\n\n### Tools\n{tools_doc}\n\n### Usage\n{usage_doc}"
+            prompt = f"{self.persona_prompt}\n\n### Tools\n{self.tools.description()}\n\n### Usage\n{usage_doc}"
+            self._system_prompt = (key, prompt)
+        return self._system_prompt[1]
 
     # ======================================================================
     # LLM invocation helpers
@@ -292,17 +297,7 @@ class UltimateReVALAgent:
         want_native = self.tool_support_flag or (self._fc_supported is not False)
         fc_schema = None
         if want_native:
-            fc_schema = [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": s.name,
-                        "description": s.description,
-                        "parameters": s.args_schema.model_json_schema(),
-                    },
-                }
-                for s in self.tools.values()
-            ]
+            fc_schema = self.tools.schemas()
         params = dict(
             model=self.model,
             messages=messages,
@@ -407,11 +402,9 @@ class UltimateReVALAgent:
     def _tokens(self, txt: str | None) -> int:
         return len(self._enc.encode(txt or ""))
 
-    def _trim(self, msgs: List[Dict]):
-        budget = self.max_model_tokens - self.max_response_tokens
-        while sum(self._tokens(m.get("content")) for m in msgs) > budget and len(msgs) > 3:
-            msgs.pop(1)
-        return msgs
+    def _trim(self, msgs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Comptes de tokens mémorisés par message : seuls les nouveaux sont tokenisés
+        return self._context.fit(msgs)
 
     # ======================================================================
     # Chat loop (ReVAL)
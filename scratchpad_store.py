@@ -0,0 +1,351 @@
+# scratchpad_store.py
+"""
+Stockage partagé des gros résultats d'outils (scratchpad["data_cache"]).
+
+- Un espace de noms par session d'agent (ScratchpadView, un MutableMapping),
+  libéré quand la session disparaît.
+- Budget mémoire en octets (taille picklée) : au-delà, les entrées les
+  moins récemment utilisées sont déversées sur disque (blobs SQLite).
+- Les valeurs plus grosses que `spill_bytes` vont directement sur disque.
+- Budget disque borné (LRU) et expiration après `ttl_s` sans accès,
+  appliquée par un thread de balayage en arrière-plan.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("value", "size", "spilled", "last_used")
+
+    def __init__(self, value: Any, size: int, spilled: bool, last_used: float) -> None:
+        self.value = value
+        self.size = size
+        self.spilled = spilled
+        self.last_used = last_used
+
+
+class ScratchpadStore:
+    """
+    Stockage clé → valeur thread-safe, borné en mémoire, avec déversement
+    sur disque.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Budget mémoire des valeurs gardées en RAM.
+    spill_bytes : int
+        Taille à partir de laquelle une valeur va directement sur disque.
+    max_disk_bytes : int
+        Budget du fichier de déversement ; au-delà, les entrées LRU sont supprimées.
+    ttl_s : float
+        Durée sans accès après laquelle une entrée expire (0 = jamais).
+    path : str, optional
+        Fichier SQLite de déversement (temporaire par défaut), suffixé par
+        le PID : chaque worker a le sien.
+    sweep_interval_s : float
+        Période du thread de balayage (0 = pas de thread, appeler sweep()).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        spill_bytes: int = 1024 * 1024,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        ttl_s: float = 3600,
+        path: Optional[str] = None,
+        sweep_interval_s: float = 60,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_s = ttl_s
+        self._path = path
+        self.path = self._spill_path()
+        self.sweep_interval_s = sweep_interval_s
+
+        # (namespace, key) -> _Entry ; ordre LRU (le plus ancien en tête)
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._namespaces = itertools.count(1)
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.spills = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ──────────────────────────────────────────────
+    # Espaces de noms
+    # ──────────────────────────────────────────────
+    def namespace(self) -> "ScratchpadView":
+        """
+        Nouvel espace de noms, supprimé du store dès que la vue est
+        ramassée par le GC (fin de session).
+        """
+        view = ScratchpadView(self, f"ns{next(self._namespaces)}")
+        weakref.finalize(view, self.drop_namespace, view.namespace)
+        self._start_sweeper()
+        return view
+
+    def drop_namespace(self, namespace: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == namespace]:
+                self._remove(key)
+
+    # ──────────────────────────────────────────────
+    # Accès
+    # ──────────────────────────────────────────────
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        """
+        Raises
+        ------
+        ValueError
+            Valeur plus grande que le budget disque : elle serait évincée
+            aussitôt écrite.
+        """
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            size = len(blob)
+        except Exception:
+            blob, size = None, sys.getsizeof(value)  # non picklable : reste en RAM
+        if blob is not None and size > self.max_disk_bytes:
+            raise ValueError(
+                f"Valeur '{key}' trop volumineuse pour le scratchpad "
+                f"({size} octets > max_disk_bytes={self.max_disk_bytes})"
+            )
+        with self._lock:
+            full_key = (namespace, key)
+            if full_key in self._entries:
+                self._remove(full_key)
+            now = time.monotonic()
+            if blob is not None and size >= self.spill_bytes:
+                self._write_disk(full_key, blob)
+                self._entries[full_key] = _Entry(None, size, True, now)
+                self._disk_bytes += size
+                self.spills += 1
+            else:
+                self._entries[full_key] = _Entry(value, size, False, now)
+                self._memory_bytes += size
+            self._enforce_budgets()
+
+    def get(self, namespace: str, key: str) -> Any:
+        """
+        Raises
+        ------
+        KeyError
+            Clé absente ou expirée.
+        """
+        with self._lock:
+            full_key = (namespace, key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                raise KeyError(key)
+            now = time.monotonic()
+            if self._expired(entry, now):
+                self._remove(full_key)
+                self.expirations += 1
+                raise KeyError(key)
+            entry.last_used = now
+            self._entries.move_to_end(full_key)
+            if not entry.spilled:
+                return entry.value
+            row = self._db().execute(
+                "SELECT value FROM spill WHERE ns = ? AND key = ?", full_key
+            ).fetchone()
+        return pickle.loads(row[0])
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            if (namespace, key) not in self._entries:
+                raise KeyError(key)
+            self._remove((namespace, key))
+
+    def contains(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            return entry is not None and not self._expired(entry, time.monotonic())
+
+    def keys(self, namespace: str) -> list:
+        with self._lock:
+            now = time.monotonic()
+            return [k for (ns, k), e in self._entries.items() if ns == namespace and not self._expired(e, now)]
+
+    # ──────────────────────────────────────────────
+    # Éviction / expiration
+    # ──────────────────────────────────────────────
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Supprime les entrées expirées ; renvoie leur nombre.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if self._expired(e, now)]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        if expired:
+            print(f"[DEBUG] Scratchpad sweep: {len(expired)} expired entries removed")
+        return len(expired)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return bool(self.ttl_s) and now - entry.last_used > self.ttl_s
+
+    def _enforce_budgets(self) -> None:
+        """RAM pleine → déverse les LRU sur disque ; disque plein → supprime les LRU."""
+        if self._memory_bytes > self.max_bytes:
+            for key, entry in list(self._entries.items()):
+                if self._memory_bytes <= self.max_bytes:
+                    break
+                if entry.spilled:
+                    continue
+                try:
+                    blob = pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    self._remove(key)
+                    self.evictions += 1
+                    print(f"[DEBUG] Scratchpad evicted non-picklable entry {key} (RAM budget)")
+                    continue
+                self._write_disk(key, blob)
+                self._memory_bytes -= entry.size
+                entry.value, entry.spilled = None, True
+                self._disk_bytes += entry.size
+                self.spills += 1
+        while self._disk_bytes > self.max_disk_bytes:
+            key = next(k for k, e in self._entries.items() if e.spilled)
+            self._remove(key)
+            self.evictions += 1
+            print(f"[DEBUG] Scratchpad evicted spilled entry {key} (disk budget)")
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        if entry.spilled:
+            self._db().execute("DELETE FROM spill WHERE ns = ? AND key = ?", key)
+            self._disk_bytes -= entry.size
+        else:
+            self._memory_bytes -= entry.size
+
+    # ──────────────────────────────────────────────
+    # Disque
+    # ──────────────────────────────────────────────
+    def _spill_path(self) -> str:
+        """Fichier du process courant (PID relu après un fork)."""
+        if self._path is None:
+            return os.path.join(tempfile.gettempdir(), f"scratchpad_{os.getpid()}.db")
+        root, ext = os.path.splitext(self._path)
+        return f"{root}_{os.getpid()}{ext}"
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path = self._spill_path()
+            if os.path.exists(self.path):
+                os.remove(self.path)  # reste d'un ancien process
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=OFF")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("CREATE TABLE spill (ns TEXT, key TEXT, value BLOB, PRIMARY KEY (ns, key))")
+        return self._conn
+
+    def _write_disk(self, key: Tuple[str, str], blob: bytes) -> None:
+        self._db().execute("INSERT OR REPLACE INTO spill VALUES (?, ?, ?)", (*key, blob))
+
+    # ──────────────────────────────────────────────
+    # Thread de balayage
+    # ──────────────────────────────────────────────
+    def _start_sweeper(self) -> None:
+        if self.sweep_interval_s <= 0 or not self.ttl_s or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, name="scratchpad-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval_s):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[DEBUG] Scratchpad sweep failed: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = self._disk_bytes = 0
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Occupation et compteurs exposés pour le monitoring.
+        """
+        with self._lock:
+            spilled = sum(1 for e in self._entries.values() if e.spilled)
+            return {
+                "entries": len(self._entries),
+                "spilled_entries": spilled,
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class ScratchpadView(MutableMapping):
+    """
+    Vue dict d'un espace de noms du store : remplace le dict de
+    scratchpad["data_cache"] sans changer le code appelant.
+    """
+
+    def __init__(self, store: ScratchpadStore, namespace: str) -> None:
+        self.store = store
+        self.namespace = namespace
+
+    def __getitem__(self, key: str) -> Any:
+        return self.store.get(self.namespace, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.store.put(self.namespace, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self.store.delete(self.namespace, key)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.store.contains(self.namespace, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(self.store.keys(self.namespace))
+
+    def __repr__(self) -> str:
+        return f"ScratchpadView({self.namespace}, keys={list(self)})"
+
+
+SCRATCHPAD_STORE = ScratchpadStore(
+    max_bytes=int(os.getenv("SCRATCHPAD_MAX_BYTES", str(64 * 1024 * 1024))),
+    spill_bytes=int(os.getenv("SCRATCHPAD_SPILL_BYTES", str(1024 * 1024))),
+    max_disk_bytes=int(os.getenv("SCRATCHPAD_MAX_DISK_BYTES", str(1024 * 1024 * 1024))),
+    ttl_s=float(os.getenv("SCRATCHPAD_TTL_S", "3600")),
+    path=os.getenv("SCRATCHPAD_SPILL_PATH") or None,
+)
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from llm import LLM
+
+class SessionManager:
+    """
+    Per-conversation agent sessions forked from a shared LLM
+
+    Args:
+        template (LLM): Agent holding the shared tool registry and HTTP clients
+        max_sessions (int): Maximum live sessions, least recently used evicted first
+        idle_ttl_s (float): Sessions unused for this long are dropped
+    """
+
+    def __init__(
+        self,
+        template: LLM,
+        max_sessions: int = int(os.getenv("SESSION_MAX", "1000")),
+        idle_ttl_s: float = float(os.getenv("SESSION_IDLE_TTL_S", "1800")),
+    ):
+        self.template = template
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+
+        # conversation_id -> (agent, last_used); kept in least-recently-used order
+        self._sessions: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted = 0
+        self._expired = 0
+
+    def get(self, conversation_id: Hashable) -> LLM:
+        """
+        Get the agent of a conversation, creating it on first use
+
+        Args:
+            conversation_id (Hashable): Conversation identifier
+
+        Returns:
+            LLM: The conversation's own agent
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+
+            entry = self._sessions.pop(conversation_id, None)
+            agent = entry[0] if entry else None
+            if agent is None:
+                agent = self.template.fork()
+                self._created += 1
+                print(f"[DEBUG] Created agent session for conversation {conversation_id}")
+            self._sessions[conversation_id] = (agent, now)
+
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                self._evicted += 1
+                print(f"[DEBUG] Evicted agent session for conversation {evicted_id}")
+            return agent
+
+    def drop(self, conversation_id: Hashable) -> bool:
+        """
+        Forget a conversation's agent (e.g. when the conversation is deleted)
+
+        Returns:
+            bool: True if a session existed
+        """
+        with self._lock:
+            return self._sessions.pop(conversation_id, None) is not None
+
+    def _expire(self, now: float) -> None:
+        """Drop idle sessions; the oldest ones are always at the front"""
+        while self._sessions:
+            conversation_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_ttl_s:
+                break
+            del self._sessions[conversation_id]
+            self._expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Session counters for monitoring"""
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "created": self._created,
+                "evicted": self._evicted,
+                "expired": self._expired,
+                "max_sessions": self.max_sessions,
+                "idle_ttl_s": self.idle_ttl_s,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,166 @@
+# speculation.py
+"""
+Exécution spéculative des outils pendant la génération du modèle.
+
+Pendant le streaming d'une réponse, chaque appel d'outil complet (voir
+tool_call_parser) vers un outil en lecture seule est lancé tout de suite
+dans le pool d'outils, sans attendre les derniers tokens ni la fin de la
+réponse HTTP. Une fois la réponse terminée, la boucle ReAct « réclame »
+les résultats des appels qu'elle retient réellement ; les autres sont
+annulés (ou ignorés s'ils tournent déjà).
+
+Temps gagné par tour : le plus long recouvrement entre un outil réclamé
+et la génération (les appels d'un lot tournent en parallèle, leurs
+recouvrements ne s'additionnent pas).
+
+LLM_SPECULATIVE_TOOLS = 0 (défaut) | 1
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tool_call_parser import ToolCallParser
+
+SPECULATION_ENABLED = os.getenv("LLM_SPECULATIVE_TOOLS", "0").lower() in ("1", "on", "true")
+
+# Outils sans effet de bord (connexion SQLite en lecture seule)
+SPECULATIVE_TOOLS = frozenset({
+    "sql_query", "get_db_schema", "list_tables", "describe_table", "quick_count",
+    "filter_table", "get_timeseries_data_for_chart", "aggregate_table",
+    "rolling_stat", "outliers",
+})
+
+
+def call_key(name: str, arguments: Any) -> str:
+    """Signature d'un appel : même outil et mêmes arguments."""
+    return json.dumps([name, arguments], sort_keys=True, ensure_ascii=False, default=str)
+
+
+class Speculator:
+    """
+    Spéculation d'une requête : un tour par réponse du modèle, rapport
+    cumulé sur toute la boucle ReAct.
+
+    Parameters
+    ----------
+    submit : callable(name, arguments) -> Future
+        Lance un outil dans le pool (ex. TOOL_EXECUTOR.submit(execute_tool, …)).
+    tools : frozenset
+        Outils autorisés à partir en avance.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[str, Dict[str, Any]], Future],
+        tools: frozenset = SPECULATIVE_TOOLS,
+    ) -> None:
+        self.submit = submit
+        self.tools = tools
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+        self.saved_s = 0.0
+        self._turn_start()
+
+    def _turn_start(self) -> None:
+        self._parser = ToolCallParser()
+        # clé d'appel -> [(future, lancé à)] non réclamés
+        self._pending: Dict[str, List[Tuple[Future, float]]] = {}
+        self._claimed: List[Tuple[Future, float]] = []
+        self._done_at: Dict[int, float] = {}
+        self._model_end: Optional[float] = None
+
+    def feed(self, chunk: str) -> None:
+        """Tokens de la réponse en cours ; lance les appels dès qu'ils sont complets."""
+        for call in self._parser.feed(chunk):
+            name, arguments = call.get("name"), call.get("arguments") or {}
+            if name not in self.tools or not isinstance(arguments, dict):
+                continue
+            print(f"[DEBUG] Speculatively starting {name}")
+            started_at = time.perf_counter()
+            future = self.submit(name, arguments)
+            future.add_done_callback(lambda f: self._done_at.setdefault(id(f), time.perf_counter()))
+            self._pending.setdefault(call_key(name, arguments), []).append((future, started_at))
+            self.started += 1
+
+    def model_done(self) -> None:
+        self._model_end = time.perf_counter()
+
+    def claim(self, name: str, arguments: Any) -> Optional[Future]:
+        """Future d'un appel retenu par la boucle, s'il est déjà parti."""
+        entries = self._pending.get(call_key(name, arguments))
+        if not entries:
+            return None
+        entry = entries.pop(0)
+        self._claimed.append(entry)
+        self.used += 1
+        return entry[0]
+
+    def settle(self) -> None:
+        """
+        Fin du tour (résultats réclamés déjà attendus) : annule les appels
+        que la réponse finale n'a pas retenus et compte le temps gagné.
+        """
+        for entries in self._pending.values():
+            for future, _ in entries:
+                future.cancel()
+                self.discarded += 1
+        model_end = self._model_end or time.perf_counter()
+        overlaps = [
+            min(self._done_at.get(id(future), model_end), model_end) - started_at
+            for future, started_at in self._claimed
+        ]
+        self.saved_s += max(overlaps, default=0.0)
+        self._turn_start()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "used": self.used,
+            "discarded": self.discarded,
+            "saved_s": round(self.saved_s, 4),
+        }
+
+
+class SpeculationStats:
+    """
+    Cumul thread-safe des rapports de spéculation (exposé dans /health).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+        self.saved_s = 0.0
+
+    def record(self, report: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.started += report["started"]
+            self.used += report["used"]
+            self.discarded += report["discarded"]
+            self.saved_s += report["saved_s"]
+        print(f"[DEBUG] Speculation saved {report['saved_s']:.3f}s "
+              f"({report['used']}/{report['started']} speculative calls used)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": SPECULATION_ENABLED,
+                "requests": self.requests,
+                "started": self.started,
+                "used": self.used,
+                "discarded": self.discarded,
+                "saved_s": round(self.saved_s, 4),
+                "saved_s_per_request": round(self.saved_s / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+SPECULATION_STATS = SpeculationStats()
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from answer_cache import AnswerCache, normalize_prompt
+from llm import LLM
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestAnswerCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE "02-EAF" (HEATID TEXT, kwh REAL)')
+        conn.execute('CREATE TABLE "03-LF" (HEATID TEXT, kwh REAL)')
+        conn.execute('CREATE TABLE "EAF" (HEATID TEXT, kwh REAL)')
+        conn.execute("CREATE TABLE _sheet_fingerprints (sheet TEXT PRIMARY KEY, source TEXT, content_hash TEXT, row_count INTEGER, imported_at TEXT)")
+        conn.executemany("INSERT INTO _sheet_fingerprints VALUES (?, '', ?, 0, '')", [("02-EAF", "h1"), ("03-LF", "h2"), ("EAF", "h3")])
+        conn.commit()
+        conn.close()
+        self.cache = AnswerCache(similarity=0.8, path=self.db_path)
+
+    def _trace(self, table):
+        return [{"name": "sql_query", "arguments": {"query": f'SELECT SUM(kwh) FROM "{table}"'}}]
+
+    def test_exact_and_near_duplicate_lookup(self):
+        """Normalized prompts hit; near-duplicates hit only with the same stage acronyms"""
+        assert normalize_prompt(" Quel est la conso électrique EAF totale?") == "quel est la conso electrique eaf totale"
+        self.cache.put("Quel est la conso electrique EAF totale?", "45926712.86", self._trace("02-EAF"))
+
+        assert self.cache.get("quel est la conso ÉLECTRIQUE eaf totale ?") == "45926712.86"
+        assert self.cache.get("Quelle est la consommation electrique EAF totale") == "45926712.86"
+        assert self.cache.get("Quel est la conso electrique LF totale?") is None
+        stats = self.cache.stats()
+        assert (stats["hits"], stats["similar_hits"], stats["misses"]) == (1, 1, 1)
+        print("[TEST] ✓ Exact and near-duplicate answer lookup")
+
+    def test_qualifiers_must_match(self):
+        """Aggregation, product/reject and period words keep close prompts apart"""
+        self.cache.put("Quel est la conso electrique EAF totale?", "45926712.86", self._trace("02-EAF"))
+        self.cache.put("Nombre de tonnes produites EAF", "1200", self._trace("02-EAF"))
+
+        assert self.cache.get("Quel est la conso electrique EAF moyenne?") is None          # cosine 0.82
+        assert self.cache.get("Quel est la conso electrique EAF totale par mois?") is None  # cosine 0.91
+        assert self.cache.get("Nombre maximum de tonnes produites EAF") is None             # cosine 0.87
+        assert self.cache.get("Nombre de tonnes produites EAF par jour") is None            # cosine 0.88
+        assert self.cache.get("Nombre de tonnes produits EAF") == "1200"
+        assert self.cache.stats()["similar_hits"] == 1
+        print("[TEST] ✓ Qualifiers gate near-duplicates")
+
+    def test_reimport_invalidates_by_table(self):
+        """Changing a table's import fingerprint drops only the answers that read it"""
+        self.cache.put("conso EAF", "1", self._trace("02-EAF"))
+        self.cache.put("conso LF", "2", self._trace("03-LF"))
+        self.cache.put("1000 kWh en MWh", "1 MWh", [{"name": "convert_energy_unit", "arguments": {"value": 1000}}])
+        self.cache.put("liste des tables", "…", [{"name": "list_tables", "arguments": {}}])
+        self.cache.put("conso four EAF", "3", self._trace("EAF"))
+        self.cache.put("bonjour", "Bonjour !")    # no tool call: follows the whole database
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE _sheet_fingerprints SET content_hash = 'h1b' WHERE sheet = '02-EAF'")
+        conn.commit()
+        conn.close()
+
+        assert self.cache.get("conso EAF") is None
+        assert self.cache.get("conso LF") == "2"
+        assert self.cache.get("1000 kWh en MWh") == "1 MWh"
+        assert self.cache.get("liste des tables") is None   # unknown table: follows the whole database
+        assert self.cache.get("bonjour") is None
+        assert self.cache.get("conso four EAF") == "3"       # "EAF" is not "02-EAF"
+        assert self.cache.stats()["invalidations"] == 1
+
+        self.cache.put("conso EAF", "1b", self._trace("02-EAF"))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE _sheet_fingerprints SET content_hash = 'h3b' WHERE sheet = 'EAF'")
+        conn.commit()
+        conn.close()
+        assert self.cache.get("conso four EAF") is None
+        assert self.cache.get("conso EAF") == "1b"
+        print("[TEST] ✓ Answer cache invalidated per table")
+
+    def test_get_completion_served_from_cache(self):
+        """A repeated question skips the ReAct loop; failed tool runs are not cached"""
+        llm = LLM()
+        llm.client = MagicMock()
+        llm.client.chat.completions.create.side_effect = lambda **kw: _completion("1 MWh")
+
+        with patch("llm.ANSWER_CACHE", self.cache):
+            assert llm.get_completion("Convertis 1000 kWh en MWh") == "1 MWh"
+            events = list(llm.fork().stream_completion("convertis 1000 kwh en mwh"))
+            assert events == [{"type": "final", "content": "1 MWh", "cached": True}]
+            assert llm.client.chat.completions.create.call_count == 1
+
+            # A run with a failed tool call is not cached
+            call = '```json\n{"tool_call": {"name": "convert_energy_unit", "arguments": {"value": "x"}}}\n```'
+            replies = [_completion(call), _completion("Désolé")]
+            llm.client.chat.completions.create.side_effect = lambda **kw: replies.pop(0)
+            assert llm.get_completion("Convertis x") == "Désolé"
+            assert self.cache.get("Convertis x") is None
+        print("[TEST] ✓ get_completion answer cache")
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+import pandas as pd
+
+import calendar_keys
+import db_pool
+import query_cache
+from tools import Tools
+
+
+class TestCalendarKeys:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        df = pd.DataFrame({
+            "HEATID": [1, 2, 3],
+            "HEATANNOUNCE_ACT": ["2025-01-01 05:19:10.000", "2025-01-01 15:00:00.000", "2025-02-03 23:30:00.000"],
+            "TOTAL_ELEC_EGY": [10.0, 20.0, 5.0],
+        })
+        df, self.date_cols = calendar_keys.normalize_dates(df)
+        conn = sqlite3.connect(self.db_path)
+        df.to_sql("02-EAF", conn, index=False, dtype={c: "TIMESTAMP" for c in self.date_cols})
+        calendar_keys.add_calendar_keys(conn, "02-EAF", self.date_cols)
+        conn.close()
+
+    def teardown_method(self):
+        db_pool.close_thread_connections()
+
+    def test_dates_normalized_with_keys(self):
+        """Date text is stored as ISO seconds with day/week/month/shift keys"""
+        assert self.date_cols == ["HEATANNOUNCE_ACT"]
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            'SELECT HEATANNOUNCE_ACT, HEATANNOUNCE_ACT__day, HEATANNOUNCE_ACT__week, '
+            'HEATANNOUNCE_ACT__month, HEATANNOUNCE_ACT__shift FROM "02-EAF" ORDER BY HEATID'
+        ).fetchall()
+        plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM "02-EAF" WHERE HEATANNOUNCE_ACT__month = ?', ("2025-01",)
+        ).fetchall()
+        conn.close()
+
+        assert rows[0] == ("2025-01-01 05:19:10", "2025-01-01", "2025-W00", "2025-01", 3)
+        assert rows[1][4] == 2 and rows[2][4] == 3
+        assert "USING INDEX idx_02_eaf_heatannounce_act__month" in plan[0][3]
+        print("[TEST] ✓ Normalized dates and indexed calendar keys")
+
+    def test_timeseries_groups_on_calendar_key(self):
+        """get_timeseries_data_for_chart groups on the precomputed key"""
+        with patch.object(db_pool, "DB_PATH", self.db_path), \
+             patch("tools.COLUMNAR_CACHE.enabled", False), \
+             patch("tools.cached_execute", wraps=query_cache.cached_execute) as spy:
+            chart = Tools().get_timeseries_data_for_chart("02-EAF", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", date_format="%Y-%m")
+
+        assert chart["labels"] == ["2025-01", "2025-02"]
+        assert chart["series"][0]["data"] == [30.0, 5.0]
+        assert '"HEATANNOUNCE_ACT__month" as day' in spy.call_args_list[-1].args[0]
+        print("[TEST] ✓ Time series grouped on calendar key")
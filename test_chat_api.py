@@ -3,7 +3,7 @@ import tempfile
 import os
 import sqlite3
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import io
 import random
 import string
@@ -358,7 +358,7 @@ class TestAPI:
         user_id = create_response.json()["id"]
         
         # Mock the LLM response
-        with patch('api.llm_client.get_completion') as mock_llm:
+        with patch('api.LLM.aget_completion', new_callable=AsyncMock) as mock_llm:
             mock_llm.return_value = "Hello! How can I help you today?"
             
             chat_data = {
@@ -377,7 +377,7 @@ class TestAPI:
         """Test chat API with existing conversation"""
         conv_id, user_id = self.test_create_conversation_api()
         
-        with patch('api.llm_client.get_completion') as mock_llm:
+        with patch('api.LLM.aget_completion', new_callable=AsyncMock) as mock_llm:
             mock_llm.return_value = "I understand your question."
             
             chat_data = {
@@ -392,6 +392,39 @@ class TestAPI:
             assert data["conversation"]["id"] == conv_id
             print("[TEST] ✓ Chat API existing conversation")
     
+    def test_chat_stream_api(self):
+        """Test streaming chat API (Server-Sent Events)"""
+        conv_id, user_id = self.test_create_conversation_api()
+        
+        events = [
+            {"type": "reasoning", "content": "Thinking"},
+            {"type": "tool_call_start", "name": "sql_query", "arguments": {"query": "SELECT 1"}},
+            {"type": "tool_call_end", "name": "sql_query", "result": "[[1]]"},
+            {"type": "final", "content": "The answer is 1."},
+        ]
+        async def fake_stream(message):
+            for event in events:
+                yield event
+        
+        with patch('api.LLM.astream_completion', side_effect=fake_stream):
+            
+            chat_data = {
+                "message": "Stream me an answer",
+                "user_id": user_id,
+                "conversation_id": conv_id
+            }
+            response = self.client.post("/chat/stream", json=chat_data)
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = response.text
+            assert "event: tool_call_start" in body
+            assert "event: final" in body
+            assert body.rstrip().split("\n\n")[-1].startswith("event: done")
+        
+        history = self.client.get(f"/conversations/{conv_id}/messages").json()
+        assert history["messages"][-1]["content"] == "The answer is 1."
+        print("[TEST] ✓ Chat stream API")
+    
     def test_upload_file_api(self):
         """Test file upload API"""
         try:
@@ -499,6 +532,7 @@ def run_all_tests():
         api_test.test_get_user_conversations_api()
         api_test.test_chat_api_new_conversation()
         api_test.test_chat_api_existing_conversation()
+        api_test.test_chat_stream_api()
         api_test.test_upload_file_api()
         api_test.test_get_conversation_history_api()
         api_test.test_delete_conversation_api()
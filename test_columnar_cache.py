@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import tempfile
+
+import db_pool
+from columnar_cache import ColumnarCache
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE "02-EAF" (HEATID INTEGER, STEELGRADECODE_ACT TEXT, CREWCODE INTEGER, TOTAL_ELEC_EGY REAL)')
+    conn.executemany(
+        'INSERT INTO "02-EAF" VALUES (?, ?, ?, ?)',
+        [
+            (1, "S275", 1, 10.5), (2, "S355", 2, 20.0), (3, "S275", 2, None),
+            (4, None, 1, 7.25), (5, "A42", 3, 1.0), (6, "S355", 1, 4.0),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestColumnarCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        _make_db(self.db_path)
+        self.cache = ColumnarCache(["02-EAF"], path=self.db_path)
+
+    def teardown_method(self):
+        db_pool.close_thread_connections()
+
+    def _sql(self, query):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+    def test_aggregates_match_sqlite(self):
+        """Group-by aggregates give SQLite's rows, order and NULL handling"""
+        for func in ("SUM", "AVG", "MIN", "MAX", "COUNT"):
+            expected = self._sql(
+                f'SELECT STEELGRADECODE_ACT, CREWCODE, {func}(TOTAL_ELEC_EGY) FROM "02-EAF" '
+                "WHERE HEATID > 1 GROUP BY STEELGRADECODE_ACT, CREWCODE"
+            )
+            got = self.cache.aggregate("02-EAF", ["STEELGRADECODE_ACT", "CREWCODE"], "TOTAL_ELEC_EGY", func, "HEATID > 1")
+            assert got == expected, func
+        assert self.cache.aggregate("02-EAF", [], "HEATID", "sum") == [(21,)]
+        assert self.cache.aggregate("02-EAF", [], "STEELGRADECODE_ACT", "MAX") == [("S355",)]
+        print("[TEST] ✓ Columnar aggregates match SQLite")
+
+    def test_filter_and_fallback(self):
+        """Simple predicates are served, anything else falls back to SQL"""
+        where = "CREWCODE IN (1, 2) AND STEELGRADECODE_ACT != 'S355' AND TOTAL_ELEC_EGY IS NOT NULL"
+        assert self.cache.filter("02-EAF", where) == self._sql(f'SELECT * FROM "02-EAF" WHERE {where}')
+        assert self.cache.filter("02-EAF", "CREWCODE = 1 OR CREWCODE = 2") is None
+        assert self.cache.aggregate("03-LF", [], "HEATID", "SUM") is None
+        print("[TEST] ✓ Columnar filter and SQL fallback")
+
+    def test_reload_on_db_change(self):
+        """A write to the database reloads the cached table"""
+        assert self.cache.aggregate("02-EAF", [], "HEATID", "COUNT") == [(6,)]
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT INTO "02-EAF" VALUES (7, ?, 1, 2.0)', ("S275",))
+        conn.commit()
+        conn.close()
+        assert self.cache.aggregate("02-EAF", [], "HEATID", "COUNT") == [(7,)]
+        assert self.cache.loads == 2
+        print("[TEST] ✓ Columnar cache reload on db change")
@@ -0,0 +1,52 @@
+import json
+from unittest.mock import MagicMock
+
+from context_manager import ContextManager
+
+
+def _history(n_calls, payload_size=400):
+    messages = [
+        {"role": "system", "content": "s" * 100},
+        {"role": "system", "content": "t" * 100},
+        {"role": "user", "content": "Quelle est la consommation EAF ?"},
+    ]
+    for i in range(n_calls):
+        messages.append({"role": "assistant", "content": f"call {i}"})
+        messages.append({"role": "tool", "name": "sql_query", "content": json.dumps([[i, "x" * payload_size]])})
+    return messages
+
+
+class TestContextManager:
+    def test_elides_old_tool_results_and_keeps_anchors(self):
+        """Old tool payloads move to the scratchpad; system and user anchors stay"""
+        store = {}
+        context = ContextManager(900, count=len, store=store, keep_recent=2, elide_min_tokens=100)
+        messages = _history(4)
+        fitted = context.fit(messages)
+
+        assert fitted[:3] == messages[:3]
+        assert fitted[-2:] == messages[-2:]
+        assert sum(context.tokens(m) for m in fitted) <= 900
+        elided = [m for m in fitted if m["role"] == "tool" and "Saved to scratchpad key" in m["content"]]
+        assert elided and len(store) == len(elided)
+        key = elided[0]["content"].split("'")[1]
+        assert store[key][0][1] == "x" * 400
+        print("[TEST] ✓ Old tool results elided to scratchpad references")
+
+    def test_counts_each_message_once_and_drops_oldest(self):
+        """Token counts are memoized per message; oldest exchanges are dropped last"""
+        count = MagicMock(side_effect=len)
+        context = ContextManager(450, count=count, keep_recent=2, elide_min_tokens=10_000)
+        messages = _history(3, payload_size=50)
+        context.fit(messages)
+        calls = count.call_count
+        messages.append({"role": "assistant", "content": "final"})
+        fitted = context.fit(messages)
+
+        assert count.call_count == calls + 1
+        assert [m["role"] for m in fitted[:3]] == ["system", "system", "user"]
+        assert fitted[-1]["content"] == "final"
+        assert fitted[3]["role"] == "assistant"      # exchanges dropped whole
+        assert sum(context.tokens(m) for m in fitted) <= 450
+        assert context.stats()["dropped"] > 0
+        print("[TEST] ✓ Memoized counts and whole-exchange dropping")
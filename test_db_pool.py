@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+
+import db_pool
+
+
+def _make_db(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE "02-EAF" (HEATID INTEGER, TOTAL_ELEC_EGY REAL)')
+    conn.execute('INSERT INTO "02-EAF" VALUES (1, ?)', (value,))
+    conn.commit()
+    conn.close()
+
+
+class TestDbPool:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        _make_db(self.db_path, 10.0)
+
+    def teardown_method(self):
+        db_pool.close_thread_connections()
+
+    def test_connections_are_read_only(self):
+        """Pooled connections refuse writes"""
+        with pytest.raises(sqlite3.OperationalError):
+            db_pool.get_connection(self.db_path).execute('DELETE FROM "02-EAF"')
+        assert db_pool.execute('SELECT COUNT(*) FROM "02-EAF"', path=self.db_path) == [(1,)]
+        print("[TEST] ✓ Read-only pooled connection")
+
+    def test_one_connection_per_thread(self):
+        """The same thread reuses its connection, other threads get their own"""
+        conn = db_pool.get_connection(self.db_path)
+        assert db_pool.get_connection(self.db_path) is conn
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(db_pool.get_connection(self.db_path)))
+        t.start()
+        t.join()
+        assert other[0] is not conn
+        print("[TEST] ✓ Thread-local connections")
+
+    def test_reconnects_after_file_replacement(self):
+        """A re-imported database file is picked up without restarting"""
+        assert db_pool.execute('SELECT TOTAL_ELEC_EGY FROM "02-EAF"', path=self.db_path) == [(10.0,)]
+
+        new_path = self.db_path + ".new"
+        _make_db(new_path, 20.0)
+        os.replace(new_path, self.db_path)
+
+        assert db_pool.execute('SELECT TOTAL_ELEC_EGY FROM "02-EAF"', path=self.db_path) == [(20.0,)]
+        print("[TEST] ✓ Reconnect after re-import")
+
+    def test_columns_and_row_factory(self):
+        """Column names and sqlite3.Row rows are available to callers"""
+        cols, rows = db_pool.execute_with_columns('SELECT HEATID AS heat FROM "02-EAF"', path=self.db_path)
+        assert cols == ["heat"] and rows == [(1,)]
+        row, = db_pool.execute('SELECT HEATID FROM "02-EAF"', path=self.db_path, row_factory=sqlite3.Row)
+        assert dict(row) == {"HEATID": 1}
+        print("[TEST] ✓ Columns and row factory")
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+
+import openpyxl
+
+import excel_to_sqlite3
+
+
+def _make_workbook(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "02-EAF"
+    ws.append(["HEATID", "STEELGRADECODE_ACT", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", "SAMPLENBR"])
+    ws.append([39255, "S275J02", "2025-01-01 05:19:10.000", 51750, "1"])
+    ws.append([39256, "S355TA", datetime(2025, 1, 1, 15, 0), 48000.5, "NULL"])
+    ws2 = wb.create_sheet("05-CCM-Brame")
+    ws2.append(["DFB_ID", "CUT_TIME"])
+    ws2.append([1, "2025-01-02 23:10:00.000"])
+    wb.save(path)
+
+
+class TestExcelImport:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.xlsx = os.path.join(self.temp_dir, "DATA-ACIERIE.xlsx")
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        _make_workbook(self.xlsx)
+
+    def test_streaming_import(self):
+        """Every sheet is loaded with pandas-compatible types, ISO dates and calendar keys"""
+        with patch("excel_to_sqlite3.index_advisor.build_indexes") as build_indexes:
+            excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+        build_indexes.assert_called_once_with(self.db_path)
+
+        conn = sqlite3.connect(self.db_path)
+        types = {r[1]: r[2] for r in conn.execute('PRAGMA table_info("02-EAF")')}
+        rows = conn.execute(
+            'SELECT HEATID, HEATANNOUNCE_ACT, HEATANNOUNCE_ACT__shift, TOTAL_ELEC_EGY, SAMPLENBR FROM "02-EAF"'
+        ).fetchall()
+        brame = conn.execute('SELECT CUT_TIME__day FROM "05-CCM-Brame"').fetchall()
+        journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+
+        assert types == {
+            "HEATID": "INTEGER", "STEELGRADECODE_ACT": "TEXT", "HEATANNOUNCE_ACT": "TIMESTAMP",
+            "TOTAL_ELEC_EGY": "REAL", "SAMPLENBR": "REAL",
+        }
+        assert rows == [
+            (39255, "2025-01-01 05:19:10", 3, 51750.0, 1.0),
+            (39256, "2025-01-01 15:00:00", 2, 48000.5, None),
+        ]
+        assert brame == [("2025-01-02",)]
+        assert journal == "wal"
+        print("[TEST] ✓ Streaming Excel import")
+
+    def test_incremental_refresh(self):
+        """Unchanged sheets are skipped, changed sheets are swapped in and rows changed by key counted"""
+        with patch("excel_to_sqlite3.index_advisor.build_indexes"):
+            excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+
+            with patch("excel_to_sqlite3.write_sheet") as write_sheet:
+                excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+            write_sheet.assert_not_called()
+
+            wb = openpyxl.load_workbook(self.xlsx)
+            wb["02-EAF"]["D2"] = 99999
+            wb["02-EAF"].append([39257, "S235", "2025-01-03 08:00:00.000", 100, "2"])
+            wb.save(self.xlsx)
+
+            written = []
+            original = excel_to_sqlite3.write_sheet
+            with patch("excel_to_sqlite3.write_sheet", side_effect=lambda c, s: written.append(original(c, s)) or written[-1]):
+                excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('SELECT HEATID, TOTAL_ELEC_EGY FROM "02-EAF" ORDER BY HEATID').fetchall()
+        fingerprints = dict(conn.execute('SELECT sheet, row_count FROM "_sheet_fingerprints"').fetchall())
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = '02-EAF'")}
+        conn.close()
+
+        assert len(written) == 1 and written[0][1] == 2  # one update + one insert
+        assert rows == [(39255, 99999.0), (39256, 48000.5), (39257, 100.0)]
+        assert fingerprints == {"02-EAF": 3, "05-CCM-Brame": 1}
+        assert "idx_02_eaf__pk" in indexes and "idx_02_eaf_heatannounce_act__day" in indexes
+        assert not any(name.endswith("__shadow") for name in indexes)
+        print("[TEST] ✓ Incremental sheet refresh")
+
+    def test_refresh_with_duplicate_live_keys(self):
+        """Duplicate keys left in the live table do not abort the refresh"""
+        with patch("excel_to_sqlite3.index_advisor.build_indexes"):
+            excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('DROP INDEX "idx_02_eaf__pk"')
+            conn.execute('INSERT INTO "02-EAF" (HEATID, TOTAL_ELEC_EGY) VALUES (39255, 1)')
+            conn.commit()
+            conn.close()
+
+            wb = openpyxl.load_workbook(self.xlsx)
+            wb["02-EAF"]["D3"] = 50000
+            wb.save(self.xlsx)
+            excel_to_sqlite3.excel_to_sqlite(self.xlsx, self.db_path)
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('SELECT HEATID, TOTAL_ELEC_EGY FROM "02-EAF" ORDER BY HEATID').fetchall()
+        conn.close()
+        assert rows == [(39255, 51750.0), (39256, 50000.0)]
+        print("[TEST] ✓ Refresh over duplicate live keys")
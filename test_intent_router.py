@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from intent_router import IntentRouter
+from llm import LLM
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestIntentClassification:
+    def setup_method(self):
+        self.router = IntentRouter()
+
+    def _intent(self, prompt):
+        match = self.router.classify(prompt)
+        return (match[0].name, match[1]) if match else None
+
+    def test_known_questions_are_recognised(self):
+        """Stage acronyms pick the intent; years and top N become parameters"""
+        assert self._intent("Quel est la conso electrique EAF totale?") == ("conso_elec_eaf", {})
+        assert self._intent("Quelle est la consommation électrique du four LF ?") == ("conso_elec_lf", {})
+        assert self._intent("la conso electrique totale") == ("conso_elec_totale", {})
+        assert self._intent("Quel est le MTTR EAF ?") == ("mttr_eaf", {})
+        assert self._intent("top 3 des nuances produites en 2025") == ("top_products", {"top_n": 3, "year": "2025"})
+        print("[TEST] ✓ Known KPI questions recognised")
+
+    def test_unhandled_questions_fall_through(self):
+        """Dashboards, breakdowns, other stages and unexpected numbers go to the agent"""
+        for prompt in [
+            "Make a dashboard for the following KPIs : la conso electrique EAF, la conso electrique LF",
+            "conso electrique EAF par équipe",
+            "conso electrique EAF en 2024",
+            "MTTR LF",
+            "conso oxygene EAF",
+            "pourquoi la conso electrique EAF a augmenté ?",
+        ]:
+            assert self._intent(prompt) is None, prompt
+        print("[TEST] ✓ Unhandled questions fall through")
+
+
+class TestRoutedCompletion:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+        self.llm.client.chat.completions.create.side_effect = lambda **kw: _completion("Réponse agent")
+        self.rows = {
+            'SELECT SUM(TOTAL_ELEC_EGY) FROM "02-EAF"': [(45926712.859999835,)],
+            'SELECT SUM(ELEC_CONS_TOTAL) FROM "03-LF"': [(3698200,)],
+            'SELECT SUM(DURATION), COUNT(*) FROM "EAF_Arrêts"': [(None, 0)],
+        }
+        self.llm.tools["sql_query"]["function"] = lambda query: self.rows[query]
+
+    def test_kpi_answered_without_model(self):
+        """Recognised questions run SQL and the KPI function, with no model call"""
+        router = IntentRouter()
+        with patch("llm.INTENT_ROUTER", router):
+            events = list(self.llm.fork().stream_completion("Quelle est la conso électrique totale ?"))
+            assert events == [{
+                "type": "final",
+                "content": "Consommation électrique totale (EAF + LF) : 49624912.86",
+                "routed": "conso_elec_totale",
+            }]
+            assert self.llm.get_completion("Quel est la conso electrique EAF totale?") == \
+                "Consommation électrique EAF totale : 45926712.86"
+            assert self.llm.client.chat.completions.create.call_count == 0
+        assert router.stats()["by_intent"] == {"conso_elec_totale": 1, "conso_elec_eaf": 1}
+        print("[TEST] ✓ KPI answered by the intent router")
+
+    def test_empty_result_falls_through_to_agent(self):
+        """No data for a recognised question, or low confidence: the agent answers"""
+        router = IntentRouter()
+        with patch("llm.INTENT_ROUTER", router):
+            assert self.llm.get_completion("Quel est le MTTR EAF ?") == "Réponse agent"
+            assert self.llm.get_completion("Analyse les arrêts du four") == "Réponse agent"
+        assert self.llm.client.chat.completions.create.call_count == 2
+        stats = router.stats()
+        assert (stats["routed"], stats["errors"], stats["fallthrough"]) == (0, 1, 1)
+        print("[TEST] ✓ Intent router falls through to the agent")
@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from llm import LLM
+from scratchpad_store import ScratchpadStore
+
+
+def _chunk(content=None, reasoning=None):
+    """Build a fake streaming chunk shaped like the OpenAI SDK objects"""
+    delta = SimpleNamespace(content=content, reasoning=reasoning)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def _completion(content):
+    """Build a fake non-streaming completion"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+TOOL_CALL = '```json\n{"tool_call": {"name": "convert_energy_unit", "arguments": {"value": 1000, "from_unit": "kwh", "to_unit": "mwh"}}}\n```'
+
+
+class TestStreaming:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+
+    def test_stream_completion_events(self):
+        """Streaming yields reasoning, tool events and the final answer in order"""
+        turns = [
+            [_chunk(reasoning="Need a conversion."), _chunk(TOOL_CALL[:40]), _chunk(TOOL_CALL[40:])],
+            [_chunk("Résultat : "), _chunk("1 MWh")],
+        ]
+        self.llm.client.chat.completions.create.side_effect = lambda **kw: iter(turns.pop(0))
+
+        events = list(self.llm.stream_completion("Convertis 1000 kWh en MWh"))
+        types = [e["type"] for e in events]
+
+        assert types[0] == "reasoning"
+        assert types.index("tool_call_start") < types.index("tool_call_end") < types.index("final")
+        assert events[types.index("tool_call_end")]["result"] == json.dumps(1.0)
+        assert events[-1] == {"type": "final", "content": "Résultat : 1 MWh"}
+        assert all(kw["stream"] for _, kw in self.llm.client.chat.completions.create.call_args_list)
+        print("[TEST] ✓ Stream completion events")
+
+    def test_get_completion_uses_same_loop(self):
+        """get_completion returns the final answer of the non-streaming loop"""
+        responses = [_completion(TOOL_CALL), _completion("1 MWh")]
+        self.llm.client.chat.completions.create.side_effect = lambda **kw: responses.pop(0)
+
+        assert self.llm.get_completion("Convertis 1000 kWh en MWh") == "1 MWh"
+        print("[TEST] ✓ get_completion final answer")
+
+
+class TestAsyncEngine:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.async_client = MagicMock()
+
+    def test_aget_completion_runs_tools_off_loop(self):
+        """The async loop awaits the model and runs sync tools in the bounded executor"""
+        import asyncio
+        import threading
+
+        responses = [_completion(TOOL_CALL), _completion("1 MWh")]
+
+        async def create(**kw):
+            await asyncio.sleep(0)
+            return responses.pop(0)
+
+        self.llm.async_client.chat.completions.create.side_effect = create
+
+        seen_threads = []
+        original = self.llm.tools["convert_energy_unit"]["function"]
+
+        def spy(**kwargs):
+            seen_threads.append(threading.current_thread().name)
+            return original(**kwargs)
+
+        self.llm.tools["convert_energy_unit"]["function"] = spy
+
+        assert asyncio.run(self.llm.aget_completion("Convertis 1000 kWh en MWh")) == "1 MWh"
+        assert seen_threads and seen_threads[0].startswith("llm-tool")
+        print("[TEST] ✓ Async completion with executor-backed tools")
+
+
+class TestScratchpadRefs:
+    def setup_method(self):
+        self.llm = LLM()
+
+    def test_large_result_passed_by_reference(self):
+        """A parked result is resolved server-side when passed as {"$ref": key}"""
+        rows = [(f"2025-01-{d:02d}", float(d)) for d in range(1, 21)]
+        message = self.llm._tool_message("sql_query", rows)
+        key = next(k for k in self.llm.scratchpad["data_cache"])
+        assert key in message["content"] and '"$ref"' in message["content"]
+
+        table = self.llm.execute_tool("make_table", {"headers": ["day", "value"], "rows": {"$ref": key}})
+        assert table["props"]["rows"] == [list(r) for r in rows]
+
+        self.llm.scratchpad["data_cache"]["chart"] = {"labels": ["a", "b", "c"], "series": [{"data": [1, 2, 3]}]}
+        averaged = self.llm.execute_tool("moving_average", {"values": {"$ref": "chart.series.0.data"}, "window": 2})
+        assert averaged == [1, 1.5, 2.5]
+        print("[TEST] ✓ Scratchpad references resolved as tool arguments")
+
+    def test_result_over_scratchpad_budget(self):
+        """A result too large for the scratchpad is reported instead of parked under a dead key"""
+        store = ScratchpadStore(max_disk_bytes=1000, path=os.path.join(tempfile.mkdtemp(), "spill.db"), sweep_interval_s=0)
+        self.llm.scratchpad["data_cache"] = store.namespace()
+        message = self.llm._tool_message("sql_query", [(d, float(d)) for d in range(200)])
+        assert message["content"].startswith("Error: tool 'sql_query' returned a result too large")
+        assert list(self.llm.scratchpad["data_cache"]) == []
+        store.close()
+        print("[TEST] ✓ Oversized result reported")
+
+    def test_unknown_reference(self):
+        """An unknown reference is reported without calling the tool"""
+        result = self.llm.execute_tool("moving_average", {"values": {"$ref": "missing"}, "window": 2})
+        assert result.startswith("Error: Scratchpad reference 'missing' not found")
+        result = self.llm.execute_tool("moving_average", {"values": {"$ref": "goal_state.nope"}, "window": 2})
+        assert "invalid path" in result
+        print("[TEST] ✓ Unknown scratchpad reference")
+
+
+class TestPromptPrefixCache:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+
+    def test_static_prefix_identical_and_usage_recorded(self):
+        """The system prefix is byte-identical across requests; cached tokens are counted"""
+        import prompt_cache
+
+        sent = []
+        usage = SimpleNamespace(prompt_tokens=5000, prompt_tokens_details=SimpleNamespace(cached_tokens=4800))
+
+        def create(**kw):
+            sent.append(json.dumps(kw["messages"][:2], ensure_ascii=False))
+            completion = _completion("1 MWh" if len(sent) % 2 == 0 else TOOL_CALL)
+            completion.usage = usage
+            return completion
+
+        self.llm.client.chat.completions.create.side_effect = create
+        before = prompt_cache.PROMPT_CACHE_STATS.stats()
+        self.llm.get_completion("Convertis 1000 kWh en MWh")
+        self.llm.fork().get_completion("Convertis 2000 kWh en MWh")
+        after = prompt_cache.PROMPT_CACHE_STATS.stats()
+
+        assert len(sent) == 4 and len(set(sent)) == 1
+        assert after["requests"] - before["requests"] == 4
+        assert after["cached_tokens"] - before["cached_tokens"] == 4 * 4800
+        print("[TEST] ✓ Static prompt prefix and cached token accounting")
+
+    def test_cache_control_hint(self):
+        """Providers needing explicit hints get cache_control on the end of the prefix"""
+        from unittest.mock import patch
+
+        with patch.dict("os.environ", {"PROMPT_CACHE_CONTROL": "on"}):
+            self.llm._prefix_cache = None
+            messages = self.llm._build_chat_history("Bonjour")
+        assert messages[1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+        assert isinstance(messages[0]["content"], str) and messages[2]["content"] == "Bonjour"
+
+        with patch.dict("os.environ", {"PROMPT_CACHE_CONTROL": "auto"}):
+            self.llm._prefix_cache = None
+            assert isinstance(self.llm._build_chat_history("Bonjour")[1]["content"], str)
+        print("[TEST] ✓ cache_control hint")
+
+
+class TestParallelToolCalls:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+
+    def test_parse_tool_calls_batch(self):
+        """Several fenced blocks or a tool_calls array yield every call in order"""
+        kwh = '{"tool_call": {"name": "convert_energy_unit", "arguments": {"value": 1, "from_unit": "mwh", "to_unit": "kwh"}}}'
+        sql = '{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT 1\nFROM t",}}}'
+        calls = self.llm.parse_tool_calls(f"{TOOL_CALL}\n```json\n{kwh}\n```\n```json\n{sql}\n```")
+        assert [c["name"] for c in calls] == ["convert_energy_unit", "convert_energy_unit", "sql_query"]
+        assert calls[2]["arguments"]["query"] == "SELECT 1\nFROM t"
+
+        array = '```json\n{"tool_calls": [{"name": "a", "arguments": {}}, {"name": "b", "arguments": {"x": 1}}]}\n```'
+        assert [c["name"] for c in self.llm.parse_tool_calls(array)] == ["a", "b"]
+        assert self.llm.parse_tool_calls("Réponse finale") == []
+        print("[TEST] ✓ Batch tool-call parsing")
+
+    def test_batch_runs_concurrently_in_one_round_trip(self):
+        """Independent calls overlap on the executor and return in one tool message"""
+        import threading
+        import time
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def slow_kpi(**kwargs):
+            barrier.wait()   # only passes if the three calls run at the same time
+            time.sleep(0.01)
+            return kwargs["title"]
+
+        self.llm.tools["make_kpi"]["function"] = slow_kpi
+        batch = "\n".join(
+            f'```json\n{{"tool_call": {{"name": "make_kpi", "arguments": {{"title": "K{i}", "value": {i}}}}}}}\n```'
+            for i in range(3)
+        )
+        sent = []
+
+        def create(**kw):
+            sent.append(kw["messages"])
+            return _completion(batch if len(sent) == 1 else "3 KPI")
+
+        self.llm.client.chat.completions.create.side_effect = create
+        events = list(self.llm._run_loop("Trois KPI"))
+
+        assert len(sent) == 2 and events[-1] == {"type": "final", "content": "3 KPI"}
+        assert [e["result"] for e in events if e["type"] == "tool_call_end"] == ['"K0"', '"K1"', '"K2"']
+        tool_messages = [m for m in sent[1] if m["role"] == "tool"]
+        assert len(tool_messages) == 1 and tool_messages[0]["name"] == "tool_batch"
+        assert tool_messages[0]["content"].index('"K0"') < tool_messages[0]["content"].index('"K2"')
+        print("[TEST] ✓ Parallel tool batch in one round-trip")
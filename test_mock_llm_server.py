@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from llm import LLM
+from mock_llm_server import FALLBACK_REPLY, ReplayStore, create_app, load_chat_log, load_json_records
+
+
+def _client(store, **timing):
+    return OpenAI(base_url="http://testserver/v1", api_key="mock", http_client=TestClient(create_app(store, **timing)))
+
+
+class TestReplayLoading:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def _write(self, name, text):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_chat_logs_results_and_scripts(self):
+        """Chat logs, concatenated test results and turn scripts all load as recordings"""
+        log = self._write("chat_log_1.log", (
+            "=== Chat Session Log Started ===\n\n"
+            "[2025-06-13 13:55:34] User message: Quel est la conso LF ?\n"
+            "[2025-06-13 13:55:34] Current history length: 0\n"
+            "[2025-06-13 13:57:07] Agent response: Total :\n3698200\n"
+            "[2025-06-13 13:57:07] History updated, new length: 2\n"
+        ))
+        assert load_chat_log(log) == [("Quel est la conso LF ?", ["Total :\n3698200"])]
+
+        results = self._write("test_results.json", (
+            json.dumps({"question": "Q1", "answer": "1", "get_completion": "A1", "success": True}) + ",\n"
+            + json.dumps({"question": "Q2", "answer": "2", "get_completion": "A2", "success": False}) + ",\n"
+        ))
+        assert load_json_records(results) == [("Q1", ["A1"]), ("Q2", ["A2"])]
+
+        script = self._write("script.jsonl", json.dumps({"prompt": "Q3", "turns": ["call", "final"]}) + "\n")
+        assert load_json_records(script) == [("Q3", ["call", "final"])]
+        print("[TEST] ✓ Replay recordings loaded")
+
+
+class TestMockServer:
+    def setup_method(self):
+        self.store = ReplayStore([
+            ("Quel est la conso electrique EAF totale?", ["45926712.86 kWh"]),
+            ("Top coulées", ['```json\n{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT 1"}}}\n```', "Coulée 42"]),
+        ])
+
+    def test_openai_client_replay(self):
+        """Replies are chosen by the last user message and the assistant turn, streamed or not"""
+        client = _client(self.store)
+        messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "Quelle est la conso électrique EAF totale ?"}]
+        completion = client.chat.completions.create(model="m", messages=messages)
+        assert completion.choices[0].message.content == "45926712.86 kWh"
+        assert completion.usage.completion_tokens > 0
+
+        history = [{"role": "user", "content": "Top coulées"}, {"role": "assistant", "content": "…"}, {"role": "tool", "content": "[[42]]"}]
+        chunks = list(client.chat.completions.create(model="m", messages=history, stream=True, stream_options={"include_usage": True}))
+        assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices) == "Coulée 42"
+        assert chunks[-1].usage.completion_tokens == len([c for c in chunks if c.choices and c.choices[0].delta.content])
+
+        unknown = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "bonjour"}])
+        assert unknown.choices[0].message.content == FALLBACK_REPLY
+        assert self.store.stats() == {"recordings": 2, "requests": 3, "exact": 1, "nearest": 1, "misses": 1}
+        print("[TEST] ✓ OpenAI-compatible replay")
+
+    def test_latency_and_agent_loop(self):
+        """The ReAct loop runs offline against the mock, with the configured latency"""
+        llm = LLM()
+        llm.client = _client(self.store, latency_ms=50)
+        llm.tools["sql_query"]["function"] = MagicMock(return_value=[[42]])
+
+        start = time.perf_counter()
+        assert llm.get_completion("Top coulées") == "Coulée 42"
+        assert time.perf_counter() - start >= 0.1      # two model calls
+        llm.tools["sql_query"]["function"].assert_called_once_with(query="SELECT 1")
+
+        tokens = [e["content"] for e in llm.fork().stream_completion("Top coulées") if e["type"] == "token"]
+        assert "".join(tokens).endswith("Coulée 42")
+        print("[TEST] ✓ Agent loop against the mock server")
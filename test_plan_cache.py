@@ -0,0 +1,118 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from llm import LLM
+from plan_cache import PlanCache, plan_calls, prompt_template, rebind
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _call(name, **arguments):
+    return "```json\n" + json.dumps({"tool_call": {"name": name, "arguments": arguments}}) + "\n```"
+
+
+class TestPlanTemplates:
+    def test_template_and_rebind(self):
+        """Numbers, dates and quoted strings are parameters; table names stay literal"""
+        template, slots = prompt_template('Top 5 des coulées de 01-PAF depuis 2024-01-05, seuil 1,5 sur "EAF-Analyses"')
+        assert template == "top # des coulees de 01 paf depuis # seuil # sur #"
+        assert slots == ["5", "2024-01-05", "1.5", "EAF-Analyses"]
+
+        calls = [
+            ("sql_query", {"query": "SELECT HEATID FROM \"01-PAF\" WHERE d >= '2024-01-05' LIMIT 5"}),
+            ("outliers", {"table_name": "EAF-Analyses", "col": "_Mn", "threshold": 1.5, "limit": 5}),
+        ]
+        rebound = rebind(calls, slots, ["10", "2025-02-01", "3", "LF-Analyse"])
+        assert rebound[0][1]["query"] == "SELECT HEATID FROM \"01-PAF\" WHERE d >= '2025-02-01' LIMIT 10"
+        assert rebound[1][1] == {"table_name": "LF-Analyse", "col": "_Mn", "threshold": 3, "limit": 10}
+        assert rebind(calls, ["5", "5"], ["1", "2"]) is None     # ambiguous parameter
+        print("[TEST] ✓ Prompt templates and parameter rebinding")
+
+    def test_plan_keeps_replayable_calls(self):
+        """Only read-only calls without scratchpad references are replayed, once each"""
+        trace = [
+            {"name": "update_goal_state", "arguments": {"plan_update": ["a"]}},
+            {"name": "sql_query", "arguments": {"query": "SELECT 1"}},
+            {"name": "sql_query", "arguments": {"query": "SELECT 1"}},
+            {"name": "make_table", "arguments": {"headers": ["a"], "rows": {"$ref": "k"}}},
+            {"name": "rolling_stat", "arguments": {"table_name": "02-EAF", "date_col": "d", "value_col": "v", "window": {"$ref": "w"}}},
+        ]
+        assert plan_calls(trace) == [("sql_query", {"query": "SELECT 1"})]
+        print("[TEST] ✓ Replayable plan calls")
+
+    def test_plan_stops_before_dependent_turns(self):
+        """Calls of later turns may use earlier results: only the first data batch is kept"""
+        trace = [
+            {"name": "update_goal_state", "arguments": {"plan_update": ["a"]}, "turn": 0},
+            {"name": "sql_query", "arguments": {"query": "SELECT MAX(HEATID) FROM t"}, "turn": 1},
+            {"name": "sql_query", "arguments": {"query": "SELECT COUNT(*) FROM t"}, "turn": 1},
+            {"name": "sql_query", "arguments": {"query": "SELECT * FROM t WHERE HEATID = 12345"}, "turn": 2},
+        ]
+        assert plan_calls(trace) == [
+            ("sql_query", {"query": "SELECT MAX(HEATID) FROM t"}),
+            ("sql_query", {"query": "SELECT COUNT(*) FROM t"}),
+        ]
+        print("[TEST] ✓ Dependent calls are not part of the plan")
+
+
+class TestPlanReplay:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+        self.cache = PlanCache()
+        self.queries = []
+
+        def fake_sql(query):
+            self.queries.append(query)
+            return [[42]]
+
+        self.llm.tools["sql_query"]["function"] = fake_sql
+
+    def test_replay_skips_intermediate_round_trips(self):
+        """A prompt of the same template replays the first data batch; the model issues dependent calls"""
+        first = [
+            _completion(_call("update_goal_state", plan_update=["conso", "top"])),
+            _completion(
+                _call("sql_query", query='SELECT SUM(kwh) FROM "02-EAF" WHERE year = 2024') + "\n"
+                + _call("sql_query", query='SELECT HEATID FROM "02-EAF" WHERE year = 2024 ORDER BY kwh DESC LIMIT 5')
+            ),
+            _completion(_call("sql_query", query='SELECT * FROM "02-EAF" WHERE HEATID = 42')),
+            _completion("Total 42, top 5 listé."),
+        ]
+        self.llm.client.chat.completions.create.side_effect = lambda **kw: first.pop(0)
+
+        with patch("llm.PLAN_CACHE", self.cache):
+            assert self.llm.get_completion("Conso EAF 2024 et top 5 des coulées") == "Total 42, top 5 listé."
+            assert self.llm.client.chat.completions.create.call_count == 4
+
+            sent = []
+            second = [
+                _call("sql_query", query='SELECT * FROM "02-EAF" WHERE HEATID = 42'),
+                "Total 42, top 3 listé.",
+            ]
+
+            def answer(**kw):
+                sent.append(list(kw["messages"]))
+                return _completion(second.pop(0))
+
+            self.llm.client.chat.completions.create.side_effect = answer
+            self.queries.clear()
+            session = self.llm.fork()
+            events = list(session._run_loop("Conso EAF 2025 et top 3 des coulées"))
+
+        assert len(sent) == 2 and events[-1]["content"] == "Total 42, top 3 listé."
+        assert {"type": "plan_replay", "calls": 2} in events
+        # The replayed batch runs in parallel: its queries finish in any order
+        assert sorted(self.queries[:2]) == [
+            'SELECT HEATID FROM "02-EAF" WHERE year = 2025 ORDER BY kwh DESC LIMIT 3',
+            'SELECT SUM(kwh) FROM "02-EAF" WHERE year = 2025',
+        ]
+        assert self.queries[2:] == ['SELECT * FROM "02-EAF" WHERE HEATID = 42']
+        # The model sees the replayed calls and their results before answering
+        assert sent[0][-2]["role"] == "assistant" and "LIMIT 3" in sent[0][-2]["content"]
+        assert sent[0][-1]["name"] == "tool_batch"
+        assert self.cache.stats()["hits"] == 1
+        print("[TEST] ✓ Plan replay of the first data batch")
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+import db_pool
+from query_cache import QueryCache, normalize_sql
+
+
+def _make_db(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS "02-EAF" (HEATID INTEGER, TOTAL_ELEC_EGY REAL)')
+    conn.execute('INSERT INTO "02-EAF" VALUES (1, ?)', (value,))
+    conn.commit()
+    conn.close()
+
+
+class TestQueryCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        _make_db(self.db_path, 10.0)
+
+    def teardown_method(self):
+        db_pool.close_thread_connections()
+
+    def test_normalize_sql(self):
+        """Whitespace and keyword case are ignored, string literals are not"""
+        a = normalize_sql("SELECT  SUM( \"TOTAL_ELEC_EGY\" )\n FROM \"02-EAF\" WHERE GRADE = 'A42';")
+        b = normalize_sql('select sum("TOTAL_ELEC_EGY") from "02-EAF" where grade=\'A42\'')
+        assert a == b
+        assert normalize_sql("SELECT 'A42'") != normalize_sql("SELECT 'a42'")
+        # "..." may be a string literal in SQLite: kept verbatim
+        assert normalize_sql('SELECT * FROM t WHERE g = "ABC"') != normalize_sql('SELECT * FROM t WHERE g = "abc"')
+        assert normalize_sql('SELECT "it\'s" , \'a""b\'') == 'select "it\'s",\'a""b\''
+        print("[TEST] ✓ SQL normalization")
+
+    def test_hit_and_invalidation(self):
+        """Near-identical queries hit; a database write invalidates"""
+        cache = QueryCache()
+        query = 'SELECT SUM(TOTAL_ELEC_EGY) FROM "02-EAF"'
+        assert cache.execute(query, path=self.db_path) == [(10.0,)]
+        assert cache.execute(query.replace("SELECT", "select") + " ;", path=self.db_path) == [(10.0,)]
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        _make_db(self.db_path, 5.0)
+        assert cache.execute(query, path=self.db_path) == [(15.0,)]
+        assert cache.stats()["invalidations"] == 1
+        print("[TEST] ✓ Cache hit and invalidation on db change")
+
+    def test_write_during_query_is_not_cached(self):
+        """Rows read before a concurrent write are not stored under the new fingerprint"""
+        cache = QueryCache()
+        query = 'SELECT SUM(TOTAL_ELEC_EGY) FROM "02-EAF"'
+        original = db_pool.execute
+
+        def execute_then_write(*args, **kwargs):
+            rows = original(*args, **kwargs)
+            _make_db(self.db_path, 5.0)
+            return rows
+
+        with patch("query_cache.db_pool.execute", side_effect=execute_then_write):
+            assert cache.execute(query, path=self.db_path) == [(10.0,)]
+        assert cache.stats()["entries"] == 0
+        assert cache.execute(query, path=self.db_path) == [(15.0,)]
+        print("[TEST] ✓ Write during a query is not cached")
+
+    def test_byte_bound_evicts_lru(self):
+        """The byte budget is enforced by evicting least recently used entries"""
+        cache = QueryCache(max_bytes=200)
+        for i in range(10):
+            cache.execute(f"SELECT {i}, 'padding-padding-padding'", path=self.db_path)
+        stats = cache.stats()
+        assert stats["bytes"] <= 200
+        assert stats["evictions"] > 0
+        assert cache.execute("SELECT 9, 'padding-padding-padding'", path=self.db_path)
+        assert cache.hits == 1
+        print("[TEST] ✓ Byte-bounded LRU eviction")
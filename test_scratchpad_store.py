@@ -0,0 +1,75 @@
+import gc
+import os
+import tempfile
+import time
+
+import pytest
+
+from scratchpad_store import ScratchpadStore
+
+
+class TestScratchpadStore:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ScratchpadStore(
+            max_bytes=2000,
+            spill_bytes=1500,
+            max_disk_bytes=5000,
+            ttl_s=60,
+            path=os.path.join(self.temp_dir, "spill.db"),
+            sweep_interval_s=0,
+        )
+
+    def teardown_method(self):
+        self.store.close()
+
+    def test_spill_and_lru_budgets(self):
+        """Large values go to disk, LRU spills past the RAM budget, disk is bounded"""
+        view = self.store.namespace()
+        big = list(range(1000))            # ~2-3 KB pickled: straight to disk
+        view["big"] = big
+        for i in range(5):
+            view[f"small_{i}"] = "x" * 500  # 5 x ~500 B > 2000 B budget
+
+        stats = self.store.stats()
+        assert stats["memory_bytes"] <= 2000
+        assert stats["spilled_entries"] >= 2
+        assert view["big"] == big and view["small_0"] == "x" * 500
+        assert set(view) == {"big", *(f"small_{i}" for i in range(5))}
+
+        for i in range(3):
+            view[f"huge_{i}"] = list(range(1000 + i))
+        stats = self.store.stats()
+        assert stats["disk_bytes"] <= 5000 and stats["evictions"] > 0
+        assert "big" not in view          # least recently used spilled entry dropped first
+        # One spill file per worker process, even with a shared configured path
+        assert self.store.path == os.path.join(self.temp_dir, f"spill_{os.getpid()}.db")
+        assert os.path.exists(self.store.path)
+        print("[TEST] ✓ Scratchpad spill and byte budgets")
+
+    def test_value_over_disk_budget_is_rejected(self):
+        """A value larger than the whole disk budget fails at put time instead of vanishing"""
+        view = self.store.namespace()
+        with pytest.raises(ValueError, match="max_disk_bytes"):
+            view["huge"] = list(range(5000))
+        assert "huge" not in view
+        assert self.store.stats()["evictions"] == 0
+        print("[TEST] ✓ Oversized scratchpad value rejected")
+
+    def test_ttl_sweep_and_namespace_release(self):
+        """Idle entries expire via sweep(); a dropped session frees its entries"""
+        a, b = self.store.namespace(), self.store.namespace()
+        a["k"] = [1, 2, 3]
+        b["k"] = {"other": True}
+        assert a["k"] == [1, 2, 3] and b["k"] == {"other": True}
+
+        assert self.store.sweep(now=time.monotonic() + 61) == 2
+        with pytest.raises(KeyError):
+            a["k"]
+        assert a.get("k") is None
+
+        b["k"] = "again"
+        del b
+        gc.collect()
+        assert self.store.stats()["entries"] == 0
+        print("[TEST] ✓ Scratchpad TTL sweep and namespace release")
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from llm import LLM
+from session_manager import SessionManager
+
+
+class TestSessionManager:
+    def setup_method(self):
+        self.template = LLM()
+
+    def test_sessions_are_isolated(self):
+        """Each conversation gets its own scratchpad and created tools"""
+        sessions = SessionManager(self.template)
+        a, b = sessions.get(1), sessions.get(2)
+
+        a.execute_tool("save_to_scratchpad", {"key": "k", "value": 42})
+        a.execute_tool("update_goal_state", {"completed_step": "step A"})
+        a.create_new_tool("double", "def double(self, x):\n    return 2 * x", "Double x")
+
+        assert a.scratchpad["data_cache"] == {"k": 42}
+        assert b.scratchpad["data_cache"] == {}
+        assert self.template.scratchpad["data_cache"] == {}
+        assert b.scratchpad["goal_state"]["completed_steps"] == []
+        assert a.execute_tool("double", {"x": 4}) == 8
+        assert "double" not in b.tools and "double" not in self.template.tools
+        # Registry and HTTP clients are shared, not copied
+        assert a.client is self.template.client
+        assert a.tools["sql_query"] is self.template.tools["sql_query"]
+        assert sessions.get(1) is a
+        print("[TEST] ✓ Session isolation")
+
+    def test_lru_eviction(self):
+        """The least recently used session goes first when over capacity"""
+        sessions = SessionManager(self.template, max_sessions=2)
+        first = sessions.get(1)
+        sessions.get(2)
+        sessions.get(1)
+        sessions.get(3)
+
+        assert len(sessions) == 2
+        assert sessions.get(1) is first
+        assert sessions.stats()["evicted"] == 1
+        print("[TEST] ✓ Session LRU eviction")
+
+    def test_idle_ttl(self):
+        """Sessions idle longer than the TTL are dropped"""
+        sessions = SessionManager(self.template, idle_ttl_s=10)
+        with patch("session_manager.time.monotonic", return_value=100.0):
+            first = sessions.get(1)
+        with patch("session_manager.time.monotonic", return_value=200.0):
+            assert sessions.get(1) is not first
+        assert sessions.stats()["expired"] == 1
+        print("[TEST] ✓ Session idle TTL")
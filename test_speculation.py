@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from llm import LLM
+from speculation import Speculator
+
+
+SQL_CALL = '```json\n{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT 1"}}}\n```'
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, reasoning=None))])
+
+
+class TestSpeculator:
+    def setup_method(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+
+    def teardown_method(self):
+        self.pool.shutdown(wait=True)
+
+    def test_claim_and_discard(self):
+        """Read-only calls start as soon as complete; unclaimed ones are discarded"""
+        ran = []
+        speculator = Speculator(lambda name, args: self.pool.submit(lambda: ran.append(name) or name))
+        speculator.feed(SQL_CALL[:30])
+        assert speculator.started == 0
+        speculator.feed(SQL_CALL[30:] + '\n```json\n{"tool_call": {"name": "update_goal_state", "arguments": {}}}\n```')
+        speculator.feed('\n```json\n{"tool_call": {"name": "list_tables", "arguments": {}}}\n```')
+        speculator.model_done()
+        assert speculator.started == 2      # update_goal_state is never speculated
+
+        future = speculator.claim("sql_query", {"query": "SELECT 1"})
+        assert future.result() == "sql_query"
+        assert speculator.claim("sql_query", {"query": "SELECT 2"}) is None
+        speculator.settle()
+        report = speculator.report()
+        assert (report["started"], report["used"], report["discarded"]) == (2, 1, 1)
+        assert report["saved_s"] >= 0
+        print("[TEST] ✓ Speculator claim and discard")
+
+
+class TestSpeculativeCompletion:
+    def setup_method(self):
+        self.llm = LLM()
+        self.llm.client = MagicMock()
+        self.llm.speculative = True
+
+    def test_tool_overlaps_generation(self):
+        """sql_query runs while the model is still streaming its trailing tokens"""
+        calls, marks = [], {}
+
+        def slow_sql(query):
+            calls.append(query)
+            marks["tool_started"] = time.perf_counter()
+            time.sleep(0.2)
+            return [[42]]
+
+        self.llm.tools["sql_query"]["function"] = slow_sql
+
+        def trailing_tokens():
+            yield _chunk(SQL_CALL)
+            for _ in range(4):
+                time.sleep(0.05)
+                yield _chunk(" ")
+            marks["stream_done"] = time.perf_counter()
+
+        turns = [trailing_tokens(), iter([_chunk("42 kWh")])]
+        self.llm.client.chat.completions.create.side_effect = lambda **kw: turns.pop(0)
+
+        assert self.llm.get_completion("Conso totale ?") == "42 kWh"
+
+        assert calls == ["SELECT 1"]     # executed once, reused by the loop
+        report = self.llm.last_speculation
+        assert report["used"] == 1 and report["discarded"] == 0
+        assert report["saved_s"] > 0
+        assert marks["tool_started"] < marks["stream_done"]
+        assert all(kw["stream"] for _, kw in self.llm.client.chat.completions.create.call_args_list)
+        print("[TEST] ✓ Speculative tool execution overlaps generation")
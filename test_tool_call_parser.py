@@ -0,0 +1,53 @@
+import json
+
+from tool_call_parser import ToolCallParser, parse_tool_calls
+
+
+SQL_CALL = '```json\n{"tool_call": {"name": "sql_query", "arguments": {"query": "SELECT SUM(kwh)\nFROM \\"EAF-Consommation\\"",}}}\n```'
+
+
+class TestToolCallParser:
+    def test_formats(self):
+        """Fenced, raw, batched and DeepSeek-tag calls are found in one pass"""
+        calls = parse_tool_calls("Je vais interroger la base.\n" + SQL_CALL)
+        assert calls == [{"name": "sql_query", "arguments": {"query": 'SELECT SUM(kwh)\nFROM "EAF-Consommation"'}}]
+
+        raw = 'Plan: {"name": "get_db_schema", "arguments": {}} puis {"tool_calls": [{"name": "a", "arguments": {"x": "}"}}]}'
+        assert [c["name"] for c in parse_tool_calls(raw)] == ["get_db_schema", "a"]
+
+        tag = '<｜tool▁call▁begin｜>function<｜tool▁sep｜>get_kpi\n```json\n{"kpi": "energy"}\n```<｜tool▁call▁end｜>'
+        assert parse_tool_calls(tag) == [{"name": "get_kpi", "arguments": {"kpi": "energy"}}]
+
+        html = "```html\n<style>body { margin: 0 }</style><script>if (a) { b(); }</script>\n```"
+        assert parse_tool_calls(html) == []
+        # An unbalanced brace in prose must not swallow the call after it
+        assert [c["name"] for c in parse_tool_calls("Set {x; " + SQL_CALL)] == ["sql_query"]
+        print("[TEST] ✓ Tool-call formats")
+
+    def test_streaming_chunks(self):
+        """Calls are emitted as soon as their closing brace arrives, whatever the chunking"""
+        text = "Réflexion…\n" + SQL_CALL + "\n" + '```json\n{"tool_call": {"name": "get_db_schema", "arguments": {}}}\n```\nFin.'
+        expected = parse_tool_calls(text)
+        assert len(expected) == 2
+
+        for size in (1, 3, 7, 64):
+            parser = ToolCallParser()
+            emitted_at = []
+            for i in range(0, len(text), size):
+                for call in parser.feed(text[i:i + size]):
+                    emitted_at.append((call["name"], i + size))
+            parser.close()
+            assert parser.calls == expected
+            first_end = text.index("}}}") + 3
+            assert emitted_at[0][0] == "sql_query" and emitted_at[0][1] - size < first_end <= emitted_at[0][1]
+        print("[TEST] ✓ Streaming tool-call parser")
+
+    def test_long_stream_compacts_buffer(self):
+        """Prose before a call does not accumulate in the buffer"""
+        parser = ToolCallParser()
+        for _ in range(200):
+            parser.feed("Analyse des données de fusion, étape par étape. " * 4)
+        assert len(parser._buf) < 20000
+        parser.feed('<｜tool▁sep｜>sql_query\n```json\n' + json.dumps({"query": "SELECT 1"}) + "\n```")
+        assert parser.calls == [{"name": "sql_query", "arguments": {"query": "SELECT 1"}}]
+        print("[TEST] ✓ Buffer compaction")
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from pydantic import create_model
+
+import tool_catalog
+from llm import LLM
+from tool_catalog import ToolCatalog, spec_schema, spec_text
+
+
+class TestToolCatalog:
+    def setup_method(self):
+        self.llm = LLM()
+
+    def test_description_cached_until_tool_added(self):
+        """The catalog renders each tool once and shares it with session forks"""
+        with patch("tool_catalog.entry_text", wraps=tool_catalog.entry_text) as spy:
+            catalog = ToolCatalog()
+            for name, entry in self.llm.tools.items():
+                catalog[name] = entry
+            first = catalog.description()
+            assert catalog.description() is first
+            assert spy.call_count == len(catalog)
+
+        assert first.startswith("Available tools:\n\n- sql_query:")
+        assert self.llm.fork().get_tools_description() is self.llm.get_tools_description()
+
+        schemas = {s["function"]["name"]: s["function"] for s in self.llm.get_tool_schemas()}
+        assert schemas["rolling_stat"]["parameters"]["properties"]["window"] == {"type": "integer"}
+        assert "table_name" in schemas["rolling_stat"]["parameters"]["required"]
+        print("[TEST] ✓ Tool description cached and shared")
+
+    def test_session_tool_invalidates_only_its_catalog(self):
+        """create_new_tool bumps the session catalog version, not the shared one"""
+        shared = self.llm.get_tools_description()
+        version = self.llm.tools.version
+        session = self.llm.fork()
+        session.create_new_tool("double_it", "def double_it(self, x: int) -> int:\n    return 2 * x\n", "Double a number")
+
+        assert "- double_it: Double a number" in session.get_tools_description()
+        assert session.get_tool_schemas()[-1]["function"]["name"] == "double_it"
+        assert self.llm.get_tools_description() is shared and self.llm.tools.version == version
+        assert "double_it" not in self.llm.tools
+        print("[TEST] ✓ Session tools invalidate only the session catalog")
+
+    def test_toolspec_renderers(self):
+        """ToolSpec-style entries (pydantic args schema) render once per version"""
+        args = create_model("ScaleArgs", value=(float, ...), factor=(float, 2.0))
+        catalog = ToolCatalog(text=spec_text, schema=spec_schema, header="", empty="")
+        assert catalog.description() == ""
+        catalog["scale"] = SimpleNamespace(description="Scale a value", args_schema=args)
+        assert catalog.description() == "- `scale(value, factor)`: Scale a value"
+        assert catalog.schemas()[0]["function"]["parameters"]["required"] == ["value"]
+
+        catalog["scale"].description = "Multiply a value"
+        catalog.invalidate("scale")
+        assert catalog.description() == "- `scale(value, factor)`: Multiply a value"
+        print("[TEST] ✓ ToolSpec renderers")
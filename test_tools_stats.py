@@ -0,0 +1,132 @@
+import os
+import random
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+import db_pool
+from tools import Tools
+
+
+def _legacy_moving_average(values, window):
+    return [
+        values[i] if i < window - 1 else sum(values[i - window + 1 : i + 1]) / window
+        for i in range(len(values))
+    ]
+
+
+def _legacy_iqr_outliers(values, threshold=1.5):
+    q1 = sorted(values)[len(values) // 4]
+    q3 = sorted(values)[3 * len(values) // 4]
+    iqr = q3 - q1
+    return [i for i, v in enumerate(values) if v < q1 - threshold * iqr or v > q3 + threshold * iqr]
+
+
+class TestToolsStats:
+    def setup_method(self):
+        self.tools = Tools()
+        rng = random.Random(7)
+        self.values = [rng.gauss(0.8, 0.1) for _ in range(500)] + [3.0, -2.0]
+
+    def test_matches_previous_implementation(self):
+        """Vectorized helpers return the same values as the pure-Python versions"""
+        for window in (1, 3, 20):
+            assert self.tools.moving_average(self.values, window) == _legacy_moving_average(self.values, window)
+        assert self.tools.moving_average([1, 2, 3, 4], 2) == [1, 1.5, 2.5, 3.5]
+        assert self.tools.moving_average([1, 2], 5) == [1, 2]
+        big = self.tools.moving_average(self.values, 100)
+        assert big == pytest.approx(_legacy_moving_average(self.values, 100))
+
+        assert self.tools.detect_outliers(self.values) == _legacy_iqr_outliers(self.values)
+        assert self.tools.detect_outliers(self.values, method="zscore", threshold=3) == [500, 501]
+        assert self.tools.zscore([2.0, 2.0]) == [0.0, 0.0]
+        assert self.tools.normalize_series([1, 3, 2]) == [0.0, 1.0, 0.5]
+        assert self.tools.detect_outliers([]) == []
+        print("[TEST] ✓ NumPy statistics match the previous implementation")
+
+    def test_rolling_variants(self):
+        """rolling_std / rolling_median / ewma"""
+        assert self.tools.rolling_std([1, 3, 5, 5], 2) == [None, 1.0, 1.0, 0.0]
+        assert self.tools.rolling_median([5, 1, 3, 2, 9], 3) == [None, None, 3.0, 2.0, 3.0]
+        assert self.tools.rolling_median([1], 3) == [None]
+
+        expected = [self.values[0]]
+        for x in self.values[1:]:
+            expected.append(0.05 * x + 0.95 * expected[-1])
+        assert self.tools.ewma(self.values, 0.05) == pytest.approx(expected, rel=1e-12)
+        assert self.tools.ewma([1.0, 2.0], 1) == [1.0, 2.0]
+        with pytest.raises(ValueError):
+            self.tools.ewma([1.0], 0)
+        print("[TEST] ✓ Rolling std, median and EWMA")
+
+
+class TestSqlStatisticsTools:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "databasevf.db")
+        self.daily = [10.0, 12.0, 11.0, 50.0, 9.0, 13.0]
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE "02-EAF" (HEATID INTEGER, HEATANNOUNCE_ACT TIMESTAMP, TOTAL_ELEC_EGY REAL)')
+        rows, heat = [], 100
+        for day, total in enumerate(self.daily, start=1):
+            # Two heats per day
+            for half in (total / 2, total / 2):
+                rows.append((heat, f"2025-01-{day:02d} 08:00:00", half))
+                heat += 1
+        rows.append((999, None, 1.0))
+        conn.executemany('INSERT INTO "02-EAF" VALUES (?, ?, ?)', rows)
+        conn.commit()
+        conn.close()
+        self.patches = [patch.object(db_pool, "DB_PATH", self.db_path), patch("tools.COLUMNAR_CACHE.enabled", False)]
+        for p in self.patches:
+            p.start()
+
+    def teardown_method(self):
+        for p in self.patches:
+            p.stop()
+        db_pool.close_thread_connections()
+
+    def test_rolling_stat_summary(self):
+        """rolling_stat aggregates per day then rolls in SQL, returning a summary"""
+        tools = Tools()
+        summary = tools.rolling_stat("02-EAF", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", window=3, tail=2)
+        expected = tools.moving_average(self.daily, 3)
+
+        assert summary["periods"] == 6
+        assert summary["from"] == "2025-01-01" and summary["to"] == "2025-01-06"
+        assert summary["last"] == {"period": "2025-01-06", "value": 13.0, "rolling": round(expected[-1], 4)}
+        assert summary["max"] == {"period": "2025-01-04", "rolling": round(expected[3], 4)}
+        assert summary["recent"] == [["2025-01-05", round(expected[4], 4)], ["2025-01-06", round(expected[5], 4)]]
+
+        median = tools.rolling_stat("02-EAF", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", window=3, stat="median")
+        assert median["last"]["rolling"] == 13.0
+        with pytest.raises(ValueError):
+            tools.rolling_stat("02-EAF", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", stat="MODE")
+        print("[TEST] ✓ rolling_stat returns a compact summary")
+
+    def test_rolling_stat_last_skips_missing_periods(self):
+        """The last value comes from the same period as the last rolling point"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT INTO "02-EAF" VALUES (998, \'2025-01-07 08:00:00\', NULL)')
+        conn.commit()
+        conn.close()
+        summary = Tools().rolling_stat("02-EAF", "HEATANNOUNCE_ACT", "TOTAL_ELEC_EGY", window=3, stat="std")
+
+        assert summary["periods"] == 7 and summary["to"] == "2025-01-07"
+        assert summary["last"]["period"] == "2025-01-06" and summary["last"]["value"] == 13.0
+        print("[TEST] ✓ rolling_stat last point is consistent")
+
+    def test_outliers_summary(self):
+        """outliers reports counts, bounds and the most extreme ids only"""
+        summary = Tools().outliers("02-EAF", "TOTAL_ELEC_EGY", id_col="HEATID", limit=1)
+
+        assert summary["count"] == 13
+        assert summary["outliers"] == 3
+        assert summary["top"] == [{"HEATID": 106, "value": 25.0}]
+        assert set(summary["bounds"]) == {"q1", "q3", "low", "high"}
+
+        by_rowid = Tools().outliers("02-EAF", "TOTAL_ELEC_EGY", method="zscore", threshold=2, where_clause="HEATID < 999")
+        assert by_rowid["count"] == 12 and by_rowid["top"][0]["rowid"] in (7, 8)
+        print("[TEST] ✓ outliers returns a compact summary")
@@ -0,0 +1,186 @@
+# tool_call_parser.py
+"""
+Analyse des appels d'outils dans les réponses du modèle, en une passe.
+
+Un scanner unique parcourt le texte (ou les chunks d'un stream) en
+suivant la profondeur d'accolades et les chaînes JSON : chaque objet de
+premier niveau est décodé dès son accolade fermante, qu'il soit dans un
+bloc ```json, en JSON brut ou après une balise DeepSeek <｜tool▁sep｜>nom.
+
+Décodage tolérant : retours à la ligne bruts dans les chaînes (SQL
+multiligne) et virgules finales, repérées pendant le scan.
+
+Formats reconnus : {"tool_call": {...}}, {"tool_calls": [...]},
+{"name": ..., "arguments": {...}}, ou les arguments seuls après une
+balise tool▁sep.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Sequence
+
+# Jetons significatifs dans un objet (hors chaîne) / dans une chaîne
+_OBJECT_TOKEN_RE = re.compile(r'[{}",]')
+_STRING_TOKEN_RE = re.compile(r'["\\]')
+_TRAILING_COMMA_RE = re.compile(r",\s*[}\]]")
+_PENDING_COMMA_RE = re.compile(r",\s*\Z")
+# Nom d'outil d'une balise DeepSeek placée juste avant l'objet d'arguments
+_TAG_NAME_RE = re.compile(r"tool▁sep\W*(\w+)\s*(?:```\s*json)?\s*\Z")
+_DECODER = json.JSONDecoder(strict=False)
+# Texte libre conservé avant un objet (pour la balise) une fois le buffer compacté
+_GAP_KEEP = 256
+_COMPACT_AT = 1 << 14
+
+
+def loads_tolerant(text: str, commas: Sequence[int] = ()) -> Any:
+    """
+    json.loads qui accepte les caractères de contrôle dans les chaînes ;
+    `commas` : positions de virgules finales à retirer. None si invalide.
+    """
+    if commas:
+        parts, prev = [], 0
+        for i in commas:
+            parts.append(text[prev:i])
+            prev = i + 1
+        parts.append(text[prev:])
+        text = "".join(parts)
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return None
+
+
+def tool_calls_in(obj: Any) -> List[Dict[str, Any]]:
+    """
+    Appels d'outils contenus dans un objet JSON décodé (voir les formats
+    reconnus en tête de module), dans l'ordre.
+    """
+    if isinstance(obj, list):
+        return [call for item in obj for call in tool_calls_in(item)]
+    if not isinstance(obj, dict):
+        return []
+    if "tool_calls" in obj:
+        return tool_calls_in(obj["tool_calls"])
+    if "tool_call" in obj:
+        call = obj["tool_call"]
+        return [call] if isinstance(call, dict) and isinstance(call.get("name"), str) else []
+    if isinstance(obj.get("name"), str) and "arguments" in obj:
+        return [obj]
+    return []
+
+
+class ToolCallParser:
+    """
+    Scanner incrémental : `feed(chunk)` renvoie les appels complétés par
+    ce chunk (exécutables sans attendre la fin de la réponse) ; `close()`
+    termine le texte et renvoie les derniers. `calls` cumule le tout.
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+        self._buf = ""
+        self._pos = 0            # prochain caractère à scanner
+        self._depth = 0
+        self._in_string = False
+        self._start = -1         # début de l'objet de premier niveau en cours
+        self._gap = 0            # fin du dernier objet décodé
+        self._commas: List[int] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buf += chunk
+        found = self._scan()
+        if self._depth == 0 and self._pos > _COMPACT_AT:
+            self._compact()
+        self.calls.extend(found)
+        return found
+
+    def close(self) -> List[Dict[str, Any]]:
+        found: List[Dict[str, Any]] = []
+        while self._depth > 0:
+            # Objet jamais refermé : l'accolade était du texte libre, on reprend juste après
+            self._pos = self._start + 1
+            self._depth, self._in_string = 0, False
+            found.extend(self._scan())
+        self.calls.extend(found)
+        return found
+
+    def _compact(self) -> None:
+        cut = max(self._gap, self._pos - _GAP_KEEP)
+        self._buf = self._buf[cut:]
+        self._pos -= cut
+        self._gap = max(self._gap - cut, 0)
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        buf, pos, end = self._buf, self._pos, len(self._buf)
+        found: List[Dict[str, Any]] = []
+        while pos < end:
+            if self._depth == 0:
+                pos = buf.find("{", pos)
+                if pos < 0:
+                    pos = end
+                    break
+                # Voie rapide : objet déjà complet et valide, décodé en C d'un coup
+                try:
+                    obj, obj_end = _DECODER.raw_decode(buf, pos)
+                except ValueError:
+                    self._start, self._depth, self._commas = pos, 1, []
+                    pos += 1
+                else:
+                    self._start, pos = pos, obj_end
+                    found.extend(self._calls(obj, buf, pos))
+            elif self._in_string:
+                m = _STRING_TOKEN_RE.search(buf, pos)
+                if m is None:
+                    pos = end
+                elif m.group() == '"':
+                    self._in_string = False
+                    pos = m.end()
+                elif m.end() < end:
+                    pos = m.end() + 1     # caractère échappé
+                else:
+                    pos = m.start()       # échappement coupé entre deux chunks
+                    break
+            else:
+                m = _OBJECT_TOKEN_RE.search(buf, pos)
+                if m is None:
+                    pos = end
+                    break
+                token, pos = m.group(), m.end()
+                if token == '"':
+                    self._in_string = True
+                elif token == "{":
+                    self._depth += 1
+                elif token == ",":
+                    if _TRAILING_COMMA_RE.match(buf, m.start()):
+                        self._commas.append(m.start() - self._start)
+                    elif _PENDING_COMMA_RE.match(buf, m.start()):
+                        pos = m.start()   # la suite décidera si la virgule est finale
+                        break
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        found.extend(self._decode(buf, pos))
+        self._pos = pos
+        return found
+
+    def _decode(self, buf: str, end: int) -> List[Dict[str, Any]]:
+        return self._calls(loads_tolerant(buf[self._start:end], self._commas), buf, end)
+
+    def _calls(self, obj: Any, buf: str, end: int) -> List[Dict[str, Any]]:
+        calls = tool_calls_in(obj)
+        if not calls and isinstance(obj, dict):
+            tag = _TAG_NAME_RE.search(buf, self._gap, self._start)
+            if tag:
+                calls = [{"name": tag.group(1), "arguments": obj}]
+        if calls or obj is not None:
+            self._gap = end
+        return calls
+
+
+def parse_tool_calls(text: str) -> List[Dict[str, Any]]:
+    """Tous les appels d'outils d'un texte complet, dans l'ordre."""
+    parser = ToolCallParser()
+    parser.feed(text)
+    parser.close()
+    return parser.calls
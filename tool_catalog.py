@@ -0,0 +1,242 @@
+# tool_catalog.py
+"""
+Catalogue d'outils versionné : la description texte du prompt et les
+schémas function-calling sont calculés une fois, puis réutilisés tant
+qu'aucun outil n'est ajouté (register_tool, create_new_tool…).
+
+Chaque session d'agent a un catalogue enfant (`child()`) : sans outil
+local, elle partage la chaîne en cache de son parent ; un outil créé
+dans la session n'invalide que son propre catalogue.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+_JSON_TYPES = (
+    (re.compile(r"^(str|string)\b"), "string"),
+    (re.compile(r"^(int|integer)\b"), "integer"),
+    (re.compile(r"^(float|number)\b"), "number"),
+    (re.compile(r"^bool\b"), "boolean"),
+    (re.compile(r"^(list|List|tuple|Tuple|Sequence)\b"), "array"),
+    (re.compile(r"^(dict|Dict|Mapping)\b"), "object"),
+)
+_OPTIONAL_RE = re.compile(r"^Optional\[(.*)\]$")
+
+
+def json_type(annotation: str) -> Optional[str]:
+    """
+    Type JSON Schema d'une annotation texte ("list[float]", "Optional[str]",
+    "<class 'int'>"…) ; None si inconnu.
+    """
+    text = annotation.strip()
+    m = re.match(r"^<class '(\w+)'>$", text)
+    if m:
+        text = m.group(1)
+    m = _OPTIONAL_RE.match(text)
+    if m:
+        text = m.group(1)
+    text = text.split("|")[0].strip()
+    for pattern, kind in _JSON_TYPES:
+        if pattern.match(text):
+            return kind
+    return None
+
+
+def entry_text(name: str, entry: Dict[str, Any]) -> str:
+    """
+    Bloc de description d'un outil de LLM.tools ({"function", "description",
+    "parameters"}), au format historique de get_tools_description.
+    """
+    lines = [f"\n- {name}: {entry['description']}"]
+    if entry["parameters"]:
+        lines.append("  Parameters:")
+        for param_name, param_info in entry["parameters"].items():
+            required = "required" if param_info["required"] else "optional"
+            lines.append(f"    - {param_name} ({param_info['type']}): {required}")
+    return "\n".join(lines)
+
+
+def entry_schema(name: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Schéma function-calling (format OpenAI) d'un outil de LLM.tools.
+    """
+    properties = {}
+    for param_name, param_info in entry["parameters"].items():
+        kind = json_type(param_info["type"])
+        properties[param_name] = {"type": kind} if kind else {}
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": entry["description"],
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": [p for p, info in entry["parameters"].items() if info["required"]],
+            },
+        },
+    }
+
+
+def spec_text(name: str, spec: Any) -> str:
+    """
+    Ligne de description d'un ToolSpec (modèle pydantic `args_schema`).
+    """
+    params = ", ".join(spec.args_schema.model_json_schema().get("properties", {}).keys())
+    return f"- `{name}({params})`: {spec.description}"
+
+
+def spec_schema(name: str, spec: Any) -> Dict[str, Any]:
+    """
+    Schéma function-calling d'un ToolSpec.
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": spec.description,
+            "parameters": spec.args_schema.model_json_schema(),
+        },
+    }
+
+
+class ToolCatalog(Mapping):
+    """
+    Mapping nom → outil, avec rendu en cache.
+
+    Parameters
+    ----------
+    parent : ToolCatalog, optional
+        Catalogue partagé consulté pour les noms absents localement.
+    text : callable(name, entry) -> str
+        Rendu texte d'un outil (défaut : entrées de LLM.tools).
+    schema : callable(name, entry) -> dict
+        Schéma function-calling d'un outil.
+    header : str, optional
+        Première ligne de la description.
+    empty : str
+        Description quand le catalogue est vide.
+    """
+
+    def __init__(
+        self,
+        parent: Optional["ToolCatalog"] = None,
+        *,
+        text: Optional[Callable[[str, Any], str]] = None,
+        schema: Optional[Callable[[str, Any], Dict[str, Any]]] = None,
+        header: Optional[str] = None,
+        empty: Optional[str] = None,
+    ) -> None:
+        self._parent = parent
+        self._text = text or (parent._text if parent else entry_text)
+        self._schema = schema or (parent._schema if parent else entry_schema)
+        self._header = header if header is not None else (parent._header if parent else "Available tools:")
+        self._empty = empty if empty is not None else (parent._empty if parent else "No tools available.")
+        self._local: Dict[str, Any] = {}
+        self._revision = 0
+        # name -> (texte, schéma) des outils locaux, rendus à la demande
+        self._rendered: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._description: Optional[Tuple[tuple, str]] = None
+        self._schemas: Optional[Tuple[tuple, List[Dict[str, Any]]]] = None
+        self._lock = threading.RLock()
+
+    # ──────────────────────────────────────────────
+    # Mapping
+    # ──────────────────────────────────────────────
+    def __getitem__(self, name: str) -> Any:
+        if name in self._local:
+            return self._local[name]
+        if self._parent is not None:
+            return self._parent[name]
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._parent is not None:
+            for name in self._parent:
+                if name not in self._local:
+                    yield name
+        yield from self._local
+
+    def __len__(self) -> int:
+        inherited = sum(1 for n in self._parent if n not in self._local) if self._parent is not None else 0
+        return inherited + len(self._local)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._local or (self._parent is not None and name in self._parent)
+
+    def __setitem__(self, name: str, entry: Any) -> None:
+        with self._lock:
+            self._local[name] = entry
+            self.invalidate(name)
+
+    # ──────────────────────────────────────────────
+    # Versions
+    # ──────────────────────────────────────────────
+    @property
+    def version(self) -> tuple:
+        """Change dès qu'un outil est ajouté ici ou dans un parent."""
+        own = (self._revision,)
+        return (self._parent.version + own) if self._parent is not None else own
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        À appeler après une modification en place d'un outil (ex. sa
+        description) ; `name=None` invalide tout le rendu local.
+        """
+        with self._lock:
+            if name is None:
+                self._rendered.clear()
+            else:
+                self._rendered.pop(name, None)
+            self._revision += 1
+
+    def child(self) -> "ToolCatalog":
+        """Catalogue de session : hérite de celui-ci, outils locaux en plus."""
+        return ToolCatalog(self)
+
+    # ──────────────────────────────────────────────
+    # Rendu en cache
+    # ──────────────────────────────────────────────
+    def _render(self, name: str) -> Tuple[str, Dict[str, Any]]:
+        if name not in self._local:
+            return self._parent._render(name)
+        with self._lock:
+            rendered = self._rendered.get(name)
+            if rendered is None:
+                entry = self._local[name]
+                rendered = (self._text(name, entry), self._schema(name, entry))
+                self._rendered[name] = rendered
+            return rendered
+
+    def description(self) -> str:
+        """
+        Description texte de tous les outils, recalculée seulement quand
+        la version change.
+        """
+        if not self._local and self._parent is not None:
+            return self._parent.description()
+        with self._lock:
+            version = self.version
+            if self._description is None or self._description[0] != version:
+                if len(self) == 0:
+                    text = self._empty
+                else:
+                    parts = [self._render(name)[0] for name in self]
+                    text = "\n".join([self._header, *parts] if self._header else parts)
+                self._description = (version, text)
+            return self._description[1]
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """
+        Liste des schémas function-calling (même invalidation que description()).
+        """
+        if not self._local and self._parent is not None:
+            return self._parent.schemas()
+        with self._lock:
+            version = self.version
+            if self._schemas is None or self._schemas[0] != version:
+                self._schemas = (version, [self._render(name)[1] for name in self])
+            return self._schemas[1]
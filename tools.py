@@ -3,12 +3,23 @@ from __future__ import annotations
 from typing import Optional, List, Dict, Any, Tuple
 import datetime
 import json
-import sqlite3
 import os
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from functools import lru_cache   # NEW
 
+import numpy as np
+
+import calendar_keys
+import db_pool
+from columnar_cache import COLUMNAR_CACHE
+from query_cache import cached_execute
+
 SCHEMA_PATH = "databasevf_schema.json"   # adapte si besoin
+
+# moving_average : fenêtres jusqu'à cette taille calculées à l'identique de sum()
+_EXACT_WINDOW_MAX = 64
+# Nombre de valeurs traitées par bloc dans les fenêtres glissantes
+_ROLLING_BLOCK = 1 << 22
 TEMPLATES_DIR = "dashboardgen/templates"
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 
@@ -74,6 +85,91 @@ def _load_schema() -> Dict[str, Any]:
         return json.load(f)
 
 
+def _rolling_apply(values: List[float], window: int, reduce) -> List[Optional[float]]:
+    """
+    Applique `reduce` (fenêtres → valeurs) sur les fenêtres glissantes de
+    `values` ; None sur les window-1 premières positions.
+    """
+    if window < 1:
+        raise ValueError("window doit être >= 1")
+    n = len(values)
+    if n < window:
+        return [None] * n
+    windows = np.lib.stride_tricks.sliding_window_view(np.asarray(values, dtype=np.float64), window)
+    # Par blocs : np.median copie ses fenêtres
+    step = max(1, _ROLLING_BLOCK // window)
+    out = np.concatenate([reduce(windows[i : i + step]) for i in range(0, len(windows), step)])
+    return [None] * (window - 1) + out.tolist()
+
+
+def _outlier_mask(a: np.ndarray, method: str, threshold: float) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Masque des outliers de `a` et bornes utilisées.
+    IQR : quartiles aux rangs n//4 et 3n//4 ; zscore : |x - µ| / σ > threshold.
+    """
+    if method == "zscore":
+        mean_val = a.mean()
+        std = np.sqrt(((a - mean_val) ** 2).mean())
+        if std == 0:
+            return np.zeros(a.shape, dtype=bool), {"mean": float(mean_val), "std": 0.0}
+        mask = np.abs((a - mean_val) / std) > threshold
+        return mask, {
+            "mean": float(mean_val),
+            "std": float(std),
+            "low": float(mean_val - threshold * std),
+            "high": float(mean_val + threshold * std),
+        }
+    # IQR par défaut : mêmes rangs n//4 et 3n//4, sans tri complet
+    n = len(a)
+    part = np.partition(a, [n // 4, 3 * n // 4])
+    q1, q3 = part[n // 4], part[3 * n // 4]
+    iqr = q3 - q1
+    lo, hi = q1 - threshold * iqr, q3 + threshold * iqr
+    return (a < lo) | (a > hi), {"q1": float(q1), "q3": float(q3), "low": float(lo), "high": float(hi)}
+
+
+def _calendar_key(table_name: str, date_col: str, date_format: str) -> Optional[str]:
+    """
+    Colonne clé calendaire indexée correspondant à `date_format`, si la
+    table la contient (voir calendar_keys).
+    """
+    key = calendar_keys.FORMAT_TO_KEY.get(date_format)
+    if not key:
+        return None
+    key_col = calendar_keys.key_column(date_col, key)
+    columns = {row[1] for row in cached_execute(f'PRAGMA table_xinfo("{table_name}")')}
+    return key_col if key_col in columns else None
+
+
+def _column_values(
+    table_name: str, col: str, where_clause: Optional[str], id_col: Optional[str]
+) -> Tuple[List[Any], np.ndarray]:
+    """
+    (identifiants, valeurs non nulles) de `col`, depuis le cache
+    colonnaire quand il couvre la table, sinon via SQL.
+    """
+    table = COLUMNAR_CACHE.get(table_name)
+    if table is not None and id_col:
+        column, ids_column = table.column(col), table.column(id_col)
+        rows = table.where(where_clause)
+        if column is not None and ids_column is not None and column.kind != "text" and rows is not None:
+            positions = np.arange(table.n_rows)[rows]
+            positions = positions[column.valid[positions]]
+            COLUMNAR_CACHE.served += 1
+            return ids_column.to_list(positions), column.values[positions].astype(np.float64)
+
+    id_expr = f'"{id_col}"' if id_col else "rowid"
+    where_part = f"AND ({where_clause})" if where_clause else ""
+    rows = cached_execute(
+        f'SELECT {id_expr}, "{col}" FROM "{table_name}" WHERE "{col}" IS NOT NULL {where_part}'
+    )
+    return [row[0] for row in rows], np.array([row[1] for row in rows], dtype=np.float64)
+
+
+def _round(value: Any, digits: int = 4) -> Any:
+    return round(value, digits) if isinstance(value, float) else value
+
+
 class Tools:
     """
     Ensemble de fonctions exposées comme « tools » au modèle ReAct.
@@ -143,11 +239,7 @@ class Tools:
         -------
         int
         """
-        conn = sqlite3.connect("databasevf.db")
-        cur = conn.cursor()
-        cur.execute(f"SELECT COUNT(*) FROM \"{table_name}\"")
-        n, = cur.fetchone()
-        conn.close()
+        (n,), = db_pool.execute(f"SELECT COUNT(*) FROM \"{table_name}\"")
         return n
 
     # ──────────────────────────────────────────────
@@ -305,13 +397,58 @@ class Tools:
         Moyenne mobile centrée vers l'arrière.
         Les premières valeurs (< window) sont renvoyées inchangées.
         """
-        ma: list[float] = []
-        for i, _ in enumerate(values):
-            if i < window - 1:
-                ma.append(values[i])
-            else:
-                ma.append(sum(values[i - window + 1 : i + 1]) / window)
-        return ma
+        if window < 1:
+            raise ValueError("window doit être >= 1")
+        n = len(values)
+        if n < window:
+            return list(values)
+        a = np.asarray(values, dtype=np.float64)
+        if window <= _EXACT_WINDOW_MAX:
+            # Additions décalées : même ordre d'addition que sum(), résultat identique
+            acc = a[: n - window + 1].copy()
+            for k in range(1, window):
+                acc += a[k : n - window + 1 + k]
+        else:
+            # Grandes fenêtres : sommes cumulées, O(n)
+            c = np.concatenate(([0.0], np.cumsum(a)))
+            acc = c[window:] - c[: n - window + 1]
+        return list(values[: window - 1]) + (acc / window).tolist()
+
+    def rolling_std(self, values: list[float], window: int) -> list[Optional[float]]:
+        """
+        Écart-type glissant (population) sur `window` points.
+        Les window-1 premières positions valent None.
+        """
+        return _rolling_apply(values, window, lambda w: w.std(axis=1))
+
+    def rolling_median(self, values: list[float], window: int) -> list[Optional[float]]:
+        """
+        Médiane glissante sur `window` points.
+        Les window-1 premières positions valent None.
+        """
+        return _rolling_apply(values, window, lambda w: np.median(w, axis=1))
+
+    def ewma(self, values: list[float], alpha: float = 0.3) -> list[float]:
+        """
+        Moyenne mobile exponentielle : y0 = x0, yt = alpha·xt + (1-alpha)·yt-1.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha doit être dans ]0, 1]")
+        a = np.asarray(values, dtype=np.float64)
+        if a.size == 0 or alpha == 1:
+            return a.tolist()
+        b = 1.0 - alpha
+        # Forme fermée par blocs, bornés pour que b**-k reste sous 1e100
+        block = int(min(8192, max(1, 100 * np.log(10) / -np.log(b))))
+        out = np.empty_like(a)
+        prev = a[0]
+        for start in range(0, a.size, block):
+            x = a[start : start + block]
+            t = np.arange(x.size)
+            scaled = np.cumsum(x * b ** -t)
+            out[start : start + x.size] = b ** (t + 1) * prev + alpha * b ** t * scaled
+            prev = out[start + x.size - 1]
+        return out.tolist()
 
     def zscore(self, values: list[float]) -> list[float]:
         """
@@ -319,9 +456,12 @@ class Tools:
         """
         if not values:
             return []
-        mean_val = sum(values) / len(values)
-        std = (sum((v - mean_val) ** 2 for v in values) / len(values)) ** 0.5
-        return [(v - mean_val) / std if std != 0 else 0.0 for v in values]
+        a = np.asarray(values, dtype=np.float64)
+        mean_val = a.mean()
+        std = np.sqrt(((a - mean_val) ** 2).mean())
+        if std == 0:
+            return [0.0] * len(values)
+        return ((a - mean_val) / std).tolist()
 
     def detect_outliers(
         self, values: list[float], method: str = "IQR", threshold: float = 1.5
@@ -330,17 +470,10 @@ class Tools:
         Renvoie la liste des indices considérés comme outliers.
         method='IQR' ou 'zscore'.
         """
-        out = []
-        if method == "zscore":
-            zs = self.zscore(values)
-            out = [i for i, z in enumerate(zs) if abs(z) > threshold]
-        else:  # IQR par défaut
-            q1 = sorted(values)[len(values) // 4]
-            q3 = sorted(values)[3 * len(values) // 4]
-            iqr = q3 - q1
-            lo, hi = q1 - threshold * iqr, q3 + threshold * iqr
-            out = [i for i, v in enumerate(values) if v < lo or v > hi]
-        return out
+        if not values:
+            return []
+        mask, _ = _outlier_mask(np.asarray(values, dtype=np.float64), method, threshold)
+        return np.flatnonzero(mask).tolist()
 
     def normalize_series(
         self, values: list[float], method: str = "minmax"
@@ -352,10 +485,11 @@ class Tools:
             return []
         if method == "zscore":
             return self.zscore(values)
-        vmin, vmax = min(values), max(values)
+        a = np.asarray(values, dtype=np.float64)
+        vmin, vmax = a.min(), a.max()
         if vmax == vmin:
             return [0.0] * len(values)
-        return [(v - vmin) / (vmax - vmin) for v in values]
+        return ((a - vmin) / (vmax - vmin)).tolist()
 
     # ──────────────────────────────────────────────
     # SECTION 7 – Helpers SQL rapides
@@ -366,13 +500,11 @@ class Tools:
 
         Exemple : where_clause="GRADE='A42' AND HEATID>1000".
         """
-        conn = sqlite3.connect("databasevf.db")
-        cur = conn.cursor()
+        served = COLUMNAR_CACHE.filter(table_name, where_clause)
+        if served is not None:
+            return served
         query = f"SELECT * FROM \"{table_name}\" WHERE {where_clause}"
-        cur.execute(query)
-        rows = cur.fetchall()
-        conn.close()
-        return rows
+        return db_pool.execute(query)
         
     def get_timeseries_data_for_chart(
         self, 
@@ -386,6 +518,8 @@ class Tools:
         """
         Exécute une requête SQL pour agréger des données par jour et les formate
         directement pour un graphique en ligne. Renvoie un dictionnaire prêt à l'emploi.
+        Les formats "%Y-%m-%d", "%Y-W%W" et "%Y-%m" utilisent les clés calendaires
+        indexées `<date_col>__day/__week/__month` quand la base les contient.
         
         Args:
             table_name (str): Nom de la table
@@ -398,14 +532,23 @@ class Tools:
         Returns:
             Dict[str, Any]: Données formatées pour un graphique en ligne
         """
-        conn = sqlite3.connect("databasevf.db")
-        cur = conn.cursor()
-        
         where_part = f"WHERE {where_clause}" if where_clause else ""
         
+        # Clé calendaire précalculée (indexée) si elle existe, sinon strftime()
+        group_expr = f"strftime('{date_format}', \"{date_col}\")"
+        key_col = _calendar_key(table_name, date_col, date_format)
+        if key_col:
+            group_expr = f'"{key_col}"'
+            served = COLUMNAR_CACHE.aggregate(table_name, [key_col], value_col, agg_func, where_clause)
+            if served is not None:
+                return {
+                    "labels": [row[0] for row in served],
+                    "series": [{"name": value_col, "data": [row[1] for row in served]}]
+                }
+        
         query = f"""
             SELECT 
-                strftime('{date_format}', "{date_col}") as day, 
+                {group_expr} as day, 
                 {agg_func}("{value_col}") as value
             FROM "{table_name}"
             {where_part}
@@ -414,9 +557,7 @@ class Tools:
         """
         
         print(f"[DEBUG] Executing timeseries query: {query}")
-        cur.execute(query)
-        rows = cur.fetchall()
-        conn.close()
+        rows = cached_execute(query)
         
         # Format data for chart
         labels = [row[0] for row in rows]
@@ -439,10 +580,12 @@ class Tools:
         """
         Agrégation simple (SUM, AVG, MAX…).
         Gère correctement les cas avec ou sans colonnes de groupage.
+        Servie par le cache colonnaire quand il est actif pour la table.
         """
-        conn = sqlite3.connect("databasevf.db")
-        cur = conn.cursor()
-        
+        served = COLUMNAR_CACHE.aggregate(table_name, group_by_cols, agg_col, agg_func)
+        if served is not None:
+            return served
+
         # Handle empty group_by_cols case
         if not group_by_cols:
             # Case: No grouping, calculate for the whole table
@@ -455,10 +598,151 @@ class Tools:
                 f"FROM \"{table_name}\" GROUP BY {group_expr}"
             )
             
-        cur.execute(query)
-        rows = cur.fetchall()
-        conn.close()
-        return rows
+        return cached_execute(query)
+
+    def rolling_stat(
+        self,
+        table_name: str,
+        date_col: str,
+        value_col: str,
+        window: int = 7,
+        stat: str = "AVG",
+        agg_func: str = "SUM",
+        date_format: str = "%Y-%m-%d",
+        where_clause: str = None,
+        tail: int = 5,
+    ) -> Dict[str, Any]:
+        """
+        Statistique glissante calculée dans la base, sans renvoyer les lignes.
+        Les valeurs sont d'abord agrégées par période (agg_func, date_format),
+        puis `stat` (AVG, SUM, MIN, MAX, STD, MEDIAN) est calculée sur les
+        `window` dernières périodes.
+
+        Args:
+            table_name (str): Nom de la table
+            date_col (str): Colonne date
+            value_col (str): Colonne valeur
+            window (int): Nombre de périodes de la fenêtre
+            stat (str): AVG, SUM, MIN, MAX, STD ou MEDIAN
+            agg_func (str): Agrégation par période (SUM, AVG, MAX, MIN)
+            date_format (str): Période ("%Y-%m-%d", "%Y-W%W", "%Y-%m")
+            where_clause (str): Clause WHERE optionnelle
+            tail (int): Nombre de dernières périodes renvoyées
+
+        Returns:
+            Dict[str, Any]: Résumé (dernière valeur, min / max glissants,
+            `tail` derniers points).
+        """
+        stat = stat.upper()
+        window = int(window)
+        if window < 1:
+            raise ValueError("window doit être >= 1")
+        if stat not in ("AVG", "SUM", "MIN", "MAX", "STD", "MEDIAN"):
+            raise ValueError(f"stat non supportée : {stat}")
+
+        key_col = _calendar_key(table_name, date_col, date_format)
+        group_expr = f'"{key_col}"' if key_col else f"strftime('{date_format}', \"{date_col}\")"
+        where_part = f"AND ({where_clause})" if where_clause else ""
+        # STD / MEDIAN : pas de fonction fenêtre native, calcul NumPy sur les périodes
+        window_expr = f"{stat}(value) OVER w" if stat in ("AVG", "SUM", "MIN", "MAX") else "NULL"
+        query = f"""
+            WITH per AS (
+                SELECT {group_expr} AS period, {agg_func}("{value_col}") AS value
+                FROM "{table_name}"
+                WHERE "{date_col}" IS NOT NULL {where_part}
+                GROUP BY period
+            )
+            SELECT period, value,
+                   CASE WHEN ROW_NUMBER() OVER w >= {window} THEN {window_expr} END AS rolling
+            FROM per
+            WINDOW w AS (ORDER BY period ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)
+            ORDER BY period
+        """
+        print(f"[DEBUG] Executing rolling_stat query: {query}")
+        rows = cached_execute(query)
+        periods = [row[0] for row in rows]
+        if stat in ("STD", "MEDIAN"):
+            values = [np.nan if row[1] is None else row[1] for row in rows]
+            reduce = (lambda w: w.std(axis=1)) if stat == "STD" else (lambda w: np.median(w, axis=1))
+            rolling = _rolling_apply(values, window, reduce)
+        else:
+            rolling = [row[2] for row in rows]
+
+        # (période, moyenne glissante, valeur de la période), NaN / None exclus
+        points = [(p, r, row[1]) for p, r, row in zip(periods, rolling, rows) if r is not None and r == r]
+        summary: Dict[str, Any] = {
+            "table": table_name,
+            "value_col": value_col,
+            "stat": stat,
+            "window": window,
+            "periods": len(rows),
+        }
+        if not points:
+            return summary
+        low = min(points, key=lambda p: p[1])
+        high = max(points, key=lambda p: p[1])
+        summary.update({
+            "from": periods[0],
+            "to": periods[-1],
+            "last": {"period": points[-1][0], "value": _round(points[-1][2]), "rolling": _round(points[-1][1])},
+            "min": {"period": low[0], "rolling": _round(low[1])},
+            "max": {"period": high[0], "rolling": _round(high[1])},
+            "recent": [[p, _round(r)] for p, r, _ in points[-tail:]] if tail > 0 else [],
+        })
+        return summary
+
+    def outliers(
+        self,
+        table_name: str,
+        col: str,
+        method: str = "IQR",
+        threshold: float = 1.5,
+        where_clause: str = None,
+        id_col: str = None,
+        limit: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Détecte les outliers d'une colonne directement dans la base et ne
+        renvoie qu'un résumé : effectifs, bornes et les `limit` valeurs les
+        plus extrêmes avec leur identifiant (`id_col`, rowid par défaut).
+
+        Args:
+            table_name (str): Nom de la table
+            col (str): Colonne numérique analysée
+            method (str): 'IQR' ou 'zscore'
+            threshold (float): 1.5 (IQR) ou nombre d'écarts-types (zscore)
+            where_clause (str): Clause WHERE optionnelle
+            id_col (str): Colonne identifiant (ex. HEATID)
+            limit (int): Nombre maximal d'outliers détaillés
+
+        Returns:
+            Dict[str, Any]: Résumé des outliers
+        """
+        ids, values = _column_values(table_name, col, where_clause, id_col)
+        summary: Dict[str, Any] = {
+            "table": table_name,
+            "column": col,
+            "method": method,
+            "threshold": threshold,
+            "count": int(values.size),
+        }
+        if values.size == 0:
+            summary["outliers"] = 0
+            return summary
+        mask, bounds = _outlier_mask(values, method, threshold)
+        idx = np.flatnonzero(mask)
+        # Les plus éloignés des bornes d'abord
+        if "low" in bounds:
+            distance = np.maximum(bounds["low"] - values[idx], values[idx] - bounds["high"])
+            idx = idx[np.argsort(-distance, kind="stable")]
+        id_name = id_col or "rowid"
+        summary.update({
+            "outliers": int(idx.size),
+            "share": _round(idx.size / values.size),
+            "bounds": {k: _round(v) for k, v in bounds.items()},
+            "top": [{id_name: ids[i], "value": _round(values[i].item())} for i in idx[: max(limit, 0)].tolist()],
+        })
+        return summary
 
     # ──────────────────────────────────────────────
     # SECTION 8 – Conversion d'unités énergie
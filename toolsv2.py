@@ -7,6 +7,8 @@ import json
 from typing import Optional, List, Dict, Any, Tuple
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+import db_pool
+
 # Import the tool decorator from your agent file
 from ulti_llm import tool
 
@@ -43,13 +45,7 @@ class SteelMillTools:
     @tool("Execute a read-only SQL query against the steel mill database.")
     def query_database(self, query: str) -> List[Dict]:
         """Runs a SQL query and returns a list of dictionaries."""
-        conn = sqlite3.connect('databasevf.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return result
+        return [dict(row) for row in db_pool.execute(query, row_factory=sqlite3.Row)]
 
     @tool("Get aggregated time-series data, formatted for a chart.")
     def get_timeseries_data(self, table_name: str, date_col: str, value_col: str, agg_func: str = "SUM") -> Dict:
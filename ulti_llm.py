@@ -1,14 +1,3 @@
-
-import sys
-
-from toolsv2 import SteelMillTools
-# Fix for Unicode display issues on Windows consoles
-if sys.stdout.encoding.lower() != 'utf-8':
-    sys.stdout.reconfigure(encoding='utf-8')
-    sys.stderr.reconfigure(encoding='utf-8')
-
-
-
 # -*- coding: utf-8 -*-
 """ultimate_steelmill_agent.py  –  patched v3
 
@@ -20,6 +9,14 @@ if sys.stdout.encoding.lower() != 'utf-8':
 
 from __future__ import annotations
 
+import sys
+
+from toolsv2 import SteelMillTools
+# Fix for Unicode display issues on Windows consoles
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
 import asyncio
 import inspect
 import json
@@ -38,10 +35,16 @@ from dotenv import load_dotenv
 from openai import AsyncOpenAI, APIConnectionError, RateLimitError
 from pydantic import BaseModel, Field, ValidationError, create_model
 
+from context_manager import ContextManager
+from tool_catalog import ToolCatalog, spec_schema, spec_text
+
 # -----------------------------------------------------------------------------
 # 0.  DEBUG UTILITIES
 # -----------------------------------------------------------------------------
 DEBUG = bool(int(os.getenv("ULTIMATE_DEBUG", "0")))
+# Passerelle par défaut ; LLM_BASE_URL (lu après .env.local) la remplace,
+# ex. par mock_llm_server.py hors ligne
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
 
 def dprint(*args: Any, **kwargs: Any):
     """
@@ -158,7 +161,7 @@ class UltimateAgent:
         api_key = os.getenv("OPENROUTER_API_KEY")
         if not api_key:
             raise RuntimeError("OPENROUTER_API_KEY missing in .env.local")
-        self.client = AsyncOpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key, timeout=45)
+        self.client = AsyncOpenAI(base_url=os.getenv("LLM_BASE_URL", OPENROUTER_URL), api_key=api_key, timeout=45)
 
         self.model = model
         self.tool_support = tool_support
@@ -166,11 +169,14 @@ class UltimateAgent:
         self.max_response_tokens = max_response_tokens
         self.temperature = temperature
         self._enc = tiktoken.get_encoding("cl100k_base")
+        self._context = ContextManager(max_model_tokens - max_response_tokens, count=self._tokens)
         self._log = logging.getLogger("UltimateAgent")
         self._log.setLevel(logging.INFO)
 
         self.scratchpad = ScratchPad()
-        self._tools: Dict[str, ToolSpec] = {}
+        # name -> ToolSpec ; description calculée une fois par version du catalogue
+        self._tools = ToolCatalog(text=spec_text, schema=spec_schema, header="", empty="")
+        self._system_prompt_cache: Optional[tuple] = None
 
         self._register_builtin_tools()
 
@@ -258,24 +264,26 @@ class UltimateAgent:
         setattr(self, tool_name, fn.__get__(self))
         self.register_tool(getattr(self, tool_name))
         self._tools[tool_name].description = description
+        self._tools.invalidate(tool_name)
         return f"Tool '{tool_name}' created and registered."
 
     # ------------------------------------------------------------------ system prompt helpers
 
     def _tools_doc(self) -> str:
-        return "\n".join(
-            f"- `{sp.name}({', '.join(sp.args_schema.model_json_schema()['properties'].keys())})`: {sp.description}"
-            for sp in self._tools.values()
-        )
+        return self._tools.description()
 
     def _build_system_prompt(self) -> str:
-        return (
-            f"{self.persona_prompt}\n\n"
-            "### STRICT Manual Tool Calling\n"
-            "Réponds UNIQUEMENT par un bloc JSON contenant `tool_call`.\n"
-            "Exemple :```json\n{""\"tool_call\""": {""\"name\""": ""\"my_tool\""", ""\"arguments\""": {}}}""```\n"
-            "Here are your available tools:\n" + self._tools_doc() + "\n\n"
-        )
+        key = (self.persona_prompt, self._tools.version)
+        if self._system_prompt_cache is None or self._system_prompt_cache[0] != key:
+            prompt = (
+                f"{self.persona_prompt}\n\n"
+                "### STRICT Manual Tool Calling\n"
+                "Réponds UNIQUEMENT par un bloc JSON contenant `tool_call`.\n"
+                "Exemple :```json\n{""\"tool_call\""": {""\"name\""": ""\"my_tool\""", ""\"arguments\""": {}}}""```\n"
+                "Here are your available tools:\n" + self._tools_doc() + "\n\n"
+            )
+            self._system_prompt_cache = (key, prompt)
+        return self._system_prompt_cache[1]
 
     # ------------------------------------------------------------------ JSON parsing / validation
 
@@ -413,15 +421,8 @@ class UltimateAgent:
         return len(self._enc.encode(txt or "")) if txt else 0
 
     def _trim(self, msgs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        budget = self.max_model_tokens - self.max_response_tokens
-        current_tokens = sum(self._tokens(m.get("content")) for m in msgs)
-        
-        while current_tokens > budget and len(msgs) > 2: # Keep system and first user prompt
-            removed_msg = msgs.pop(1) # Remove from the start of the history
-            current_tokens -= self._tokens(removed_msg.get("content"))
-            dprint(f"TRIM: Removed message. Tokens now: {current_tokens}")
-
-        return msgs
+        # Comptes de tokens mémorisés par message : seuls les nouveaux sont tokenisés
+        return self._context.fit(msgs)
 
 
 # -----------------------------------------------------------------------------